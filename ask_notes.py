@@ -6,12 +6,17 @@ os.environ["VAULT_PATH"]="~/Obsidian/Notes Vault"
 
 import dspy
 from dspy.primitives.prediction import Prediction
+from dspy_modules.cached_lm import CachedLM
+from tools.token_usage import usage_pipeline
 
-from tools.md_files import search_notes,get_note_content
+from tools.md_files import search_notes,hybrid_search,search_passages,get_note_content
+from tools.link_graph import get_backlinks,get_outgoing_links,get_neighbors
+from tools.note_metadata import find_notes_by_tag,find_notes_by_property
+from tools.vault_query import search_vault
 
 os.environ["VAULT_PATH"]="~/Obsidian/Notes Vault"
 
-azure_lm = dspy.LM(
+azure_lm = CachedLM(
     model=f"azure/gpt-4.1",
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
@@ -28,9 +33,10 @@ class NoteResearcher(dspy.Signature):
 
 agent = dspy.ReAct(
     NoteResearcher,
-    tools=[search_notes,get_note_content]
+    tools=[search_notes,hybrid_search,search_passages,get_note_content,get_backlinks,get_outgoing_links,get_neighbors,find_notes_by_tag,find_notes_by_property,search_vault]
 )
 
+@usage_pipeline("ask_notes")
 def ask_notes(question: str) -> Prediction:
     """
     Ask a question and retrieve a prediction based on the content of the Obsidian Vault.
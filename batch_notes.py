@@ -0,0 +1,331 @@
+"""
+Generate notes for a whole file of topics or contexts, several at a time.
+
+The input is either a text file with one topic per line, or JSON Lines with a
+"context" (or "topic") and an optional "note_name" per line. dspy and the vault's
+note list are set up once; items are then fed through a bounded queue to a fixed
+number of workers, so no more requests are in flight than the server has parallel
+slots (Ollama's `OLLAMA_NUM_PARALLEL`). Failed items are retried with exponential
+backoff. Every finished item is recorded in a state file next to the input's
+name under `data/batch/`, and a re-run skips the items already done. Note names
+must be unique within a batch, since two items with the same name would write the
+same note.
+
+    python batch_notes.py topics.txt --concurrency 4
+    python -m tools.fake_openai_server --port 11435 &
+    python batch_notes.py topics.txt --base-url http://127.0.0.1:11435/v1
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+STATE_DIR = "data/batch"
+FORBIDDEN_NAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1F\[\]#^]')
+
+
+class BatchItem(NamedTuple):
+    note_name: str   # also the key used to resume
+    context: str
+
+
+def note_name_for(text: str, max_length: int = 100) -> str:
+    """A valid note name derived from a topic: forbidden characters dropped, trailing dots trimmed,
+    Windows reserved names (CON, NUL, COM1...) suffixed with " note"."""
+    from tools.md_files import WINDOWS_RESERVED_NAMES
+
+    name = re.sub(r"\s+", " ", FORBIDDEN_NAME_CHARS.sub(" ", text.strip().splitlines()[0] if text.strip() else ""))
+    name = name[:max_length].strip(" .") or "Untitled"
+    root, dot, rest = name.partition(".")
+    if root.upper() in WINDOWS_RESERVED_NAMES:
+        name = f"{root} note{dot}{rest}"
+    return name
+
+
+def read_items(path: str):
+    """Yield the BatchItems in a topics (.txt) or contexts (.jsonl) file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if path.endswith(".jsonl"):
+                record = json.loads(line)
+                context = record.get("context") or record["topic"]
+                yield BatchItem(record.get("note_name") or note_name_for(record.get("topic") or context), context)
+            else:
+                yield BatchItem(note_name_for(line), line)
+
+
+class BatchState:
+    """Append-only JSONL record of finished items, used to resume a batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line of an interrupted run
+                    if record.get("status") == "done":
+                        self.done.add(record["note_name"])
+        except FileNotFoundError:
+            pass
+
+    def record(self, **record) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        if record.get("status") == "done":
+            self.done.add(record["note_name"])
+
+
+def configure_lm(model: str = None, base_url: str = None):
+    """Configure dspy once for the batch, against Ollama (or any OpenAI-compatible server) by default."""
+    import dspy
+    from dspy_modules.cached_lm import CachedLM
+
+    load_dotenv()
+    lm = CachedLM(
+        model or os.getenv("MODEL_NAME", "openai/qwen2.5:7b-instruct-q4_K_M"),
+        temperature=float(os.getenv("TEMPERATURE", 0.2)),
+        max_tokens=int(os.getenv("MAX_TOKENS", 2048)),
+        base_url=base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"),
+        api_key=os.getenv("OLLAMA_API_KEY", "ollama"),
+        num_retries=0,  # retries are handled per item by the batch
+    )
+    dspy.configure(lm=lm)
+    return lm
+
+
+def make_note_generator(note_list: list[str], prompt_with_note_list: bool = False, insert_links: bool = True,
+                        note_list_k: int = None):
+    """
+    Return a blocking `generate(item) -> (note text, completion tokens)` built on `NoteGenerator`.
+
+    The note list is passed in once for the whole batch. With `prompt_with_note_list`,
+    each prompt gets the `note_list_k` notes most relevant to its item (0 for all of
+    them). Links to existing notes are inserted after generation as in
+    `text_to_note.insert_links_to_existing_notes`.
+    """
+    from dspy_modules.note_gen import NoteGenerator
+    from tools.name_index import get_name_index, repair_links
+    from tools.note_linker import get_linker
+    from tools.note_selection import DEFAULT_TOP_K, select_related_notes
+    from tools.token_usage import collect_usage, usage_pipeline
+
+    generator = NoteGenerator()
+    note_list_k = DEFAULT_TOP_K if note_list_k is None else note_list_k
+
+    def generate(item: BatchItem):
+        prompt_notes = []
+        if prompt_with_note_list:
+            prompt_notes = select_related_notes(item.context, note_list, note_list_k) if note_list_k else note_list
+        # Runs on a worker thread, which doesn't inherit the caller's context, so label it here
+        with usage_pipeline("batch_notes"), collect_usage() as usage:
+            prediction = generator(context=item.context, note_list=prompt_notes)
+        note = prediction.obs_note
+        tokens = sum(record["completion_tokens"] for record in usage if not record["cached"])
+        if insert_links:
+            note = get_linker(note_list, aliases=get_name_index(note_list).aliases).link(repair_links(note, note_list))
+        return note, tokens
+
+    return generate
+
+
+class _Progress:
+    def __init__(self, total: int = None):
+        self.total = total
+        self.start = time.perf_counter()
+        self.done = self.failed = self.skipped = self.duplicates = self.retries = 0
+        self.tokens = 0.0
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        of = f"/{self.total}" if self.total is not None else ""
+        return (f"[{self.done + self.failed + self.skipped + self.duplicates}{of}] done {self.done}, failed {self.failed}, "
+                f"skipped {self.skipped}, retries {self.retries} | {self.done / elapsed * 60:.1f} notes/min, "
+                f"{self.tokens / elapsed:.1f} tok/s")
+
+
+async def run_batch(items, generate, write_note, state: BatchState, concurrency: int = 4,
+                    retries: int = 3, backoff: float = 1.0, total: int = None, verbose: bool = True) -> dict:
+    """
+    Generate and save a note for every item, `concurrency` at a time.
+
+    An item whose note name was already queued in this run is skipped as a duplicate,
+    so two items never write the same note at once.
+
+    Args:
+        items: Iterable of BatchItems; consumed lazily, so it can be a stream.
+        generate: Blocking `generate(item) -> (note text, tokens)`; run on worker threads.
+        write_note: Blocking `write_note(note_name, text)` that saves the note.
+        state (BatchState): Resume state; items already done are skipped and every
+            finished item is recorded.
+        concurrency (int): Items in flight at once; match the server's parallel slots.
+        retries (int): Extra attempts per item after a failure. Defaults to 3.
+        backoff (float): Base delay in seconds, doubled per attempt, with jitter.
+        total (int): Number of items, for progress output only.
+        verbose (bool): Print a progress line after every item.
+
+    Returns:
+        dict: "done", "failed", "skipped", "duplicates", "retries", "tokens", "seconds", "notes_per_min"
+            and "tokens_per_sec".
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    # A short queue is the backpressure: the reader waits while every worker is busy
+    queue = asyncio.Queue(maxsize=concurrency)
+    progress = _Progress(total)
+
+    async def produce():
+        queued = set()
+        for item in items:
+            if item.note_name in state.done:
+                progress.skipped += 1
+                continue
+            if item.note_name in queued:
+                progress.duplicates += 1
+                if verbose:
+                    print(f"DUPLICATE {item.note_name}: skipped, an earlier item writes this note")
+                continue
+            queued.add(item.note_name)
+            await queue.put(item)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while (item := await queue.get()) is not None:
+            started = time.perf_counter()
+            for attempt in range(retries + 1):
+                try:
+                    note, tokens = await loop.run_in_executor(executor, generate, item)
+                    await loop.run_in_executor(executor, write_note, item.note_name, note)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    if attempt < retries:
+                        progress.retries += 1
+                        await asyncio.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+                        continue
+                    progress.failed += 1
+                    state.record(note_name=item.note_name, status="failed", attempts=attempt + 1,
+                                 seconds=round(time.perf_counter() - started, 3), error=error)
+                    if verbose:
+                        print(f"FAILED {item.note_name}: {error}")
+                else:
+                    progress.done += 1
+                    progress.tokens += tokens
+                    state.record(note_name=item.note_name, status="done", attempts=attempt + 1,
+                                 seconds=round(time.perf_counter() - started, 3), tokens=round(tokens))
+                break
+            if verbose:
+                print(f"{progress.line()}  <- {item.note_name}", flush=True)
+
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        executor.shutdown(wait=False)
+    elapsed = time.perf_counter() - progress.start
+    return {"done": progress.done, "failed": progress.failed, "skipped": progress.skipped,
+            "duplicates": progress.duplicates, "retries": progress.retries, "tokens": round(progress.tokens), "seconds": round(elapsed, 3),
+            "notes_per_min": progress.done / elapsed * 60 if elapsed else 0.0,
+            "tokens_per_sec": progress.tokens / elapsed if elapsed else 0.0}
+
+
+def generate_batch(path: str, concurrency: int = None, retries: int = 3, model: str = None, base_url: str = None,
+                   prompt_with_note_list: bool = False, insert_links: bool = True, restart: bool = False,
+                   verbose: bool = True, note_list_k: int = None) -> dict:
+    """
+    Generate a note for every topic or context in `path` and save them to the vault.
+
+    Args:
+        path (str): Topics (.txt, one per line) or contexts (.jsonl).
+        concurrency (int): Notes generated at once. Defaults to `OLLAMA_NUM_PARALLEL`, else 4.
+        retries (int): Extra attempts per note. Defaults to 3.
+        model (str): dspy model name. Defaults to `MODEL_NAME`.
+        base_url (str): OpenAI-compatible endpoint. Defaults to `OLLAMA_BASE_URL` or local Ollama.
+        prompt_with_note_list (bool): Show the model the vault's notes most relevant to each item. Defaults to False.
+        insert_links (bool): Link mentions of existing notes. Defaults to True.
+        restart (bool): Forget the previous progress of this batch.
+        verbose (bool): Print progress.
+        note_list_k (int): Notes shown per prompt with `prompt_with_note_list`; 0 shows all.
+            Defaults to `NOTE_LIST_K` (40).
+
+    Returns:
+        dict: The summary from `run_batch`.
+
+    Raises:
+        ValueError: If two items in `path` have the same note name, or a note name is not a valid filename.
+    """
+    from collections import Counter
+    from tools.md_files import assert_note_name_is_valid, create_note, get_notes_list
+
+    names = Counter(item.note_name for item in read_items(path))
+    invalid = []
+    for name in names:
+        try:
+            assert_note_name_is_valid(name + ".md")
+        except ValueError as e:
+            invalid.append(str(e))
+    if invalid:
+        raise ValueError(f"{len(invalid)} note names in {path} are not valid filenames, e.g. "
+                         f"{'; '.join(invalid[:5])}; fix those note_name values")
+    duplicates = sorted(name for name, count in names.items() if count > 1)
+    if duplicates:
+        raise ValueError(f"{len(duplicates)} note names occur more than once in {path}, e.g. "
+                         f"{', '.join(repr(name) for name in duplicates[:5])}; give those items distinct "
+                         f"topics or note_name values")
+    total = sum(names.values())
+
+    lm = configure_lm(model, base_url)
+    concurrency = concurrency or int(os.getenv("OLLAMA_NUM_PARALLEL", 4))
+    state_path = os.path.join(STATE_DIR, os.path.splitext(os.path.basename(path))[0] + ".state.jsonl")
+    if restart and os.path.exists(state_path):
+        os.remove(state_path)
+    state = BatchState(state_path)
+    note_list = get_notes_list()
+    generate = make_note_generator(note_list, prompt_with_note_list, insert_links, note_list_k)
+    model_tag = re.sub(r"[^\w/-]", "_", lm.model)  # obsidian tags don't support dots
+
+    def write_note(note_name: str, text: str) -> None:
+        create_note(note_name, text, extra_tags=[model_tag])
+
+    summary = asyncio.run(run_batch(read_items(path), generate, write_note, state, concurrency=concurrency,
+                                    retries=retries, total=total, verbose=verbose))
+    if verbose:
+        print(f"Finished: {summary['done']} notes, {summary['failed']} failed, {summary['skipped']} already done "
+              f"in {summary['seconds']:.1f}s ({summary['notes_per_min']:.1f} notes/min, "
+              f"{summary['tokens_per_sec']:.1f} tok/s)")
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate notes concurrently from a file of topics or contexts.")
+    parser.add_argument("path", help="Topics (.txt, one per line) or contexts (.jsonl with context/topic/note_name).")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Notes in flight at once (default: OLLAMA_NUM_PARALLEL or 4).")
+    parser.add_argument("--retries", type=int, default=3, help="Extra attempts per note (default: %(default)s).")
+    parser.add_argument("--model", default=None, help="dspy model name (default: MODEL_NAME).")
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible endpoint (default: OLLAMA_BASE_URL).")
+    parser.add_argument("--prompt-with-note-list", action="store_true",
+                        help="Include the vault's notes most relevant to each item in the prompt.")
+    parser.add_argument("--note-list-k", type=int, default=None,
+                        help="Notes per prompt with --prompt-with-note-list; 0 = all (default: NOTE_LIST_K or 40).")
+    parser.add_argument("--no-links", action="store_true", help="Don't insert links to existing notes.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the progress of a previous run.")
+    args = parser.parse_args()
+    generate_batch(args.path, args.concurrency, args.retries, args.model, args.base_url,
+                   args.prompt_with_note_list, insert_links=not args.no_links, restart=args.restart,
+                   note_list_k=args.note_list_k)
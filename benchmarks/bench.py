@@ -0,0 +1,300 @@
+"""Micro-benchmarks for the vault I/O, indexing, linking and evaluation hot paths.
+
+Each benchmark runs one of the repo's functions against a generated vault of each
+requested size and reports throughput, latency percentiles (p50/p95/p99) and the peak
+Python memory allocated during one extra traced call. Results are written as JSON so
+two runs can be compared:
+
+    python -m benchmarks.bench --sizes 1000,10000
+    python -m benchmarks.bench --sizes 1000 --baseline data/bench/results-<old>.json
+    python -m benchmarks.bench compare data/bench/results-<old>.json data/bench/results-<new>.json
+
+Synthetic vaults (`benchmarks.synth_vault`) are cached under `data/bench/vaults`, and
+the indexes each run builds live in `data/bench/work/<size>`. Embedding benchmarks use
+a deterministic hashing encoder unless `--real-encoder` is given, so the suite runs
+offline. `search_notes` runs the vault's query/answer set and also reports recall@5.
+"""
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+
+BENCH_DIR = os.path.abspath("data/bench")
+VAULTS_DIR = os.path.join(BENCH_DIR, "vaults")
+WORK_DIR = os.path.join(BENCH_DIR, "work")
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+class StubEncoder:
+    """
+    Deterministic stand-in for a SentenceTransformer: hashed bag of words, L2-normalised.
+
+    Costs microseconds per text, so embedding benchmarks measure the indexing code
+    around the model rather than the model.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        import zlib
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+#### Vaults
+
+def get_vault(n_notes: int, seed: int = 0) -> str:
+    """Return the path of a cached synthetic vault with `n_notes` notes, generating it if needed."""
+    from benchmarks.synth_vault import SYNTH_DIR, generate_vault
+    root = os.path.join(VAULTS_DIR, f"{n_notes}-{seed}")
+    if not os.path.exists(os.path.join(root, SYNTH_DIR, "manifest.json")):
+        shutil.rmtree(root, ignore_errors=True)
+        generate_vault(root, n_notes, seed)
+    return root
+
+
+#### Measurement
+
+def measure(name: str, op, n_ops: int, items_per_op: int = 1, setup=None, memory: bool = True) -> dict:
+    """
+    Time `op(i)` for i in range(n_ops), then trace the peak memory of one more call.
+
+    Returns:
+        dict: "name", "ops", "items_per_s", latency "p50_ms"/"p95_ms"/"p99_ms"/"mean_ms",
+            "total_s" and "peak_mem_mb" (None with `memory=False`).
+    """
+    if setup:
+        setup()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(n_ops):
+        t = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        op(n_ops)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+
+    ms = sorted(latency * 1000 for latency in latencies)
+    percentile = lambda q: ms[min(len(ms) - 1, int(round(q * (len(ms) - 1))))]
+    return {
+        "name": name,
+        "ops": n_ops,
+        "items_per_s": n_ops * items_per_op / total if total else None,
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "total_s": total,
+        "peak_mem_mb": peak,
+    }
+
+
+#### Benchmarks
+
+def _sample_text(rng: random.Random, names: list[str], words: int = 1500) -> str:
+    from benchmarks.synth_vault import common_vocabulary
+    tokens = rng.choices(common_vocabulary(0), k=words)
+    for _ in range(words // 50):
+        tokens.insert(rng.randrange(len(tokens)), os.path.basename(rng.choice(names)))
+    return " ".join(tokens)
+
+
+def run_size(n_notes: int, seed: int = 0, memory: bool = True, only: set = None, verbose: bool = True) -> list[dict]:
+    """Run every benchmark against the generated vault with `n_notes` notes."""
+    # The LM is configured when text_to_note is imported but never called here
+    os.environ.setdefault("AZURE_OPENAI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://localhost")
+    from tools import md_files, search_engine, vault_scan
+    from dspy_modules.note_gen import evaluate_note
+    from text_to_note import insert_links_to_existing_notes
+
+    if verbose:
+        print(f"== {n_notes} notes: preparing vault", flush=True)
+    vault = get_vault(n_notes, seed)
+    work = os.path.join(WORK_DIR, str(n_notes))
+    shutil.rmtree(work, ignore_errors=True)
+    os.makedirs(os.path.join(work, md_files.FAISS_DIR))
+    cwd = os.getcwd()
+    os.chdir(work)  # index paths are relative to the working directory
+    md_files.VAULT_PATH = vault
+    search_engine._engines.clear()  # engines keep their metadata store open
+    rng = random.Random(seed)
+    results = []
+
+    def bench(name, op, n_ops, items_per_op=1, setup=None):
+        if only and name not in only:
+            return
+        result = measure(name, op, n_ops, items_per_op, setup, memory)
+        result["size"] = n_notes
+        results.append(result)
+        if verbose:
+            mem = f"{result['peak_mem_mb']:.1f} MB" if result["peak_mem_mb"] is not None else "-"
+            print(f"  {name:<24} {result['items_per_s']:>12.1f}/s  p50 {result['p50_ms']:9.3f} ms  "
+                  f"p95 {result['p95_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  peak {mem}", flush=True)
+
+    try:
+        names = md_files.get_notes_list()
+        bench("get_notes_list_cold", lambda i: md_files.get_notes_list(), 3, n_notes,
+              setup=lambda: vault_scan._scanners.clear())
+        bench("get_notes_list_warm", lambda i: md_files.get_notes_list(), 20, n_notes)
+
+        picks = [rng.choice(names) for _ in range(1001)]
+        bench("get_note_content", lambda i: md_files.get_note_content(picks[i]), 1000)
+
+        scratch = os.path.join(vault, "_bench")
+        os.makedirs(scratch, exist_ok=True)
+        body = md_files.get_note_content(names[0])
+        try:
+            bench("create_note", lambda i: md_files.create_note(f"_bench/Created {i}", body, ["bench"]), 200)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        vault_scan._scanners.clear()
+
+        def clear_index():
+            for path in (md_files.INDEX_PATH, md_files.META_PATH, md_files.MANIFEST_PATH, md_files.BM25_PATH):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        bench("reindex_notes_full", lambda i: md_files.reindex_notes(incremental=False), 1, n_notes, setup=clear_index)
+        bench("reindex_notes_noop", lambda i: md_files.reindex_notes(incremental=True), 3, n_notes)
+
+        from benchmarks.synth_vault import load_queries
+        queries = load_queries(vault)
+        n_queries = min(200, len(queries) - 1)
+        if os.path.exists(md_files.INDEX_PATH) and n_queries > 0:
+            hits = []
+            md_files.search_notes(queries[-1]["query"])  # open the index before timing
+            bench("search_notes", lambda i: hits.append(
+                bool(set(md_files.search_notes(queries[i]["query"])) & set(queries[i]["answers"]))), n_queries)
+            if results and results[-1]["name"] == "search_notes":
+                results[-1]["recall_at_5"] = sum(hits[:n_queries]) / n_queries
+
+        texts = [_sample_text(rng, names) for _ in range(21)]
+        insert_links_to_existing_notes(texts[0], names)  # build the linker before timing
+        bench("insert_links", lambda i: insert_links_to_existing_notes(texts[i], names), 20)
+
+        notes = [md_files.get_note_content(name) for name in picks[:1001]]
+        evaluate_note(notes[0], names)
+        bench("evaluate_note", lambda i: evaluate_note(notes[i], names), 1000)
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+#### Reporting and comparison
+
+def _environment(encoder: str) -> dict:
+    import subprocess
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "encoder": encoder, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list[dict]:
+    """
+    Compare two result files benchmark by benchmark.
+
+    A benchmark regresses when its p50 latency grew, or its throughput dropped, by more
+    than `threshold` (a fraction). Latencies under 0.05 ms are too noisy to flag.
+
+    Returns:
+        list[dict]: One row per benchmark present in both runs with "name", "size",
+            "p50_change", "throughput_change" and "regression".
+    """
+    old = {(r["name"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        before = old.get((r["name"], r["size"]))
+        if before is None:
+            continue
+        p50_change = r["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        tput_change = r["items_per_s"] / before["items_per_s"] - 1 if before["items_per_s"] else 0.0
+        noisy = max(r["p50_ms"], before["p50_ms"]) < 0.05
+        rows.append({"name": r["name"], "size": r["size"], "p50_change": p50_change,
+                     "throughput_change": tput_change,
+                     "regression": not noisy and (p50_change > threshold or tput_change < -threshold)})
+    return rows
+
+
+def print_comparison(rows: list[dict]) -> None:
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"  {row['name']:<24} {row['size']:>8}  p50 {row['p50_change']:+7.1%}  "
+              f"throughput {row['throughput_change']:+7.1%}  {flag}")
+
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark the vault I/O, indexing, linking and evaluation paths.")
+    sub = parser.add_subparsers(dest="command")
+    cmp_parser = sub.add_parser("compare", help="Compare two result files and flag regressions.")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (default: %(default)s).")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated vault sizes (default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the generated vaults.")
+    parser.add_argument("--only", help="Comma-separated benchmark names to run.")
+    parser.add_argument("--real-encoder", action="store_true", help="Embed with the real SentenceTransformer model.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak-memory call.")
+    parser.add_argument("--output", help="Results file (default: data/bench/results-<time>.json).")
+    parser.add_argument("--baseline", help="Compare against this results file afterwards.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (default: %(default)s).")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        rows = compare(_load(args.baseline), _load(args.current), args.threshold)
+        print_comparison(rows)
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    if not args.real_encoder:
+        from tools.search_engine import set_embedding_model
+        set_embedding_model(StubEncoder())
+    only = set(args.only.split(",")) if args.only else None
+    run = {"environment": _environment("sentence-transformers" if args.real_encoder else "stub"), "results": []}
+    for size in (int(s) for s in args.sizes.split(",")):
+        run["results"].extend(run_size(size, args.seed, memory=not args.no_memory, only=only))
+
+    output = args.output or os.path.join(BENCH_DIR, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        rows = compare(_load(args.baseline), run, args.threshold)
+        print_comparison(rows)
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
@@ -0,0 +1,322 @@
+"""Deterministic synthetic Obsidian vaults for scale testing.
+
+`generate_vault(root, n_notes, seed)` writes a vault that looks like a real one to
+every tool in the repo:
+
+- frontmatter in the format `create_note` writes (`created`, `tags`, `tool_version`,
+  `aliases`), some notes tagged `llm-generated`;
+- notes spread over nested folders, plus an `.obsidian` config folder and an
+  `Excalidraw` folder holding `.md` files that must be excluded;
+- sections with headings, one `^summary` block per note, inline #tags, callouts and
+  fenced code blocks;
+- wikilinks, some with `|alias` text or `#Heading` / `#^summary` anchors, whose targets
+  follow a power law so a few hub notes collect most backlinks.
+
+The same seed and size always give the same files, whatever the number of workers:
+names, aliases and key terms are drawn up front, and each note body comes from its
+own RNG seeded by (seed, note number). Bodies are written in parallel by a process pool.
+
+Alongside the vault, `.synth/queries.jsonl` holds a query/answer set for retrieval
+benchmarks (key-term, title and alias queries with the notes that answer them) and
+`.synth/manifest.json` records the parameters.
+"""
+import itertools
+import json
+import os
+import random
+from bisect import bisect
+
+from tools.md_files import format_frontmatter
+
+SYNTH_DIR = ".synth"
+CONSONANTS, VOWELS = "bcdfghklmnprstvz", "aeiou"
+SYLLABLES = [c + v for c in CONSONANTS for v in VOWELS]
+SECTIONS = ["Overview", "Details", "Examples", "Open Questions", "References"]
+CALLOUTS = ["note", "tip", "warning", "info", "question"]
+LANGUAGES = ["python", "bash", "json", "sql"]
+TAGS = ["project", "idea", "reading", "meeting", "research", "daily", "reference", "todo"]
+
+
+def pseudo_word(k: int, syllables: int = 4) -> str:
+    """The k-th pseudo-word of the given syllable count; distinct k give distinct words."""
+    parts = []
+    for _ in range(syllables):
+        k, r = divmod(k, len(SYLLABLES))
+        parts.append(SYLLABLES[r])
+    return "".join(parts)
+
+
+def common_vocabulary(seed: int, size: int = 4000) -> list[str]:
+    """Everyday body words, ordered by (Zipf) frequency rank."""
+    rng = random.Random(f"{seed}:vocab")
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def _power_law_weights(n: int, exponent: float):
+    return list(itertools.accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+
+
+class _Plan:
+    """Everything about the vault that is decided before any body is written."""
+
+    def __init__(self, n_notes: int, seed: int, link_exponent: float):
+        rng = random.Random(f"{seed}:plan")
+        self.seed = seed
+        self.vocab = common_vocabulary(seed)
+        self.title_words = [w.capitalize() for w in self.vocab[200:]]
+
+        # Nested folders, about 200 notes per folder, up to three levels deep
+        self.folders = [""]
+        for i in range(max(1, n_notes // 200)):
+            parent = rng.choice(self.folders) if rng.random() < 0.6 else ""
+            depth = parent.count("/") + 1 if parent else 0
+            if depth >= 3:
+                parent = ""
+            name = f"{rng.choice(self.title_words)} {i}"
+            self.folders.append(f"{parent}/{name}" if parent else name)
+
+        self.names, seen = [], set()
+        while len(self.names) < n_notes:
+            title = " ".join(rng.choice(self.title_words) for _ in range(rng.randint(1, 4)))
+            folder = rng.choice(self.folders)
+            if title.lower() in seen:
+                continue
+            seen.add(title.lower())  # unique file names keep [[Title]] links unambiguous
+            self.names.append(f"{folder}/{title}" if folder else title)
+
+        # Distinctive terms make each note findable by keyword; rare words never repeat
+        rare = rng.sample(range(len(SYLLABLES) ** 4), 2 * n_notes)
+        self.key_terms = [(pseudo_word(rare[2 * i]), pseudo_word(rare[2 * i + 1]), rng.choice(self.vocab[50:400]))
+                          for i in range(n_notes)]
+        self.aliases = [[f"{t[0].capitalize()} {rng.choice(self.title_words)}" for _ in range(rng.choice((0, 0, 1, 2)))]
+                        for t in self.key_terms]
+
+        # Link popularity follows a power law over a random ranking of the notes
+        self.by_rank = list(range(n_notes))
+        rng.shuffle(self.by_rank)
+        self.link_weights = _power_law_weights(n_notes, link_exponent)
+        # Body text is cut from a long Zipf-distributed word stream; far cheaper than
+        # sampling every word and just as realistic for the tools reading it
+        self.word_stream = rng.choices(self.vocab, cum_weights=_power_law_weights(len(self.vocab), 1.0), k=1 << 18)
+
+    def link_target(self, rng: random.Random) -> int:
+        return self.by_rank[bisect(self.link_weights, rng.random() * self.link_weights[-1])]
+
+    def words(self, rng: random.Random, k: int) -> list[str]:
+        start = rng.randrange(len(self.word_stream) - k)
+        return self.word_stream[start:start + k]
+
+
+def _link(plan: _Plan, rng: random.Random) -> str:
+    target = plan.link_target(rng)
+    title = os.path.basename(plan.names[target])
+    roll = rng.random()
+    if roll < 0.15:
+        anchor = f"#{rng.choice(SECTIONS[:2])}"
+    elif roll < 0.2:
+        anchor = "#^summary"
+    else:
+        anchor = ""
+    if rng.random() < 0.2:
+        display = rng.choice(plan.aliases[target]) if plan.aliases[target] else " ".join(plan.words(rng, 2))
+        return f"[[{title}{anchor}|{display}]]"
+    return f"[[{title}{anchor}]]"
+
+
+def _paragraph(plan: _Plan, rng: random.Random, i: int, n_words: int) -> str:
+    words = plan.words(rng, n_words)
+    for term in plan.key_terms[i]:
+        if rng.random() < 0.7:
+            words.insert(rng.randrange(len(words) + 1), term)
+    for _ in range(rng.choice((0, 1, 1, 2, 3))):
+        words.insert(rng.randrange(len(words) + 1), _link(plan, rng))
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words) + 1), f"#{rng.choice(TAGS)}")
+    text = " ".join(words)
+    return text[0].upper() + text[1:] + "."
+
+
+def render_note(plan: _Plan, i: int) -> str:
+    """The full text of note `i`."""
+    rng = random.Random(f"{plan.seed}:note:{i}")
+    tags = rng.sample(TAGS, rng.randint(1, 3))
+    if rng.random() < 0.3:
+        tags.insert(0, "llm-generated")
+    created = f"20{rng.randint(19, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    properties = {"created": created, "tags": tags, "tool_version": None}
+    if plan.aliases[i]:
+        properties["aliases"] = plan.aliases[i]
+
+    title = os.path.basename(plan.names[i])
+    parts = [f"# {title}", _paragraph(plan, rng, i, rng.randint(20, 50)) + " ^summary"]
+    for section in SECTIONS[:rng.randint(2, len(SECTIONS))]:
+        parts.append(f"## {section}")
+        for _ in range(rng.randint(1, 3)):
+            parts.append(_paragraph(plan, rng, i, rng.randint(25, 90)))
+        roll = rng.random()
+        if roll < 0.15:
+            heading = " ".join(plan.words(rng, 3)).capitalize()
+            parts.append(f"> [!{rng.choice(CALLOUTS)}] {heading}\n> {_paragraph(plan, rng, i, 15)}")
+        elif roll < 0.25:
+            code = "\n".join(f"{a} = {b}({c})  # {d}" for a, b, c, d in (plan.words(rng, 4) for _ in range(rng.randint(2, 6))))
+            parts.append(f"```{rng.choice(LANGUAGES)}\n{code}\n```")
+    return format_frontmatter(properties) + "\n" + "\n\n".join(parts) + "\n"
+
+
+#### Parallel writing
+
+_plan = None
+_root = None
+
+
+def _init_worker(plan: _Plan, root: str) -> None:
+    global _plan, _root
+    _plan, _root = plan, root
+
+
+def _write_range(bounds: tuple[int, int]) -> int:
+    start, end = bounds
+    for i in range(start, end):
+        with open(os.path.join(_root, _plan.names[i] + ".md"), "w", encoding="utf-8") as f:
+            f.write(render_note(_plan, i))
+    return end - start
+
+
+def _write_app_files(root: str, rng: random.Random, n_drawings: int) -> None:
+    """The .obsidian config and Excalidraw drawings, including .md files tools must skip."""
+    config = os.path.join(root, ".obsidian")
+    os.makedirs(os.path.join(config, "plugins", "obsidian-excalidraw-plugin"), exist_ok=True)
+    os.makedirs(os.path.join(config, "snippets"), exist_ok=True)
+    files = {
+        "app.json": {"alwaysUpdateLinks": True, "newFileLocation": "root"},
+        "appearance.json": {"baseFontSize": 16},
+        "core-plugins.json": ["file-explorer", "global-search", "backlink", "graph", "tag-pane"],
+        "community-plugins.json": ["obsidian-excalidraw-plugin"],
+    }
+    for name, data in files.items():
+        with open(os.path.join(config, name), "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    with open(os.path.join(config, "plugins", "obsidian-excalidraw-plugin", "README.md"), "w", encoding="utf-8") as f:
+        f.write("# Excalidraw plugin\n\nNot a note.\n")
+    with open(os.path.join(config, "snippets", "notes.md"), "w", encoding="utf-8") as f:
+        f.write("Not a note either.\n")
+
+    drawings = os.path.join(root, "Excalidraw")
+    os.makedirs(drawings, exist_ok=True)
+    for k in range(n_drawings):
+        stamp = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}.{rng.randint(0, 59):02d}.{k:02d}"
+        with open(os.path.join(drawings, f"Drawing {stamp}.excalidraw.md"), "w", encoding="utf-8") as f:
+            f.write("---\nexcalidraw-plugin: parsed\ntags: [excalidraw]\n---\n\n# Text Elements\n"
+                    f"Sketch {k} ^t{k}\n\n%%\n# Drawing\n```json\n{{\"type\":\"excalidraw\",\"elements\":[]}}\n```\n%%\n")
+
+
+def build_queries(plan: _Plan, n_queries: int, seed: int) -> list[dict]:
+    """
+    Query/answer pairs for retrieval benchmarks.
+
+    Returns:
+        list[dict]: {"query", "type", "answers"} records. "keyword" queries use a note's
+            two rare key terms, "title" queries its title words in lowercase, and "alias"
+            queries one of its aliases; answers are note names as in `get_notes_list`.
+    """
+    rng = random.Random(f"{seed}:queries")
+    picks = rng.sample(range(len(plan.names)), min(n_queries, len(plan.names)))
+    queries = []
+    for n, i in enumerate(picks):
+        kind = ("keyword", "title", "alias")[n % 3]
+        if kind == "alias" and not plan.aliases[i]:
+            kind = "keyword"
+        if kind == "keyword":
+            query = f"{plan.key_terms[i][0]} {plan.key_terms[i][1]}"
+        elif kind == "title":
+            query = os.path.basename(plan.names[i]).lower()
+        else:
+            query = rng.choice(plan.aliases[i])
+        queries.append({"query": query, "type": kind, "answers": [plan.names[i]]})
+    return queries
+
+
+def generate_vault(root: str, n_notes: int, seed: int = 0, workers: int = None, link_exponent: float = 1.1,
+                   n_queries: int = 1000, verbose: bool = False) -> dict:
+    """
+    Write a synthetic vault of `n_notes` notes under `root`.
+
+    Args:
+        root (str): Vault folder; created if missing. Existing notes with the same names are overwritten.
+        n_notes (int): Number of notes.
+        seed (int): Seed; the same seed and size always produce the same vault. Defaults to 0.
+        workers (int): Writer processes. Defaults to the number of CPUs.
+        link_exponent (float): Power-law exponent of link target popularity. Defaults to 1.1.
+        n_queries (int): Size of the query/answer set. Defaults to 1000.
+        verbose (bool): Print progress.
+
+    Returns:
+        dict: The manifest written to `.synth/manifest.json`.
+    """
+    from multiprocessing import Pool
+
+    plan = _Plan(n_notes, seed, link_exponent)
+    for folder in plan.folders:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+    _write_app_files(root, random.Random(f"{seed}:app"), n_drawings=max(1, min(50, n_notes // 1000)))
+
+    chunk = 2000
+    ranges = [(start, min(start + chunk, n_notes)) for start in range(0, n_notes, chunk)]
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    if workers <= 1:
+        _init_worker(plan, root)
+        chunks = map(_write_range, ranges)
+    else:
+        pool = Pool(workers, initializer=_init_worker, initargs=(plan, root))
+        chunks = pool.imap_unordered(_write_range, ranges)
+    try:
+        for count in chunks:
+            written += count
+            if verbose:
+                print(f"\rWrote {written}/{n_notes} notes", end="", flush=True)
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+    if verbose:
+        print()
+
+    synth = os.path.join(root, SYNTH_DIR)
+    os.makedirs(synth, exist_ok=True)
+    with open(os.path.join(synth, "queries.jsonl"), "w", encoding="utf-8") as f:
+        for query in build_queries(plan, n_queries, seed):
+            f.write(json.dumps(query) + "\n")
+    manifest = {"notes": n_notes, "seed": seed, "link_exponent": link_exponent,
+                "folders": len(plan.folders), "queries": min(n_queries, n_notes)}
+    with open(os.path.join(synth, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_queries(root: str) -> list[dict]:
+    """Read the query/answer set written by `generate_vault`."""
+    with open(os.path.join(root, SYNTH_DIR, "queries.jsonl"), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic Obsidian vault.")
+    parser.add_argument("root", help="Folder to write the vault into.")
+    parser.add_argument("--notes", type=int, default=10_000, help="Number of notes (default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: %(default)s).")
+    parser.add_argument("--workers", type=int, default=None, help="Writer processes (default: CPU count).")
+    parser.add_argument("--link-exponent", type=float, default=1.1, help="Power-law exponent of link targets.")
+    parser.add_argument("--queries", type=int, default=1000, help="Size of the query/answer set.")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    generate_vault(args.root, args.notes, args.seed, args.workers, args.link_exponent, args.queries, verbose=True)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
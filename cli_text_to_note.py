@@ -16,6 +16,8 @@ def main():
     parser.add_argument("text", type=str, help="The text to process and convert into a note.")
     parser.add_argument("note_name", type=str, help="The name of the markdown note to create.")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output.")
+    parser.add_argument("--stream", action="store_true", help="Stream the note to the terminal and the vault as it is generated.")
+    parser.add_argument("--chunk-tokens", type=int, default=None, help="Split inputs longer than this many tokens and generate the note map-reduce style (default: CHUNK_TOKENS, 32000; 0 turns it off).")
     args = parser.parse_args()
 
     text = args.text
@@ -26,7 +28,7 @@ def main():
         print(f"Processing text: {text}")
 
     # Process the text and generate the note
-    content = obsidify_text(text, note_name, verbose=args.verbose, ignore_token_limit=True, insert_links=True)
+    content = obsidify_text(text, note_name, verbose=args.verbose, ignore_token_limit=True, insert_links=True, stream=args.stream, chunk_tokens=args.chunk_tokens)
     if content:
         print(f"Note created: {note_name}.md")
     else:
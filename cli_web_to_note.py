@@ -13,6 +13,8 @@ def main():
     parser.add_argument("url_or_query", type=str, help="The URL or query to extract content from.")
     parser.add_argument("note_name", type=str, help="The name of the markdown note to create.")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output.")
+    parser.add_argument("--stream", action="store_true", help="Stream the note to the terminal and the vault as it is generated.")
+    parser.add_argument("--chunk-tokens", type=int, default=None, help="Split inputs longer than this many tokens and generate the note map-reduce style (default: CHUNK_TOKENS, 32000; 0 turns it off).")
     args = parser.parse_args()
 
     url_or_query = args.url_or_query
@@ -39,12 +41,12 @@ def main():
 
     if urls:
         extra_properties = {"source_url": urls}
-        generate_single_note_from_urls(urls, note_name, insert_links=True, verbose=args.verbose)
+        generate_single_note_from_urls(urls, note_name, insert_links=True, verbose=args.verbose, stream=args.stream, chunk_tokens=args.chunk_tokens)
     elif url:
         print(f"Fetching content from: {url}")
         extra_properties = {"source_url": url}
         content = extract_main_content(url)
-        obsidify_text(content, note_name, ignore_token_limit=True, insert_links=True, extra_properties=extra_properties, verbose=args.verbose)
+        obsidify_text(content, note_name, ignore_token_limit=True, insert_links=True, extra_properties=extra_properties, verbose=args.verbose, stream=args.stream, chunk_tokens=args.chunk_tokens)
     else:
         print("No content found.")
     print(f"Note created: {note_name}.md")
@@ -0,0 +1,92 @@
+"""`dspy.LM` backed by the project-wide response cache in `tools.llm_cache`.
+
+dspy's own cache has no size bound or expiry and is separate from the cache used for
+raw OpenAI clients. `CachedLM` answers repeated requests from `tools.llm_cache`
+instead and is always built with dspy's cache turned off, so each response is stored
+exactly once, under one eviction and TTL policy.
+
+Every response, cached or not, is also recorded in the usage ledger
+(`tools.token_usage`) with its token counts and latency.
+"""
+import time
+
+import dspy
+
+from tools.llm_cache import CACHE_PATH, cache_key, get_response_cache
+from tools.token_usage import record_response_usage
+
+
+class CachedLM(dspy.LM):
+    """
+    Drop-in `dspy.LM` whose completions go through `tools.llm_cache`.
+
+    Takes the same arguments as `dspy.LM`. `cache=False`, for the LM or a single call,
+    (or `LLM_CACHE=off`) sends every call to the model; `response_cache_path` picks the
+    cache database.
+    """
+
+    def __init__(self, *args, cache: bool = True, response_cache_path: str = CACHE_PATH, **kwargs):
+        # dspy's cache is off for good; `cache` only switches the response cache
+        super().__init__(*args, cache=False, **kwargs)
+        self.response_cache = cache
+        self.response_cache_path = response_cache_path
+
+    def _cache_lookup(self, prompt, messages, kwargs):
+        """
+        Return (cache, key, stored response) for a request, or (None, None, None) if uncached.
+
+        Pops the per-call `cache` flag from `kwargs`: the request dspy builds must not
+        carry it, since litellm also receives its own `cache` argument.
+        """
+        use_cache = kwargs.pop("cache", self.response_cache)
+        cache = get_response_cache(self.response_cache_path)
+        if not use_cache or not cache.active:
+            return None, None, None
+        messages = messages or [{"role": "user", "content": prompt}]
+        key = cache_key(self.model, messages, {**self.kwargs, **kwargs}, endpoint=self.model_type)
+        return cache, key, cache.get(key)
+
+    @staticmethod
+    def _restore(stored):
+        from litellm import ModelResponse
+        response = ModelResponse(**stored)
+        response.cache_hit = True  # dspy skips usage tracking for cache hits
+        return response
+
+    def _store(self, cache, key, response) -> None:
+        try:
+            cache.put(key, self.model, response.model_dump())
+        except (AttributeError, TypeError):
+            pass  # not a chat ModelResponse (e.g. text completions); leave it uncached
+
+    def _record(self, response, started: float, prompt, messages, cached: bool = False) -> None:
+        messages = messages or [{"role": "user", "content": prompt}]
+        record_response_usage(self.model, response, time.perf_counter() - started, cached=cached,
+                              source="dspy", messages=messages)
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        started = time.perf_counter()
+        cache, key, stored = self._cache_lookup(prompt, messages, kwargs)
+        if stored is not None:
+            response = self._restore(stored)
+            self._record(response, started, prompt, messages, cached=True)
+            return response
+        response = super().forward(prompt=prompt, messages=messages, **kwargs)
+        if cache is not None:
+            self._store(cache, key, response)
+        self._record(response, started, prompt, messages)
+        return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        started = time.perf_counter()
+        cache, key, stored = self._cache_lookup(prompt, messages, kwargs)
+        if stored is not None:
+            response = self._restore(stored)
+            self._record(response, started, prompt, messages, cached=True)
+            return response
+        # dspy 2.6's aforward leaves out the LM's own kwargs (api_base, temperature, ...)
+        response = await super().aforward(prompt=prompt, messages=messages, **{**self.kwargs, **kwargs})
+        if cache is not None:
+            self._store(cache, key, response)
+        self._record(response, started, prompt, messages)
+        return response
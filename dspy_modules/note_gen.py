@@ -33,6 +33,73 @@ class NoteGenerator(dspy.Module):
         obs_note = self.generate_note(context=context, note_list=note_list)
         return obs_note
 
+
+class ExtractKeyPoints(dspy.Signature):
+    """Extracts everything worth keeping from one part of a longer text as concise markdown bullet points: facts, ideas, definitions, arguments and examples, with names, numbers and terms kept exact."""
+    context = InputField(desc="One part of a longer text")
+    key_points = OutputField(desc="Markdown bullet points")
+
+
+class KeyPointsExtractor(dspy.Module):
+    """
+    Map step of map-reduce note generation for inputs too long for one prompt.
+
+    Key points are extracted from every chunk concurrently. Each chunk is its own
+    request, so with a `CachedLM` re-running on a text that shares chunks only sends
+    the new ones. If the combined key points are still over
+    `max_tokens`, neighbouring parts are condensed again until they fit. The result is
+    the context for `NoteGenerator`, which does the reduce step.
+
+    Args:
+        max_workers (int): Chunks processed at once. Defaults to 4.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        super().__init__()
+        self.extract = dspy.Predict(ExtractKeyPoints)
+        self.max_workers = max_workers
+
+    def _extract_one(self, chunk: str) -> str:
+        return self.extract(context=chunk).key_points
+
+    def _map(self, chunks: List[str]) -> List[str]:
+        import contextvars
+        from concurrent.futures import ThreadPoolExecutor
+
+        if len(chunks) == 1:
+            return [self._extract_one(chunks[0])]
+        # dspy.context overrides are thread-local, so the workers re-enter them
+        config = dspy.settings.config
+
+        def extract(chunk: str) -> str:
+            with dspy.context(**config):
+                return self._extract_one(chunk)
+
+        # Each worker runs in a copy of the caller's context (usage pipeline)
+        contexts = [contextvars.copy_context() for _ in chunks]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            return list(executor.map(lambda context, chunk: context.run(extract, chunk), contexts, chunks))
+
+    def forward(self, chunks: List[str], max_tokens: int) -> dspy.Prediction:
+        from tools.token_usage import count_tokens
+
+        model = getattr(dspy.settings.lm, "model", None)
+        parts = self._map(chunks)
+        while len(parts) > 1 and count_tokens("\n\n".join(parts), model) > max_tokens:
+            # Condense runs of neighbouring parts that fit in one prompt, at least two at a time
+            groups, group, group_tokens = [], [], 0
+            for part in parts:
+                tokens = count_tokens(part, model)
+                if len(group) >= 2 and group_tokens + tokens > max_tokens:
+                    groups.append(group)
+                    group, group_tokens = [], 0
+                group.append(part)
+                group_tokens += tokens
+            groups.append(group)
+            parts = self._map(["\n\n".join(group) for group in groups])
+        context = "\n\n".join(f"## Part {i}\n\n{part.strip()}" for i, part in enumerate(parts, 1))
+        return dspy.Prediction(context=context, key_points=parts)
+
 ####################
 #### Evaluation ####
 ####################
@@ -40,43 +107,124 @@ class NoteGenerator(dspy.Module):
 
 
 #### Properties/Metadata
-import re, yaml, json, textwrap
+import re, yaml, json, textwrap, os, bisect
 from typing import List
 from pathlib import Path
+from tools.md_files import FENCE_RE, HEADING_RE, WIKILINK_RE
+
+FRONT_MATTER_RE = re.compile(r"^---\s*\n(.*?)\n---", re.DOTALL)
+BLANK_LINE_RE = re.compile(r"\s*\n\n")
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class ParsedNote:
+    """
+    A note split into the parts the evaluation checks look at, parsed once.
+
+    Every check in `ALL_EVALS` reads a `ParsedNote`, so the checks agree however they
+    are called. Headings and links inside fenced code blocks are ignored, so a
+    `# comment` in a Python block is not taken for an H1, and both ``` and ~~~ fence
+    lines open and close code blocks.
+
+    Attributes:
+        has_front_matter (bool): The note opens with a `---` line.
+        front_matter (str | None): Raw text between the `---` fences.
+        properties (dict | None): Parsed frontmatter, or None if absent or invalid YAML.
+        yaml_error (str | None): Parser message when the frontmatter is invalid.
+        blank_line_after_front_matter (bool): A blank line separates frontmatter and body.
+        body (str): Text after the frontmatter.
+        headings (list[int]): Heading levels, in order.
+        links (list[str]): Raw `[[...]]` link contents, in order.
+        fences (list[tuple[int, int]]): (start, end) offsets of fenced code blocks in `body`.
+        fences_closed (bool): Every code fence has a closing fence.
+    """
+
+    __slots__ = ("has_front_matter", "front_matter", "properties", "yaml_error",
+                 "blank_line_after_front_matter", "body", "headings", "links", "fences", "fences_closed")
+
+    def __init__(self, note: str):
+        self.has_front_matter = note.startswith("---") and bool(re.match(r"---\s*\n", note))
+        self.front_matter = self.properties = self.yaml_error = None
+        self.blank_line_after_front_matter = False
+        m = FRONT_MATTER_RE.match(note) if self.has_front_matter else None
+        if m:
+            self.front_matter = m.group(1)
+            block = self.front_matter.strip()
+            try:
+                props = yaml.load(block if block.startswith("{") else textwrap.dedent(block), Loader=YAML_LOADER)
+                self.properties = props if isinstance(props, dict) else {}
+            except yaml.YAMLError as e:
+                self.yaml_error = str(e)
+            self.blank_line_after_front_matter = bool(BLANK_LINE_RE.match(note, m.end()))
+            body = note[m.end():]
+        else:
+            body = note
+        self.body = body
+
+        # Pair fence lines into spans; a fence only closes with the same marker
+        self.fences, open_at, marker = [], None, None
+        for f in FENCE_RE.finditer(body):
+            if open_at is None:
+                open_at, marker = f.start(), f.group(1)
+            elif f.group(1) == marker:
+                end = body.find("\n", f.end())
+                self.fences.append((open_at, len(body) if end == -1 else end))
+                open_at = None
+        self.fences_closed = open_at is None
+        if open_at is not None:
+            self.fences.append((open_at, len(body)))
+
+        starts = [start for start, _ in self.fences]
+
+        def in_code(pos: int) -> bool:
+            i = bisect.bisect_right(starts, pos) - 1
+            return i >= 0 and pos < self.fences[i][1]
+
+        self.headings = [len(h.group(1)) for h in HEADING_RE.finditer(body) if not in_code(h.start())]
+        self.links = [l.group(1) for l in WIKILINK_RE.finditer(body) if not in_code(l.start())]
+
+    def first_line(self) -> str | None:
+        """First non-blank line of the body, or None if it is empty."""
+        for line in self.body.strip().splitlines():
+            if line.strip():
+                return line
+        return None
+
+
+def _parsed(note) -> ParsedNote:
+    """The checks take a note's text or an already parsed note."""
+    return note if isinstance(note, ParsedNote) else ParsedNote(note)
+
 
 #YAML or JSON block right at the top (front matter)
 def has_yaml_front_matter(note: str, verbose: bool = False) -> bool:
-    result = bool(re.match(r"^---\s*\n", note))
+    result = _parsed(note).has_front_matter
     if verbose:
         print(f"  - Front matter check: {'Found' if result else 'Not found'}")
     return result
 
 #Can we parse the properties cleanly?
 def properties_parse_clean(note: str, verbose: bool = False) -> bool:
-    m = re.match(r"^---\s*\n(.*?)\n---", note, re.DOTALL)
-    if not m:
+    parsed = _parsed(note)
+    if parsed.front_matter is None:
         if verbose:
             print("  - Properties parsing: Failed to find front matter block")
         return False
-    block = m.group(1).strip()
-    try:
-        yaml.safe_load(block if block.startswith("{") else textwrap.dedent(block))
-        if verbose:
+    result = parsed.yaml_error is None
+    if verbose:
+        if result:
             print("  - Properties parsing: Valid YAML/JSON")
-        return True
-    except yaml.YAMLError as e:
-        if verbose:
-            print(f"  - Properties parsing: Invalid YAML/JSON - {str(e)}")
-        return False
+        else:
+            print(f"  - Properties parsing: Invalid YAML/JSON - {parsed.yaml_error}")
+    return result
 
 #Does it include at least one 'tags' property (YAML list or string)?
 def tags_property_present(note: str, verbose: bool = False) -> bool:
-    m = re.match(r"^---\s*\n(.*?)\n---", note, re.DOTALL)
-    if not m:
+    props = _parsed(note).properties
+    if props is None:
         if verbose:
             print("  - Tags property: No front matter found")
         return False
-    props = yaml.safe_load(m.group(1))
     result = "tags" in props and bool(props["tags"])
     if verbose:
         if "tags" in props:
@@ -87,15 +235,14 @@ def tags_property_present(note: str, verbose: bool = False) -> bool:
 
 #Ensure any **required** properties (e.g. aliases, created) are present
 REQUIRED = {"aliases", "created"}
-def required_properties_present(note: str, verbose: bool = False) -> bool:
-    m = re.match(r"^---\s*\n(.*?)\n---", note, re.DOTALL)
-    if not m:
+def required_properties_present(note: str, verbose: bool = False, required: set = REQUIRED) -> bool:
+    props = _parsed(note).properties
+    if props is None:
         if verbose:
             print("  - Required properties: No front matter found")
         return False
-    props = yaml.safe_load(m.group(1))
-    missing = REQUIRED - props.keys()
-    result = REQUIRED.issubset(props.keys())
+    missing = required - props.keys()
+    result = not missing
     if verbose:
         if result:
             print("  - Required properties: All present")
@@ -123,20 +270,26 @@ def required_properties_present(note: str, verbose: bool = False) -> bool:
 #             return False
 #     return True
 
-WIKILINK_RE = re.compile(r"\[\[([^\]]+?)\]\]")
+def _evaluator_for(vault_files) -> "NoteEvaluator":
+    """The link checks take a note list or the NoteEvaluator built from it."""
+    return vault_files if isinstance(vault_files, NoteEvaluator) else get_evaluator(vault_files)
 
 #Your original, but now supports heading and block anchors
 def links_exist(note: str, vault_files: List[str], verbose: bool = False) -> bool:
-    links_found = WIKILINK_RE.findall(note)
+    evaluator = _evaluator_for(vault_files)
+    links_found = _parsed(note).links
     if verbose:
         print(f"  - Links check: Found {len(links_found)} wiki links")
     
     for raw in links_found:
         target = raw.split("|")[0]           # strip alias
         target = target.split("#")[0]        # strip heading or block
-        if target not in vault_files:
+        if not evaluator.resolves(target):
             if verbose:
-                print(f"  - Links check: '{target}' not found in vault")
+                from tools.name_index import get_name_index
+                suggestion = get_name_index(sorted(evaluator.vault)).resolve(target)
+                hint = f" (closest: '{suggestion[0]}', score {suggestion[1]:.2f})" if suggestion else ""
+                print(f"  - Links check: '{target}' not found in vault{hint}")
             return False
     
     if verbose and links_found:
@@ -145,13 +298,14 @@ def links_exist(note: str, vault_files: List[str], verbose: bool = False) -> boo
 
 #Check that any [[note|Alias]] aliases resolve to real files
 def aliases_resolve(note: str, vault_files: List[str], verbose: bool = False) -> bool:
-    aliases_found = [raw for raw in WIKILINK_RE.findall(note) if "|" in raw]
+    evaluator = _evaluator_for(vault_files)
+    aliases_found = [raw for raw in _parsed(note).links if "|" in raw]
     if verbose:
         print(f"  - Aliases check: Found {len(aliases_found)} aliased links")
     
     for raw in aliases_found:
         target = raw.split("|")[0]
-        if target.split('#')[0] not in vault_files:
+        if not evaluator.resolves(target.split('#')[0]):
             if verbose:
                 print(f"  - Aliases check: '{target}' not found in vault")
             return False
@@ -163,31 +317,24 @@ def aliases_resolve(note: str, vault_files: List[str], verbose: bool = False) ->
 
 
 #### Markdown Structuring
-#First non-blank line should be an H1 title
+#First non-blank line after the front matter should be an H1 title
 def has_title_heading(note: str, verbose: bool = False) -> bool:
-    # Skip frontmatter if present
-    content = note
-    if note.startswith('---'):
-        frontmatter_end = note.find('---', 3)
-        if frontmatter_end != -1:
-            content = note[frontmatter_end + 3:].strip()
-    
-    # Look for first non-empty line in content after frontmatter
-    for line in content.splitlines():
-        if line.strip():                       # first non-empty
-            result = line.startswith("# ")
-            if verbose:
-                if result:
-                    print("  - Title heading: Found H1 title")
-                else:
-                    print(f"  - Title heading: First content line is not H1: '{line[:40]}...'")
-            return result
+    line = _parsed(note).first_line()
+    if line is None:
+        if verbose:
+            print("  - Title heading: Note appears empty")
+        return False
+    result = line.startswith("# ")
     if verbose:
-        print("  - Title heading: Note appears empty")
-    return False
+        if result:
+            print("  - Title heading: Found H1 title")
+        else:
+            print(f"  - Title heading: First content line is not H1: '{line[:40]}...'")
+    return result
+
 #Prevent skipping H-levels (## followed by ####)
 def heading_levels_monotonic(note: str, verbose: bool = False) -> bool:
-    levels = [len(m.group(1)) for m in re.finditer(r"^(#{1,6})\s", note, re.MULTILINE)]
+    levels = _parsed(note).headings
     if not levels:
         if verbose:
             print("  - Heading levels: No headings found")
@@ -204,20 +351,20 @@ def heading_levels_monotonic(note: str, verbose: bool = False) -> bool:
             print(f"  - Heading levels: Found {len(problems)} heading level skip(s)")
     return result
 
-#Make sure any triple-backtick code blocks close
+#Make sure any ``` or ~~~ code blocks close
 def code_blocks_closed(note: str, verbose: bool = False) -> bool:
-    count = note.count("```")
-    result = count % 2 == 0
+    parsed = _parsed(note)
+    result = parsed.fences_closed
     if verbose:
         if result:
-            print(f"  - Code blocks: Found {count//2} properly closed code blocks")
+            print(f"  - Code blocks: Found {len(parsed.fences)} properly closed code blocks")
         else:
-            print(f"  - Code blocks: Unclosed code block detected ({count} backtick markers)")
+            print("  - Code blocks: Unclosed code block detected")
     return result
 
 #Cosmetic: blank line after the front matter
 def blank_line_after_front_matter(note: str, verbose: bool = False) -> bool:
-    result = bool(re.match(r"^---\s*\n.*?\n---\s*\n\n", note, re.DOTALL))
+    result = _parsed(note).blank_line_after_front_matter
     if verbose:
         if result:
             print("  - Front matter spacing: Blank line present after front matter")
@@ -239,35 +386,95 @@ ALL_EVALS = [
     code_blocks_closed,
     blank_line_after_front_matter,
 ]
+# Checks that also take the vault's note list
+VAULT_EVALS = {links_exist, aliases_resolve}
+
+
+#### Single-parse evaluation
+class NoteEvaluator:
+    """
+    Scores notes against a fixed vault with every check in one pass over a `ParsedNote`.
+
+    Build it once per note list and reuse it across candidates: the vault is turned into
+    a set of link targets (paths and file names, any case, as Obsidian resolves them) up
+    front, so each link is a set lookup.
+
+    Args:
+        vault_files (List[str]): Existing note names.
+        required (set[str]): Properties every note must have. Defaults to `REQUIRED`.
+    """
+
+    CHECKS = [fn.__name__ for fn in ALL_EVALS]
+
+    def __init__(self, vault_files: List[str], required: set = REQUIRED):
+        self.required = set(required)
+        from tools.name_index import link_targets
+        self.vault = set(vault_files)
+        self.link_targets = link_targets(self.vault)
+
+    def resolves(self, target: str) -> bool:
+        """Whether a link target, stripped of alias and anchor, names an existing note."""
+        return target in self.vault or target.strip().lower() in self.link_targets
+
+    def check(self, note: str, verbose: bool = False) -> dict:
+        """
+        Return {check name: passed} for every check in `CHECKS`.
+
+        A check that raises counts as failed. With `verbose`, each check prints its
+        diagnostics followed by its result.
+        """
+        parsed = ParsedNote(note)
+        results = {}
+        for fn in ALL_EVALS:
+            try:
+                if fn in VAULT_EVALS:
+                    ok = fn(parsed, self, verbose=verbose)
+                elif fn is required_properties_present:
+                    ok = fn(parsed, verbose=verbose, required=self.required)
+                else:
+                    ok = fn(parsed, verbose=verbose)
+            except Exception as e:
+                ok = False
+                if verbose:
+                    print(f"{fn.__name__}: ERROR - {str(e)}")
+            results[fn.__name__] = ok
+            if verbose:
+                print(f"{fn.__name__}: {'PASS' if ok else 'FAIL'}")
+        return results
+
+    def score(self, note: str) -> float:
+        """Return the pass rate between 0 and 1."""
+        results = self.check(note)
+        return sum(results.values()) / len(results)
+
+
+_evaluator = None
+_evaluator_key = None
+
+
+def get_evaluator(vault_files: List[str]) -> NoteEvaluator:
+    """Return a NoteEvaluator for `vault_files`, reusing the last one while the note set is unchanged."""
+    global _evaluator, _evaluator_key
+    # Key on a snapshot: a list edited in place since the last call must not match
+    key = vault_files if isinstance(vault_files, frozenset) else frozenset(vault_files)
+    if _evaluator is None or (key is not _evaluator_key and key != _evaluator_key):
+        _evaluator = NoteEvaluator(key)
+        _evaluator_key = key
+    return _evaluator
+
 
 def evaluate_note(note: str, vault_files: List[str], verbose=False) -> float:
-    """Return a pass rate between 0 and 1 for the generated note."""
-    passes = 0
+    """
+    Return a pass rate between 0 and 1 for the generated note.
+
+    Runs the `ALL_EVALS` checks through a cached `NoteEvaluator`. When scoring many
+    candidates, build a `NoteEvaluator` once and call `score` or `check` directly.
+    """
     if verbose:
         print("Evaluating note quality:")
-        
-    for fn in ALL_EVALS:
-        # Functions that need vault_files accept two args
-        try:
-            if fn.__code__.co_argcount == 2:  # Functions without verbose param
-                ok = fn(note, verbose)
-            elif fn.__code__.co_argcount == 3:  # Functions with vault_files and verbose
-                ok = fn(note, vault_files, verbose)
-            else:
-                raise ValueError(f"Unexpected function signature for {fn.__name__}")
-        except Exception as e:
-            ok = False
-            if verbose:
-                test_name = fn.__name__
-                print(f"{test_name}: ERROR - {str(e)}")
-        passes += ok
-        
-        if verbose:
-            test_name = fn.__name__
-            result = "PASS" if ok else "FAIL"
-            print(f"{test_name}: {result}")
-            
-    score = passes / len(ALL_EVALS)
+    results = get_evaluator(vault_files).check(note, verbose=verbose)
+    passes = sum(results.values())
+    score = passes / len(results)
     if verbose:
-        print(f"Overall score: {score:.2f} ({passes}/{len(ALL_EVALS)} checks passed)")
-    return score
\ No newline at end of file
+        print(f"Overall score: {score:.2f} ({passes}/{len(results)} checks passed)")
+    return score
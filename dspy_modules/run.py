@@ -1,4 +1,5 @@
 import dspy, os
+from dspy_modules.cached_lm import CachedLM
 from dotenv import load_dotenv
 
 def test_dspy() -> dspy.Prediction:
@@ -11,7 +12,7 @@ def test_dspy() -> dspy.Prediction:
     MAX_TOKENS   = int(os.getenv("MAX_TOKENS", 2048*16))
     CACHE_FLAG   = os.getenv("CACHE", "true").lower() not in ("0", "false", "no")
 
-    lm = dspy.LM(
+    lm = CachedLM(
         MODEL_NAME,
         temperature=TEMPERATURE,
         max_tokens=MAX_TOKENS,
@@ -51,7 +52,7 @@ def generate_note_from_topic(topic: str, note_list: list) -> dspy.Prediction:
     MAX_TOKENS   = int(os.getenv("MAX_TOKENS", 2048))
     CACHE_FLAG   = os.getenv("CACHE", "true").lower() not in ("0", "false", "no")
 
-    lm = dspy.LM(
+    lm = CachedLM(
         MODEL_NAME,
         temperature=TEMPERATURE,
         max_tokens=MAX_TOKENS,
@@ -43,15 +43,16 @@ def test_ollama(prompt:str =SYS_PROMPT):
     
 
 def test_sys_prompt():
-
-    #list of notes
-    note_list = get_notes_list()
-    note_list_str = "\n".join([f"- {note}" for note in note_list])
+    from tools.note_selection import select_related_notes
 
     #the note context
     with open('grpo_context.txt', 'r') as file:
         grpo_context = file.read()
 
+    #list of the notes relevant to the context
+    note_list = select_related_notes(grpo_context, get_notes_list())
+    note_list_str = "\n".join([f"- {note}" for note in note_list])
+
     with open('chatgpt_sys_prompt.md', 'r') as file:
         sys_prompt = file.read()\
             .replace("!!CONTEXT!!", grpo_context)\
@@ -119,16 +120,18 @@ def generate_note_from_topic(topic: str, related_notes: list = None):
     
     Args:
         topic: The topic to generate a note about
-        related_notes: Optional list of related note filenames. If None, all notes will be used.
+        related_notes: Optional list of related note filenames. If None, the notes most relevant
+            to the topic are chosen from the vault (`tools.note_selection.select_related_notes`).
         
     Returns:
         The generated prediction
     """
     from dspy_modules import run
     
-    # If no related notes are provided, use all notes in the vault
+    # If no related notes are provided, pick the vault's notes most relevant to the topic
     if related_notes is None:
-        related_notes = get_notes_list()
+        from tools.note_selection import select_related_notes
+        related_notes = select_related_notes(topic, get_notes_list())
         
     # Generate a clean filename from the topic
     note_name = re.sub(r'[^\w\s]', '', topic).strip()
@@ -165,11 +168,10 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     client = ollama.start_ollama()
-    note_list = get_notes_list()
     
     if args.topic:
         # Generate a note on the specified topic
-        generate_note_from_topic(args.topic, note_list)
+        generate_note_from_topic(args.topic)
     elif args.test:
         # Run the test function
         test_dpsy()
@@ -178,7 +180,7 @@ if __name__ == "__main__":
         topic = input("Enter a topic for your note: ")
         
         # Generate the note - note is already saved inside generate_note_from_topic
-        pred = generate_note_from_topic(topic, note_list)
+        pred = generate_note_from_topic(topic)
         print("Note generation complete.")
 
     
@@ -116,7 +116,7 @@ def init_ollama() -> Optional[psutil.Process]:
     raise RuntimeError("Ollama server failed health check")
 
 
-def start_ollama() -> OpenAI:
+def start_ollama(cache: bool = True) -> OpenAI:
     """
     Initialize the Ollama server and return an OpenAI-compatible client.
     
@@ -124,6 +124,10 @@ def start_ollama() -> OpenAI:
         OLLAMA_BASE_URL: Override the default Ollama server URL
         OLLAMA_API_KEY: Override the default API key
     
+    Args:
+        cache: If True, wrap the client so chat completions are answered from the
+            on-disk response cache (`tools.llm_cache`) when the same request was made before
+    
     Returns:
         OpenAI: An initialized OpenAI client connected to Ollama
         
@@ -147,6 +151,9 @@ def start_ollama() -> OpenAI:
     # Create and return the client
     try:
         client = OpenAI(base_url=base_url, api_key=api_key)
+        if cache:
+            from tools.llm_cache import cache_openai_client
+            client = cache_openai_client(client)
         return client
     except Exception as e:
         logger.error("Failed to initialize OpenAI client: %s", str(e))
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from tools import ann_index
+
+
+def vectors(n: int, dim: int = 16) -> np.ndarray:
+    return np.random.default_rng(0).normal(size=(n, dim)).astype("float32")
+
+
+def test_small_ivf_index_is_built_flat():
+    index = ann_index.build_index(vectors(100), np.arange(100), "ivf_flat")
+    assert ann_index.index_type_of(index) == "flat"
+    assert ann_index.upgrade_index(index, "ivf_flat") is index
+
+
+def test_upgrade_index_keeps_vectors_and_ids():
+    data, ids = vectors(ann_index.MIN_IVF_VECTORS), np.arange(ann_index.MIN_IVF_VECTORS) + 1000
+    flat = ann_index.build_index(data, ids, "flat")
+    index = ann_index.upgrade_index(flat, "ivf_flat")
+    assert ann_index.index_type_of(index) == "ivf_flat"
+    assert index.ntotal == len(ids)
+    index.nprobe = index.nlist
+    _, found = index.search(data[:5], 1)
+    assert found[:, 0].tolist() == ids[:5].tolist()
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat"])
+def test_load_vectors(tmp_path, index_type):
+    data = vectors(ann_index.MIN_IVF_VECTORS)
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(ann_index.build_index(data, np.arange(len(data)) * 7, index_type), path)
+    loaded = ann_index._load_vectors(path)
+    assert sorted(map(tuple, loaded)) == sorted(map(tuple, data))
+
+
+def test_load_vectors_rejects_ivf_pq(tmp_path):
+    data = vectors(ann_index.MIN_IVF_VECTORS * 4)
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(ann_index.build_index(data, np.arange(len(data)), "ivf_pq"), path)
+    with pytest.raises(ValueError, match="IVF-PQ"):
+        ann_index._load_vectors(path)
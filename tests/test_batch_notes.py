@@ -0,0 +1,99 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://localhost")
+
+import batch_notes
+from batch_notes import BatchItem, BatchState, configure_lm, make_note_generator, run_batch
+from tools.fake_openai_server import FakeOpenAIServer
+
+TOPICS = [f"Topic number {i}" for i in range(12)]
+
+
+@pytest.fixture(autouse=True)
+def usage_ledger(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_USAGE_LEDGER", str(tmp_path / "usage.jsonl"))
+
+
+def make_generator(server, tmp_path):
+    lm = configure_lm("openai/fake", server.base_url)
+    lm.response_cache_path = str(tmp_path / "responses.sqlite")
+    return make_note_generator([], insert_links=False)
+
+
+def run(items, generate, notes, state, **kwargs):
+    kwargs = {"concurrency": 3, "retries": 4, "backoff": 0.01, "verbose": False, **kwargs}
+    return asyncio.run(run_batch(items, generate, notes.__setitem__, state, **kwargs))
+
+
+def test_batch_is_bounded_and_retried(tmp_path):
+    items = [BatchItem(topic, topic) for topic in TOPICS]
+    notes = {}
+    with FakeOpenAIServer(slots=16, latency=0.05, fail_rate=0.3, seed=3) as server:
+        summary = run(items, make_generator(server, tmp_path), notes, BatchState(str(tmp_path / "state.jsonl")))
+        assert server.max_active == 3
+        assert server.failures > 0
+    assert summary["done"] == len(TOPICS) and summary["failed"] == 0
+    # dspy retries a failed call once through its JSON adapter, so a retry may cover two failures
+    assert 0 < summary["retries"] <= server.failures
+    assert sorted(notes) == sorted(TOPICS) and all(notes.values())
+
+
+def test_resume_skips_finished_items(tmp_path):
+    state_path = str(tmp_path / "state.jsonl")
+    items = [BatchItem(topic, topic) for topic in TOPICS]
+    with FakeOpenAIServer(slots=4) as server:
+        generate = make_generator(server, tmp_path)
+        first = run(items[:5], generate, {}, BatchState(state_path))
+        requests = server.requests
+        notes = {}
+        second = run(items, generate, notes, BatchState(state_path))
+        assert server.requests - requests == len(TOPICS) - 5
+    assert first["done"] == 5
+    assert second["skipped"] == 5 and second["done"] == len(TOPICS) - 5
+    assert sorted(notes) == sorted(TOPICS[5:])
+
+
+def test_duplicate_note_names_run_once(tmp_path):
+    calls = []
+
+    def generate(item):
+        calls.append(item.context)
+        return f"# {item.note_name}\n\n{item.context}", 1
+
+    items = [BatchItem("Same", "first"), BatchItem("Other", "other"), BatchItem("Same", "second")]
+    notes = {}
+    summary = run(items, generate, notes, BatchState(str(tmp_path / "state.jsonl")))
+    assert summary["done"] == 2 and summary["duplicates"] == 1
+    assert sorted(calls) == ["first", "other"]
+    assert notes["Same"].endswith("first")
+
+
+def test_generate_batch_rejects_duplicate_note_names(tmp_path, monkeypatch):
+    path = tmp_path / "topics.txt"
+    path.write_text("What is A/B?\nWhat is A B?\nSomething else\n", encoding="utf-8")
+    monkeypatch.setattr(batch_notes, "configure_lm", lambda *args: pytest.fail("should fail before any LLM setup"))
+    with pytest.raises(ValueError, match="What is A B"):
+        batch_notes.generate_batch(str(path), verbose=False)
+
+
+def test_generate_batch_rejects_invalid_note_names(tmp_path, monkeypatch):
+    path = tmp_path / "contexts.jsonl"
+    path.write_text('{"note_name": "CON", "context": "console"}\n{"note_name": "Bad.", "context": "bad"}\n'
+                    '{"note_name": "Fine", "context": "fine"}\n', encoding="utf-8")
+    monkeypatch.setattr(batch_notes, "configure_lm", lambda *args: pytest.fail("should fail before any LLM setup"))
+    with pytest.raises(ValueError, match="2 note names") as excinfo:
+        batch_notes.generate_batch(str(path), verbose=False)
+    assert "'CON.md' is a Windows reserved name" in str(excinfo.value)
+    assert "'Bad..md' cannot end with a space or dot" in str(excinfo.value)
+
+
+def test_derived_note_names_are_valid():
+    from tools.md_files import assert_note_name_is_valid
+
+    for topic in ["con", "Aux.", "lpt1.txt", "What is A/B?", "  ...  "]:
+        assert_note_name_is_valid(batch_notes.note_name_for(topic) + ".md")
+    assert batch_notes.note_name_for("con") == "con note"
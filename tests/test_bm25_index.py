@@ -0,0 +1,58 @@
+from tools.bm25_index import AnalyzedDocuments, BM25Index, analyze
+
+TEXTS = {
+    "Models": "gpt-4.1 and nemotron-h beat the baseline model",
+    "Baseline": "the baseline model, again and again",
+    "Empty": "",
+}
+
+
+def test_analyzed_documents_build_the_same_index_as_a_dict():
+    from_dict = BM25Index()
+    from_dict.update(documents={name: analyze(text) for name, text in TEXTS.items()})
+    analyzed = AnalyzedDocuments()
+    for name, text in TEXTS.items():
+        analyzed.add(name, analyze(text))
+    compact = BM25Index()
+    compact.update(documents=analyzed)
+
+    assert compact.names == from_dict.names == list(TEXTS)
+    assert compact.doc_lens.tolist() == from_dict.doc_lens.tolist()
+    for query in ("baseline model", "gpt-4.1", "nemotron", "again"):
+        assert compact.search(query) == from_dict.search(query)
+
+
+def test_varint_round_trip():
+    import numpy as np
+    from tools.bm25_index import _varint_decode, _varint_encode
+
+    values = np.array([0, 1, 127, 128, 300, 16383, 16384, 2**31, 2**40 + 5], dtype=np.int64)
+    data, lengths = _varint_encode(values)
+    assert lengths.tolist() == [1, 1, 1, 2, 2, 2, 3, 5, 6]
+    assert len(data) == lengths.sum()
+    assert np.cumsum(_varint_decode(data)).tolist() == np.cumsum(values).tolist()
+
+
+def test_updates_go_to_a_second_segment_until_merged(tmp_path):
+    index = BM25Index()
+    index.update(documents={f"Note {i}": f"common words plus topic{i}" for i in range(40)})
+    assert len(index.delta.doc_ids) == 0 and len(index.main.doc_ids) == 40
+
+    index.update(documents={"Note 3": "rewritten about gpt-4.1"}, remove=["Note 5"])
+    assert len(index.main.doc_ids) == 40 and index.delta.doc_ids.tolist() == [40]
+    assert len(index) == 39
+    assert [name for name, _ in index.search("topic3")] == []
+    assert [name for name, _ in index.search("topic5")] == []
+    assert [name for name, _ in index.search("gpt-4.1")] == ["Note 3"]
+
+    path = str(tmp_path / "bm25.npz")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.search("gpt common", top_k=3) == index.search("gpt common", top_k=3)
+
+    # Past MERGE_RATIO of the index, both segments are rebuilt into one
+    loaded.update(documents={f"New {i}": f"fresh topic{i}" for i in range(5)})
+    assert len(loaded.delta.doc_ids) == 0
+    assert len(loaded.doc_names) == len(loaded) == 44
+    assert [name for name, _ in loaded.search("gpt-4.1")] == ["Note 3"]
+    assert {name for name, _ in loaded.search("topic2", top_k=10)} == {"Note 2", "New 2"}
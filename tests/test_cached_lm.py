@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from dspy_modules.cached_lm import CachedLM
+from tools.fake_openai_server import FakeOpenAIServer
+
+
+@pytest.fixture
+def server():
+    with FakeOpenAIServer() as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def usage_ledger(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_USAGE_LEDGER", str(tmp_path / "usage.jsonl"))
+
+
+def make_lm(server, tmp_path, **kwargs):
+    return CachedLM("openai/fake", api_base=server.base_url, api_key="fake", num_retries=0,
+                    response_cache_path=str(tmp_path / "responses.sqlite"), **kwargs)
+
+
+def test_acall_goes_through_response_cache(server, tmp_path):
+    lm = make_lm(server, tmp_path)
+    first = asyncio.run(lm.acall("What is a stablecoin?"))
+    second = asyncio.run(lm.acall("What is a stablecoin?"))
+    assert first == second and first[0]
+    assert server.requests == 1
+
+
+def test_acall_without_cache(server, tmp_path):
+    lm = make_lm(server, tmp_path)
+    asyncio.run(lm.acall("What is a stablecoin?", cache=False))
+    asyncio.run(lm.acall("What is a stablecoin?", cache=False))
+    assert server.requests == 2
+
+
+def test_call_uses_the_same_cache(server, tmp_path):
+    lm = make_lm(server, tmp_path)
+    first = lm("What is a stablecoin?")
+    assert asyncio.run(lm.acall("What is a stablecoin?")) == first
+    assert server.requests == 1
+    assert lm.cache is False  # dspy's own cache stays off
+
+
+def test_key_points_reuse_cached_chunks(server, tmp_path, monkeypatch):
+    import dspy
+
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "http://localhost")
+    from dspy_modules.note_gen import KeyPointsExtractor
+
+    lm = make_lm(server, tmp_path)
+    chunks = [f"Part {i} is about topic {i}." for i in range(3)]
+    with dspy.context(lm=lm):
+        first = KeyPointsExtractor(max_workers=2)(chunks=chunks, max_tokens=10_000)
+        assert server.requests == 3
+        second = KeyPointsExtractor(max_workers=2)(chunks=chunks[:2] + ["A new part."], max_tokens=10_000)
+    assert server.requests == 4
+    assert second.key_points[:2] == first.key_points[:2]
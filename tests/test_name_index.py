@@ -0,0 +1,39 @@
+from tools.name_index import NameIndex
+
+NAMES = ["Future of Stablecoins", "Dwarkesh Patel Podcast", "AI/Policy Gradient Methods", "Reinforcement Learning"]
+
+
+def test_lookup_ignores_word_order_and_plurals():
+    index = NameIndex(NAMES)
+    assert index.lookup("Stablecoin Future")[0][0] == "Future of Stablecoins"
+    assert index.resolve("Dwarkesh Podcast")[0] == "Dwarkesh Patel Podcast"
+    assert index.resolve("policy gradient method")[0] == "AI/Policy Gradient Methods"
+
+
+def test_lookup_falls_back_to_trigrams_for_typos():
+    assert NameIndex(NAMES).lookup("Reinforcment Lerning")[0][0] == "Reinforcement Learning"
+
+
+class RecordingPostings(dict):
+    def __init__(self, postings):
+        super().__init__(postings)
+        self.walked = []
+
+    def get(self, token, default=None):
+        self.walked.append(token)
+        return super().get(token, default)
+
+
+def test_common_tokens_do_not_generate_candidates():
+    index = NameIndex(NAMES + [f"Meeting Notes {i}" for i in range(1000)])
+    assert len(index._token_postings["note"]) > index.MAX_POSTINGS
+    index._token_postings = RecordingPostings(index._token_postings)
+    assert index.lookup("Stablecoin notes")[0][0] == "Future of Stablecoins"
+    assert index._token_postings.walked == ["stablecoin"]
+
+
+def test_common_tokens_alone_still_match():
+    index = NameIndex(NAMES + [f"Meeting Notes {i}" for i in range(1000)])
+    matches = index.lookup("meeting notes 7", top_k=1)
+    assert matches == [("Meeting Notes 7", 1.0)]
+    assert index.lookup("notes meeting")[0][0].startswith("Meeting Notes")
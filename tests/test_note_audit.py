@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+from tools import md_files, note_audit
+
+NOTES = {
+    "Alpha": "---\ntags: [greek]\naliases: []\ncreated: 2024-01-01\n---\n\n# Alpha\n\nSee [[Beta]].\n",
+    "Beta": "# Beta\n\nNo frontmatter.\n",
+    "greek/Gamma": "# Gamma\n\n[[Nowhere]]\n",
+}
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    root = tmp_path / "vault"
+    for name, text in NOTES.items():
+        path = root / (name + ".md")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    monkeypatch.setattr(md_files, "VAULT_PATH", str(root))
+    return root
+
+
+@pytest.mark.parametrize("filename", ["audit.jsonl", "audit.csv"])
+def test_resume_skips_unchanged_notes(vault, tmp_path, filename):
+    output = str(tmp_path / filename)
+    first = note_audit.audit_notes(output, workers=1)
+    assert (first["notes"], first["evaluated"], first["skipped"]) == (3, 3, 0)
+
+    again = note_audit.audit_notes(output, workers=1)
+    assert (again["evaluated"], again["skipped"]) == (0, 3)
+    assert again["mean_score"] == first["mean_score"]
+
+    # Touched but not edited: hashed again, not evaluated again
+    alpha = vault / "Alpha.md"
+    os.utime(alpha, (alpha.stat().st_atime, alpha.stat().st_mtime + 10))
+    (vault / "Beta.md").write_text(NOTES["Alpha"].replace("Alpha", "Beta"), encoding="utf-8")
+    (vault / "greek" / "Gamma.md").unlink()
+    resumed = note_audit.audit_notes(output, workers=1)
+    assert (resumed["notes"], resumed["evaluated"], resumed["skipped"]) == (2, 1, 1)
+    records = note_audit._AuditFile(output, []).load()
+    assert sorted(records) == ["Alpha", "Beta"]
+    assert records["Alpha"]["mtime"] == alpha.stat().st_mtime
+
+
+def test_resume_after_an_interrupted_run(vault, tmp_path):
+    output = tmp_path / "audit.jsonl"
+    note_audit.audit_notes(str(output), workers=1)
+    # Keep the first record and a torn second line, as a killed run would leave them
+    lines = output.read_text(encoding="utf-8").splitlines(keepends=True)
+    output.write_text(lines[0] + lines[1][:20], encoding="utf-8")
+
+    summary = note_audit.audit_notes(str(output), workers=1)
+    assert (summary["notes"], summary["evaluated"], summary["skipped"]) == (3, 2, 1)
+    assert [json.loads(line)["note"] for line in output.read_text(encoding="utf-8").splitlines()] == \
+        sorted(NOTES)
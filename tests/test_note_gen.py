@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://localhost")
+
+from dspy_modules import note_gen
+from dspy_modules.note_gen import ALL_EVALS, VAULT_EVALS, NoteEvaluator, evaluate_note, get_evaluator
+
+VAULT = ["Reinforcement Learning", "AI/Policy Gradient", "Stablecoins"]
+
+FRONT_MATTER = "---\ntags: [ml]\naliases: []\ncreated: 2024-01-01\n---\n\n"
+
+NOTES = {
+    "fenced heading": FRONT_MATTER + "```python\n# not a title\n```\n# Title\n## Part\n",
+    "fenced link": FRONT_MATTER + "# Title\n\n```\n[[Missing Note]]\n```\n",
+    "fenced heading skip": FRONT_MATTER + "# Title\n\n~~~\n#### deep\n~~~\n## Part\n",
+    "tilde fence closed": FRONT_MATTER + "# Title\n\n~~~\ncode\n~~~\n",
+    "tilde fence open": FRONT_MATTER + "# Title\n\n~~~\ncode\n",
+    "backticks inside tilde fence": FRONT_MATTER + "# Title\n\n~~~\n```\n~~~\n",
+    "inline backticks": FRONT_MATTER + "# Title\n\nUse ```inline``` and ``` here.\n",
+    "mixed-case link": FRONT_MATTER + "# Title\n\nSee [[reinforcement learning]] and [[STABLECOINS#Risks|coins]].\n",
+    "basename link": FRONT_MATTER + "# Title\n\nSee [[policy gradient]] and [[AI/Policy Gradient]].\n",
+    "exact links": FRONT_MATTER + "# Title\n\nSee [[Reinforcement Learning]] and [[Stablecoins#Risks|coins]].\n",
+    "missing link": FRONT_MATTER + "# Title\n\nSee [[Nowhere|there]].\n",
+    "no front matter": "# Title\n\nPlain text.\n",
+    "invalid yaml": "---\ntags: [ml\n---\n\n# Title\n",
+    "empty": "",
+}
+
+
+def legacy_results(note: str, vault: list[str]) -> dict:
+    return {fn.__name__: fn(note, vault) if fn in VAULT_EVALS else fn(note) for fn in ALL_EVALS}
+
+
+@pytest.mark.parametrize("name", NOTES)
+def test_all_evals_match_note_evaluator(name):
+    note = NOTES[name]
+    assert legacy_results(note, VAULT) == NoteEvaluator(VAULT).check(note)
+
+
+def test_fenced_content_is_ignored():
+    results = NoteEvaluator(VAULT).check(NOTES["fenced heading"])
+    assert results["has_title_heading"] is False  # the first body line opens a code block
+    results = NoteEvaluator(VAULT).check(NOTES["fenced heading skip"])
+    assert results["heading_levels_monotonic"] and results["code_blocks_closed"]
+    assert NoteEvaluator(VAULT).check(NOTES["fenced link"])["links_exist"]
+
+
+def test_fences():
+    evaluator = NoteEvaluator(VAULT)
+    assert evaluator.check(NOTES["tilde fence closed"])["code_blocks_closed"]
+    assert not evaluator.check(NOTES["tilde fence open"])["code_blocks_closed"]
+    assert evaluator.check(NOTES["backticks inside tilde fence"])["code_blocks_closed"]
+    assert evaluator.check(NOTES["inline backticks"])["code_blocks_closed"]
+
+
+def test_links_resolve_like_obsidian():
+    evaluator = NoteEvaluator(VAULT)
+    for name in ("exact links", "mixed-case link", "basename link"):
+        results = evaluator.check(NOTES[name])
+        assert results["links_exist"] and results["aliases_resolve"]
+    results = evaluator.check(NOTES["missing link"])
+    assert not results["links_exist"] and not results["aliases_resolve"]
+
+
+def test_evaluate_note_scores_every_check():
+    assert evaluate_note(NOTES["exact links"], VAULT) == 1.0
+    assert evaluate_note(NOTES["empty"], VAULT) == pytest.approx(4 / len(ALL_EVALS))
+
+
+def test_verbose_prints_each_checks_diagnostics(capsys):
+    evaluate_note(NOTES["missing link"], VAULT, verbose=True)
+    out = capsys.readouterr().out
+    assert "  - Links check: 'Nowhere' not found in vault" in out
+    assert "links_exist: FAIL" in out and "has_title_heading: PASS" in out
+
+
+def test_a_check_that_raises_fails(monkeypatch, capsys):
+    def has_title_heading(note, verbose=False):
+        raise ValueError("boom")
+
+    evals = [has_title_heading if fn is note_gen.has_title_heading else fn for fn in ALL_EVALS]
+    monkeypatch.setattr(note_gen, "ALL_EVALS", evals)
+    results = NoteEvaluator(VAULT).check(NOTES["exact links"], verbose=True)
+    assert results["has_title_heading"] is False
+    assert sum(results.values()) == len(evals) - 1
+    assert "has_title_heading: ERROR - boom" in capsys.readouterr().out
+
+
+def test_get_evaluator_notices_a_list_edited_in_place():
+    vault = list(VAULT)
+    assert get_evaluator(vault).check(NOTES["exact links"])["links_exist"]
+    vault[0] = "Other"
+    assert not get_evaluator(vault).check(NOTES["exact links"])["links_exist"]
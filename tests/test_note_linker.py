@@ -0,0 +1,29 @@
+from tools.note_linker import NoteLinker
+
+NAMES = ["Machine Learning", "Machine Learning Basics", "Learning Rate", "Python"]
+
+
+def test_leftmost_longest_match_wins():
+    linker = NoteLinker(NAMES)
+    assert linker.link("Read Machine Learning Basics first.") == "Read [[Machine Learning Basics]] first."
+    # The leftmost match wins even where a later one overlaps it
+    assert linker.link("Machine Learning Rate") == "[[Machine Learning]] Rate"
+    assert linker.link("Machine Learning and Learning Rate") == "[[Machine Learning]] and [[Learning Rate]]"
+
+
+def test_names_match_whole_words_only():
+    assert NoteLinker(NAMES).link("Pythonic code, CPython and Python.") == "Pythonic code, CPython and [[Python]]."
+
+
+def test_case_and_aliases():
+    linker = NoteLinker(NAMES, ignore_case=True, aliases=[("Machine Learning", "ML")])
+    assert linker.link("machine learning and ML") == "[[Machine Learning|machine learning]] and [[Machine Learning|ML]]"
+    assert NoteLinker(NAMES).link("machine learning") == "machine learning"
+
+
+def test_protected_spans_are_left_alone():
+    text = ("---\ntags: [Python]\n---\n"
+            "Python in `Python` code, [[Python]], [Python](https://python.org) and https://x.io/Python\n"
+            "```\nPython\n```\n"
+            "~~~\nPython, unclosed")
+    assert NoteLinker(NAMES).link(text) == text.replace("Python in", "[[Python]] in", 1)
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from tools import md_files
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    root = tmp_path / "vault"
+    root.mkdir()
+    monkeypatch.setattr(md_files, "VAULT_PATH", str(root))
+    return root
+
+
+def test_note_is_written_to_partial_then_renamed(vault, monkeypatch):
+    replaced = []
+    real_replace = os.replace
+    monkeypatch.setattr(os, "replace", lambda src, dst: replaced.append((src, dst)) or real_replace(src, dst))
+
+    with md_files.NoteStream("Streamed", extra_tags=["test"]) as note:
+        note.write("# Streamed\n\nFirst paragraph.\n")
+        partial = vault / ".Streamed.md.partial"
+        assert partial.read_text(encoding="utf-8").endswith("First paragraph.\n")  # flushed as it grows
+        assert not (vault / "Streamed.md").exists()
+        assert md_files.get_notes_list() == []
+        note.write("\nSecond paragraph.\n")
+
+    assert replaced == [(str(partial), str(vault / "Streamed.md"))]
+    assert not partial.exists()
+    md_files.create_note("Created", "# Streamed\n\nFirst paragraph.\n\nSecond paragraph.\n", extra_tags=["test"])
+    assert (vault / "Streamed.md").read_text(encoding="utf-8") == (vault / "Created.md").read_text(encoding="utf-8")
+
+
+def test_failed_stream_leaves_no_note(vault):
+    with pytest.raises(RuntimeError):
+        with md_files.NoteStream("Broken") as note:
+            note.write("# Broken\n")
+            raise RuntimeError("generation failed")
+    assert list(vault.iterdir()) == []
@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("faiss")
+
+from benchmarks.bench import StubEncoder
+from tools import ann_index, md_files, search_engine
+from tools.chunking import split_markdown
+
+SECTION = "Words about {topic} and more words about {topic}, with Ünïcode. " * 6
+
+
+def note_text(i: int) -> str:
+    sections = [f"## Part {part}\r\n\r\n" + SECTION.format(topic=f"topic{i}") for part in range(4)]
+    return f"---\r\ntags: [test]\r\n---\r\n# Note {i}\r\n\r\n" + "\r\n\r\n".join(sections)
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    root = tmp_path / "vault"
+    root.mkdir()
+    for i in range(30):
+        (root / f"Note {i}.md").write_bytes(note_text(i).encode("utf-8"))
+    monkeypatch.setattr(md_files, "VAULT_PATH", str(root))
+    monkeypatch.setattr(md_files, "PASSAGES_INDEX_PATH", str(tmp_path / "passages_index.faiss"))
+    monkeypatch.setattr(md_files, "PASSAGES_META_PATH", str(tmp_path / "passages_meta.sqlite"))
+    monkeypatch.setattr(md_files, "PASSAGES_MANIFEST_PATH", str(tmp_path / "passages_manifest.json"))
+    monkeypatch.setitem(search_engine._models, md_files.EMBEDDING_MODEL, StubEncoder(dim=32))
+    return root
+
+
+def test_chunk_offsets_are_byte_offsets_in_crlf_files(vault):
+    raw = (vault / "Note 3.md").read_bytes()
+    text = raw.decode("utf-8")
+    chunks = split_markdown(text, max_chars=300, overlap=50)
+    assert len(chunks) > 4
+    for chunk in chunks:
+        assert raw[chunk["start"]:chunk["end"]].decode("utf-8") == chunk["text"]
+
+
+def test_search_passages_returns_the_chunk_text(vault):
+    md_files.reindex_passages(max_chars=300, overlap=50)
+    passages = md_files.search_passages("topic7 words", top_k=5)
+    assert passages
+    for passage in passages:
+        raw = (vault / (passage["note"] + ".md")).read_bytes().decode("utf-8")
+        assert passage["text"] in [chunk["text"] for chunk in split_markdown(raw, max_chars=300, overlap=50)]
+
+
+def test_new_index_is_sized_by_chunk_count(vault, monkeypatch):
+    sizes = []
+
+    class RecordingBuilder(ann_index.StreamingIndexBuilder):
+        def __init__(self, index_type=None, n_vectors=0, index=None):
+            sizes.append(n_vectors)
+            super().__init__(index_type, n_vectors, index)
+
+    monkeypatch.setattr(ann_index, "StreamingIndexBuilder", RecordingBuilder)
+    md_files.reindex_passages(max_chars=300, overlap=50, index_type="hnsw")
+    expected = sum(len(split_markdown(path.read_bytes().decode("utf-8"), max_chars=300, overlap=50))
+                   for path in vault.iterdir())
+    assert sizes == [expected]
+    assert expected > 30
+
+
+def test_ivf_index_is_built_flat_until_it_can_be_trained(vault):
+    import json
+
+    md_files.reindex_passages(max_chars=300, overlap=50, index_type="ivf_flat")
+    with open(md_files.PASSAGES_MANIFEST_PATH, encoding="utf-8") as f:
+        assert json.load(f)["index_type"] == "flat"
+
+    for i in range(30, 75):
+        (vault / f"Note {i}.md").write_bytes(note_text(i).encode("utf-8"))
+    report = md_files.reindex_passages(incremental=True, max_chars=300, overlap=50, index_type="ivf_flat")
+    assert len(report["added"]) == 45 and not report["updated"]
+    with open(md_files.PASSAGES_MANIFEST_PATH, encoding="utf-8") as f:
+        assert json.load(f)["index_type"] == "ivf_flat"
+    assert md_files.search_passages("topic7 words", top_k=3)
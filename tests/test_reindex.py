@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from benchmarks.bench import StubEncoder
+from tools import md_files, search_engine
+from tools.bm25_index import BM25Index
+from tools.index_store import MetaStore
+
+NOTES = {
+    "Alpha": "# Alpha\n\nThe first letter.\n",
+    "Beta": "# Beta\n\nThe second letter, after [[Alpha]].\n",
+    "greek/Gamma": "# Gamma\n\nThe third letter.\n",
+}
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    root = tmp_path / "vault"
+    for name, text in NOTES.items():
+        path = root / (name + ".md")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    monkeypatch.setattr(md_files, "VAULT_PATH", str(root))
+    for name in ("INDEX_PATH", "META_PATH", "MANIFEST_PATH", "BM25_PATH"):
+        monkeypatch.setattr(md_files, name, str(tmp_path / getattr(md_files, name).rsplit("/", 1)[-1]))
+    monkeypatch.setitem(search_engine._models, md_files.EMBEDDING_MODEL, StubEncoder(dim=32))
+    return root
+
+
+def manifest_ids() -> dict:
+    with open(md_files.MANIFEST_PATH, encoding="utf-8") as f:
+        return {note: entry["ids"] for note, entry in json.load(f)["notes"].items()}
+
+
+def test_rebuild_never_reuses_ids(vault):
+    md_files.reindex_notes()
+    old_ids = [i for ids in manifest_ids().values() for i in ids]
+    md_files.reindex_notes()
+    new_ids = [i for ids in manifest_ids().values() for i in ids]
+    assert min(new_ids) > max(old_ids)
+
+    store = MetaStore(md_files.META_PATH)
+    assert store.get_many(old_ids) == {}  # an old index still being searched finds no metadata
+    assert sorted(store.get_many(new_ids).values()) == sorted(NOTES)
+    store.close()
+
+
+def test_incremental_reindex_adds_updates_and_removes(vault):
+    md_files.reindex_notes()
+    before = manifest_ids()
+
+    (vault / "Delta.md").write_text("# Delta\n\nThe fourth letter.\n", encoding="utf-8")
+    (vault / "Beta.md").write_text("# Beta\n\nRewritten.\n", encoding="utf-8")
+    (vault / "greek" / "Gamma.md").unlink()
+    alpha = vault / "Alpha.md"
+    os.utime(alpha, (alpha.stat().st_atime, alpha.stat().st_mtime + 10))  # touched, not edited
+
+    report = md_files.reindex_notes(incremental=True)
+    assert report == {"added": ["Delta"], "updated": ["Beta"], "removed": ["greek/Gamma"]}
+    after = manifest_ids()
+    assert sorted(after) == ["Alpha", "Beta", "Delta"]
+    assert after["Alpha"] == before["Alpha"]
+    assert min(after["Beta"] + after["Delta"]) > max(i for ids in before.values() for i in ids)
+
+    index = faiss.read_index(md_files.INDEX_PATH)
+    assert index.ntotal == 3
+    store = MetaStore(md_files.META_PATH)
+    assert store.get_many([i for ids in before.values() for i in ids]) == {before["Alpha"][0]: "Alpha"}
+    assert sorted(store.get_many([i for ids in after.values() for i in ids]).values()) == ["Alpha", "Beta", "Delta"]
+    store.close()
+    bm25 = BM25Index.load(md_files.BM25_PATH)
+    assert sorted(bm25.names) == ["Alpha", "Beta", "Delta"]
+    assert [name for name, _ in bm25.search("rewritten")] == ["Beta"]
+
+    assert md_files.reindex_notes(incremental=True) == {"added": [], "updated": [], "removed": []}
@@ -0,0 +1,18 @@
+import pytest
+
+from tools.token_usage import CHARS_PER_TOKEN, Tokenizer, chunk_text
+
+
+def test_fallback_tokenizer_counts_but_has_no_ids():
+    tokenizer = Tokenizer(None)
+    assert tokenizer.count("x" * 35) == round(35 / CHARS_PER_TOKEN)
+    assert tokenizer.count("") == 0
+    with pytest.raises(RuntimeError, match="tiktoken"):
+        tokenizer.encode("hello")
+
+
+def test_chunk_text_keeps_the_text():
+    text = "\n\n".join(f"Paragraph {i}. " + "Some words here. " * 20 for i in range(10))
+    chunks = chunk_text(text, 100)
+    assert len(chunks) > 1
+    assert "".join(chunks) == text
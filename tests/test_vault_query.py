@@ -0,0 +1,68 @@
+import pytest
+
+from tools import md_files, note_metadata, vault_query
+from tools.bm25_index import BM25Index, analyze
+
+NOTES = {
+    "data/Pipelines": "---\ntags: [draft/jobs]\n---\nHow the nightly jobs run.",
+    "data/Warehouse": "Tables and their owners; the data team owns it.",
+    "Data Quality": "Checks on incoming rows.",
+    "Ideas": "Nothing here yet. #draft\n- [ ] write about data contracts",
+}
+
+
+@pytest.fixture(params=[False, True], ids=["no-index", "bm25"])
+def vault(request, tmp_path, monkeypatch):
+    root = tmp_path / "vault"
+    for name, text in NOTES.items():
+        path = root / (name + ".md")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    monkeypatch.setattr(md_files, "VAULT_PATH", str(root))
+    bm25_path = str(tmp_path / "notes_bm25.npz")
+    monkeypatch.setattr(md_files, "BM25_PATH", bm25_path)
+    if request.param:
+        index = BM25Index()
+        index.update(documents={name: analyze(name + "\n\n" + text) for name, text in NOTES.items()},
+                     remove=[], keep=set(NOTES))
+        index.save(bm25_path)
+    metadata = note_metadata.NoteMetadataIndex(str(tmp_path / "metadata.sqlite"))
+    metadata.update(incremental=False)
+    monkeypatch.setattr(note_metadata, "_index", metadata)
+    return root
+
+
+def test_bare_term_matches_file_name_or_content_not_folders(vault):
+    assert vault_query.run_query("data") == ["Data Quality", "Ideas", "data/Warehouse"]
+    assert vault_query.run_query("path:data") == ["Data Quality", "data/Pipelines", "data/Warehouse"]
+
+
+def test_file_and_content_fields(vault):
+    assert vault_query.run_query("file:pipelines") == ["data/Pipelines"]
+    assert vault_query.run_query("content:rows") == ["Data Quality"]
+    assert vault_query.run_query("task-todo:(contracts)") == ["Ideas"]
+
+
+def test_node_is_abstract():
+    with pytest.raises(TypeError):
+        vault_query.Node()
+
+
+def test_tag_finds_frontmatter_and_inline_tags(vault):
+    assert not note_metadata.get_metadata_index().indexes_inline_tags()
+    assert vault_query.run_query("tag:#draft") == ["Ideas", "data/Pipelines"]
+    assert vault_query.run_query("tag:#draft/jobs") == ["data/Pipelines"]
+
+
+def test_metadata_reads_are_header_only_unless_inline_tags_opted_in(vault):
+    index = note_metadata.get_metadata_index()
+    assert index.notes_with_tag("draft") == ["data/Pipelines"]
+
+    index.update(incremental=True, inline_tags=True)
+    assert index.indexes_inline_tags()
+    assert index.notes_with_tag("draft") == ["Ideas", "data/Pipelines"]
+    # Later updates keep the setting the index was built with
+    (vault / "Ideas.md").write_text("#draft again", encoding="utf-8")
+    assert index.update(incremental=True)["updated"] == ["Ideas"]
+    assert index.notes_with_tag("draft") == ["Ideas", "data/Pipelines"]
+    assert vault_query.run_query("tag:#draft") == ["Ideas", "data/Pipelines"]
@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+from tools import link_graph, md_files, vault_watcher
+from tools.note_metadata import NoteMetadataIndex
+
+NOTES = {
+    "Alpha": "---\ntags: [greek]\n---\n# Alpha\n\nSee [[Beta]].\n",
+    "Beta": "# Beta\n\nBack to [[Alpha]].\n",
+    "sub/Gamma": "---\ntags: [greek, letter]\n---\n# Gamma\n\n[[Alpha]] and [[Beta]].\n",
+}
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    root = tmp_path / "vault"
+    for name, text in NOTES.items():
+        path = root / (name + ".md")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    monkeypatch.setattr(md_files, "VAULT_PATH", str(root))
+    index_dir = tmp_path / "index"
+    monkeypatch.setattr(link_graph, "INDEX_DIR", str(index_dir))
+    monkeypatch.setattr(link_graph, "GRAPH_PATH", str(index_dir / "link_graph.npz"))
+    monkeypatch.setattr(link_graph, "GRAPH_STATE_PATH", str(index_dir / "link_graph.json"))
+    monkeypatch.setattr(link_graph, "_graph", None)
+    return root
+
+
+def age(root, seconds: float = 60) -> None:
+    """Backdate every directory so the scanner trusts its cached listings."""
+    past = time.time() - seconds
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, (past, past))
+
+
+def test_first_targeted_link_graph_update_builds_everything(vault):
+    report = link_graph.update_link_graph(incremental=True, notes=["Beta"])
+    assert sorted(report["added"]) == sorted(NOTES)
+    graph = link_graph.get_link_graph()
+    assert sorted(graph.names) == sorted(NOTES)
+    assert graph.backlinks("Alpha") == ["Beta", "sub/Gamma"]
+
+    (vault / "Beta.md").write_text("# Beta\n\nNo links now.\n", encoding="utf-8")
+    report = link_graph.update_link_graph(incremental=True, notes=["Beta"])
+    assert report == {"added": [], "updated": ["Beta"], "removed": []}
+    assert link_graph.get_link_graph().backlinks("Alpha") == ["sub/Gamma"]
+
+
+def test_first_targeted_metadata_update_builds_everything(vault, tmp_path):
+    index = NoteMetadataIndex(str(tmp_path / "metadata.sqlite"))
+    report = index.update(incremental=True, notes=["Beta"])
+    assert sorted(report["added"]) == sorted(NOTES)
+    assert index.notes_with_tag("greek") == ["Alpha", "sub/Gamma"]
+    assert index.update(incremental=True, notes=["Beta"]) == {"added": [], "updated": [], "removed": []}
+
+
+def test_snapshot_only_stats_changed_directories(vault, monkeypatch):
+    age(vault)
+    assert sorted(vault_watcher._snapshot(refresh_stats=True)) == sorted(NOTES)
+
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda path, *a, **k: stats.append(str(path)) or real_stat(path, *a, **k))
+    vault_watcher._snapshot()
+    assert not any(path.endswith(".md") for path in stats)
+    assert len(stats) == 2  # the vault root and sub/
+
+    (vault / "sub" / "Delta.md").write_text("# Delta\n", encoding="utf-8")
+    assert "sub/Delta" in vault_watcher._snapshot()
+
+
+def test_poll_loop_sees_new_and_edited_notes(vault):
+    watcher = vault_watcher.VaultWatcher(poll_interval=0.05, stat_interval=0.2, use_watchdog=False)
+    watcher._index_loop = lambda: None  # only collect the pending notes
+    watcher.start()
+    time.sleep(0.2)  # let the first snapshot be taken
+    try:
+        (vault / "sub" / "Delta.md").write_text("# Delta\n", encoding="utf-8")
+        with open(vault / "Alpha.md", "a", encoding="utf-8") as f:
+            f.write("\nEdited in place.\n")
+        deadline = time.monotonic() + 5
+        while watcher._pending != {"sub/Delta", "Alpha"} and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+    assert watcher._pending == {"sub/Delta", "Alpha"}
@@ -1,9 +1,13 @@
-from dspy import LM, configure
+from dspy import configure
 import os
-from dspy_modules.note_gen import NoteGenerator
-from tools.md_files import get_notes_list, create_note
+from dspy_modules.note_gen import NoteGenerator, KeyPointsExtractor
+from dspy_modules.cached_lm import CachedLM
+from tools.md_files import FENCE_RE, assert_note_name_is_valid, get_notes_list, create_note
+from tools.note_linker import get_linker
+from tools.name_index import get_name_index, repair_links
+from tools.note_selection import DEFAULT_MAX_TOKENS, DEFAULT_TOP_K, select_related_notes
+from tools.token_usage import chunk_text, collect_usage, enforce_budget, get_tokenizer, usage_pipeline
 from dotenv import load_dotenv
-import re
 
 load_dotenv()
 
@@ -12,6 +16,9 @@ api_key = os.getenv("AZURE_OPENAI_API_KEY")
 api_base = os.getenv("AZURE_OPENAI_ENDPOINT")
 deployment_name = 'azure/gpt-4.1-mini'
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", 2048*16))
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", 0))  # 0 = no budget
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 32000))  # longer inputs go map-reduce; 0 = always send the whole text
+MAP_WORKERS = int(os.getenv("MAP_WORKERS", 8))
 
 if not api_key:
     raise ValueError("AZURE_OPENAI_API_KEY environment variable is not set.")
@@ -21,7 +28,7 @@ if not deployment_name:
     raise ValueError("AZURE_OPENAI_DEPLOYMENT environment variable is not set.")
 
 
-lm = LM(
+lm = CachedLM(
     model=deployment_name,
     api_key=api_key,
     api_base=api_base,
@@ -32,50 +39,19 @@ lm = LM(
 configure(lm=lm)
 
 
-def assert_note_name_is_valid(filename: str) -> None:
-    """ 
-    Check if a filename is compatible with Obsidian vault requirements.
-    
-    Returns True if:
-      - It does not include OS-level forbidden characters
-      - It does not include Obsidian-reserved link/anchor characters
-      - It is not a Windows reserved name (e.g., CON, PRN, AUX, NUL, COM1–COM9, LPT1–LPT9)
-      - It does not end with a space or dot on Windows
-    """
-    # Forbidden by Windows: < > : " / \\ | ? * and control characters 0–31
-    os_forbidden = r'[<>:"/\\|?*\x00-\x1F]'
-    # macOS also forbids ':', but it's already in os_forbidden
-    # Obsidian link/anchor conflicts: [ ] # ^
-    obsidian_forbidden = r'[\[\]#^]'
-    # Windows reserved basenames (case-insensitive)
-    reserved_windows = {
-        'CON','PRN','AUX','NUL',
-        *(f'COM{i}' for i in range(1,10)),
-        *(f'LPT{i}' for i in range(1,10))
-    }
-    # Check OS-level forbidden
-    if re.search(os_forbidden, filename):
-        raise ValueError(f"Filename '{filename}' contains OS-level forbidden characters.")
-    # Check Obsidian-specific forbidden
-    if re.search(obsidian_forbidden, filename):
-        raise ValueError(f"Filename '{filename}' contains Obsidian-specific forbidden characters.")
-    # Check reserved Windows names
-    name_root = filename.split('.')[0].upper()
-    if name_root in reserved_windows:
-        raise ValueError(f"Filename '{filename}' is a Windows reserved name.")
-    # On Windows, filenames cannot end with space or dot
-    if filename.endswith(' ') or filename.endswith('.'):
-        raise ValueError(f"Filename '{filename}' cannot end with a space or dot.")
-
-
-
+@usage_pipeline("text_to_note")
 def obsidify_text(long_text: str,
                   note_name: str, 
                   verbose: bool = False, 
                   ignore_token_limit: bool = False, 
                   extra_properties: dict = None, 
                   insert_links: bool = True,
-                  prompt_with_note_list: bool = False):
+                  prompt_with_note_list: bool = False,
+                  stream: bool = False,
+                  max_input_tokens: int = None,
+                  chunk_tokens: int = None,
+                  note_list_k: int = DEFAULT_TOP_K,
+                  note_list_max_tokens: int = DEFAULT_MAX_TOKENS):
     """
     Processes a long text to generate an Obsidian-compatible markdown note, 
     optionally incorporating links to existing notes, and saves it to the vault.
@@ -88,24 +64,55 @@ def obsidify_text(long_text: str,
         extra_properties (dict, optional): Additional metadata to include in the note. Defaults to None.
         insert_links (bool, optional): If True, adds links to related existing notes. Defaults to True.
         prompt_with_note_list (bool, optional): If True, includes the list of existing notes in the LLM prompt. Defaults to False.
+            Only the notes most relevant to the text are included, up to `note_list_k` names.
+        stream (bool, optional): If True, print the reasoning and the note as tokens arrive and write the
+            note to the vault paragraph by paragraph (see `stream_note`). Defaults to False.
+        max_input_tokens (int, optional): Refuse inputs longer than this many tokens (see
+            `tools.token_usage.enforce_budget`). Defaults to `MAX_INPUT_TOKENS`, 0 meaning no limit.
+            Not applied to inputs long enough for map-reduce.
+        chunk_tokens (int, optional): Map-reduce mode for inputs longer than this many tokens: the
+            text is split into chunks of at most this size at paragraph or sentence boundaries, key
+            points are extracted from the chunks concurrently, and the note is generated from those
+            (see `dspy_modules.note_gen.KeyPointsExtractor`). Defaults to `CHUNK_TOKENS` (32000),
+            0 meaning off.
+        note_list_k (int, optional): With `prompt_with_note_list`, the number of relevant note names
+            in the prompt, chosen by `tools.note_selection.select_related_notes`. 0 includes every note.
+            Defaults to `NOTE_LIST_K` (40).
+        note_list_max_tokens (int, optional): Token budget for those names. Defaults to
+            `NOTE_LIST_MAX_TOKENS` (600).
+
+    Raises:
+        TokenBudgetExceeded: If `long_text` is over `max_input_tokens`.
     """
     assert_note_name_is_valid(note_name+".md")
-    # Token estimation
+    chunk_tokens = CHUNK_TOKENS if chunk_tokens is None else chunk_tokens
+    chunks = chunk_text(long_text, chunk_tokens, deployment_name) if chunk_tokens else [long_text]
+    if len(chunks) == 1:
+        enforce_budget(long_text, MAX_INPUT_TOKENS if max_input_tokens is None else max_input_tokens, deployment_name)
+    # Token counts with the model's tokenizer
     note_list = get_notes_list()
-    long_text_tokens = len(long_text) / 3.5
-    note_list_tokens = len("".join(note_list)) / 3.5
+    tokenizer = get_tokenizer(deployment_name)
+    long_text_tokens = tokenizer.count(long_text)
+    prompt_notes = []
+    if prompt_with_note_list:
+        prompt_notes = (select_related_notes(long_text, note_list, note_list_k, note_list_max_tokens, model=deployment_name)
+                        if note_list_k else note_list)
+    note_list_tokens = tokenizer.count("\n".join(prompt_notes))
     total_tokens = long_text_tokens + note_list_tokens
+    approximate = "" if tokenizer.exact else " (approximate)"
 
     if verbose:
-        print(f"Estimated tokens for long_text: {long_text_tokens:.2f}")
-        print(f"Estimated tokens for note_list: {note_list_tokens:.2f}")
-        print(f"Total estimated tokens: {total_tokens:.2f}")
+        print(f"Tokens for long_text: {long_text_tokens}{approximate}")
+        print(f"Tokens for note_list: {note_list_tokens}{approximate} ({len(prompt_notes)} of {len(note_list)} notes)")
+        print(f"Total input tokens: {total_tokens}{approximate}")
+        if len(chunks) > 1:
+            print(f"Map-reduce: {len(chunks)} chunks of up to {chunk_tokens} tokens, {MAP_WORKERS} at a time")
         print(f"DSPy max generation tokens: {MAX_TOKENS}")
 
     # Require user confirmation if auto_allow is False
     if not ignore_token_limit:
         while True:
-            user_input = input(f"The estimated token usage is {total_tokens:.2f} tokens. Proceed with the LLM call? (y/n/print): ")
+            user_input = input(f"The input is {total_tokens} tokens{approximate}. Proceed with the LLM call? (y/n/print): ")
             if user_input.lower() == 'y':
                 break
             elif user_input.lower() == 'n':
@@ -117,22 +124,37 @@ def obsidify_text(long_text: str,
             else:
                 print("Invalid input. Please enter 'y', 'n', or 'print'.")
 
+    with collect_usage() as map_usage:
+        if len(chunks) > 1:
+            # Map: key points from every chunk; reduce: the note is generated from those
+            long_text = KeyPointsExtractor(max_workers=MAP_WORKERS)(chunks=chunks, max_tokens=chunk_tokens).context
+            if verbose:
+                print(f"\n\nKey points ({tokenizer.count(long_text)} tokens):\n\n{long_text}")
+
+    model_tag = deployment_name.replace('.', '_') #obsidian tags don't support dots 
+    if stream:
+        stream_note(long_text, note_name, prompt_notes,
+                    link_to=note_list if insert_links else None,
+                    extra_tags=[model_tag], extra_properties=extra_properties)
+        print(f"Note '{note_name}' created successfully in the vault.")
+        return
+
     note_generator = NoteGenerator()
-    if prompt_with_note_list:
-        response = note_generator(context=long_text, note_list=note_list)
-    else:
-        response = note_generator(context=long_text,note_list=[])
+    with collect_usage() as usage:
+        response = note_generator(context=long_text, note_list=prompt_notes)
     reasoning = response.reasoning
     obsidian_note = response.obs_note
+    usage = map_usage + usage
 
     if verbose: 
         print(f"\n\nReasoning:\n\n{reasoning}")
         print(f"\n\nObsidian note:\n\n{obsidian_note}\n\n")
-        print(f"Generated token estimate: {len(obsidian_note+reasoning)/3.5:.2f}")
+        print(f"Tokens used: {sum(r['prompt_tokens'] for r in usage)} prompt, "
+              f"{sum(r['completion_tokens'] for r in usage)} completion"
+              f"{' (cached)' if usage and all(r['cached'] for r in usage) else ''}")
 
     if insert_links:
         obsidian_note = insert_links_to_existing_notes(obsidian_note, note_list)
-    model_tag = deployment_name.replace('.', '_') #obsidian tags don't support dots 
     create_note(note_name, obsidian_note, extra_tags=[model_tag], extra_properties=extra_properties)
     print(f"Note '{note_name}' created successfully in the vault.")
 
@@ -141,12 +163,114 @@ def insert_links_to_existing_notes(long_text: str, note_list: list[str]) -> str:
     """
     Takes a long text and a list of existing notes, and inserts links to the existing notes into the text.
     Ensures that notes already enclosed in [[ ]] are not modified.
+
+    Uses a `tools.note_linker.NoteLinker` built once per note list, so the text is scanned
+    a single time however many notes exist. Names only match whole words, the longest
+    name wins where names overlap, and frontmatter, code and existing links are skipped.
+    Mentions of a note's frontmatter aliases are linked too, and existing links whose
+    target doesn't exist are pointed at the closest note name or alias, if any is close
+    enough (`tools.name_index`).
     """
-    for note in note_list:
-        # Use regex to check if the note is already enclosed in [[ ]]
-        pattern = rf"(?<!\[\[){re.escape(note)}(?!\]\])"
-        long_text = re.sub(pattern, f"[[{note}]]", long_text)
-    return long_text
+    name_index = get_name_index(note_list)
+    long_text = repair_links(long_text, note_list)
+    return get_linker(note_list, aliases=name_index.aliases).link(long_text)
+
+
+
+class ParagraphSplitter:
+    """Cuts streamed text into complete paragraphs, never splitting a fenced code block."""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text; return the paragraphs it completed, each with its trailing blank line."""
+        self.buffer += text
+        paragraphs, start = [], 0
+        while True:
+            end = self.buffer.find("\n\n", start)
+            if end == -1:
+                break
+            candidate = self.buffer[:end + 2]
+            if len(FENCE_RE.findall(candidate)) % 2 == 0:
+                paragraphs.append(candidate)
+                self.buffer = self.buffer[end + 2:]
+                start = 0
+            else:
+                start = end + 1  # blank line inside a code block
+        return paragraphs
+
+    def flush(self) -> list[str]:
+        """Return whatever is left at the end of the stream."""
+        rest, self.buffer = self.buffer, ""
+        return [rest] if rest else []
+
+
+def stream_note(context: str, note_name: str, note_list: list[str], link_to: list[str] = None,
+                extra_tags: list[str] = None, extra_properties: dict = None):
+    """
+    Generate a note with `NoteGenerator`, streaming it to the terminal and into the vault.
+
+    Reasoning and note tokens are printed as they arrive. Each completed paragraph of
+    the note gets its links inserted and is appended to a hidden temporary file, which
+    is renamed to `<note_name>.md` once generation finishes (`tools.md_files.NoteStream`).
+    A response served from the LLM cache arrives whole and is written the same way.
+
+    Args:
+        context (str): The text the note is generated from.
+        note_name (str): The name of the note to create.
+        note_list (list[str]): Existing notes shown to the model.
+        link_to (list[str]): Notes to insert links to, or None to skip link insertion.
+        extra_tags (list[str]): Tags added to the frontmatter.
+        extra_properties (dict): Extra frontmatter properties.
+
+    Returns:
+        dspy.Prediction: The final prediction, with `reasoning` and `obs_note`.
+    """
+    import asyncio
+    import dspy
+    from dspy.streaming import StreamListener, StreamResponse
+    from tools.md_files import NoteStream
+
+    program = dspy.streamify(NoteGenerator(), stream_listeners=[
+        StreamListener(signature_field_name="reasoning"),
+        StreamListener(signature_field_name="obs_note"),
+    ])
+
+    async def run():
+        splitter = ParagraphSplitter()
+        prediction, field = None, None
+        started = False
+
+        def emit(paragraphs):
+            nonlocal started
+            for paragraph in paragraphs:
+                if not started:
+                    paragraph = paragraph.lstrip()
+                    started = bool(paragraph)
+                note.write(insert_links_to_existing_notes(paragraph, link_to) if link_to else paragraph)
+
+        with NoteStream(note_name, extra_tags, extra_properties) as note:
+            async for chunk in program(context=context, note_list=note_list):
+                if isinstance(chunk, StreamResponse):
+                    if chunk.signature_field_name != field:
+                        field = chunk.signature_field_name
+                        print(f"\n\n{'Reasoning' if field == 'reasoning' else 'Obsidian note'}:\n", flush=True)
+                    print(chunk.chunk, end="", flush=True)
+                    if field == "obs_note":
+                        emit(splitter.feed(chunk.chunk))
+                elif isinstance(chunk, dspy.Prediction):
+                    prediction = chunk
+            if prediction is not None and field != "obs_note":
+                # Nothing was streamed (e.g. a cached response): write the note in one go
+                print(f"\n\nObsidian note:\n\n{prediction.obs_note}", flush=True)
+                emit(splitter.feed(prediction.obs_note))
+            emit(splitter.flush())
+        print()
+        return prediction
+
+    return asyncio.run(run())
+
 
 def paste_text_to_note(text: str, note_name: str, verbose: bool = False, extra_properties: dict = None):
     """
@@ -0,0 +1,341 @@
+"""FAISS index construction for the note and passage indexes.
+
+The index type is picked per call or with the NOTES_INDEX_TYPE environment variable:
+- flat: exact brute-force L2 search (default, best for small vaults)
+- ivf_flat: inverted lists over k-means cells, exact distances within the probed cells
+- ivf_pq: inverted lists with product-quantised vectors, smallest on disk
+- hnsw: graph-based search, fast queries without training
+
+Every index built here accepts `add_with_ids`, so it plugs into the incremental
+reindex loop in `tools.md_files`. Training and search parameters are sized from the
+number of vectors. An IVF type asked for with too few vectors to train on is built
+flat, and `upgrade_index` switches it over once the collection has grown enough. Run `python -m tools.ann_index` to compare the types on your data.
+"""
+import math
+import os
+
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+DEFAULT_INDEX_TYPE = os.getenv("NOTES_INDEX_TYPE", "flat")
+# IVF types are built flat below this many vectors: too few to train on, and exact search is fast anyway
+MIN_IVF_VECTORS = 39 * 16
+
+
+def default_params(index_type: str, n_vectors: int, dim: int) -> dict:
+    """
+    Pick build and search parameters for an index type from the collection size.
+
+    IVF uses about 4*sqrt(n) cells (at least 39 training points per cell) and probes
+    1/8 of them. PQ uses 8 dimensions per sub-quantiser and fewer bits per code when
+    there are too few vectors to train 256 centroids. HNSW uses 32 neighbours per node.
+    """
+    if index_type == "flat":
+        return {}
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+        params = {"nlist": nlist, "nprobe": max(1, min(64, nlist // 8))}
+        if index_type == "ivf_pq":
+            m = max(d for d in range(1, max(1, dim // 8) + 1) if dim % d == 0)
+            nbits = int(min(8, max(4, math.floor(math.log2(max(n_vectors, 1) / 39 + 1)))))
+            params.update({"m": m, "nbits": nbits})
+        return params
+    if index_type == "hnsw":
+        return {"M": 32, "ef_construction": 80, "ef_search": max(64, min(256, int(2 * math.sqrt(n_vectors))))}
+    raise ValueError(f"Unknown index type '{index_type}'. Expected one of {', '.join(INDEX_TYPES)}.")
+
+
+def create_index(index_type: str, dim: int, n_vectors: int, **params):
+    """
+    Create an empty, untrained ID-aware FAISS index sized for about `n_vectors` vectors.
+
+    IVF types need enough vectors to train on; below MIN_IVF_VECTORS a flat index is
+    created instead (`index_type_of` tells which type was built). Use `training_size`
+    to see how many vectors to collect before calling `train`.
+
+    Args:
+        index_type (str): One of INDEX_TYPES. Defaults to NOTES_INDEX_TYPE or "flat".
+        dim (int): Vector dimension.
+        n_vectors (int): Expected collection size, used to size the parameters.
+        **params: Overrides for the values from `default_params`.
+
+    Returns:
+        faiss.Index: The empty index.
+    """
+    import faiss
+
+    index_type = index_type or DEFAULT_INDEX_TYPE
+    if index_type.startswith("ivf") and n_vectors < MIN_IVF_VECTORS:
+        index_type = "flat"
+    params = {**default_params(index_type, n_vectors, dim), **params}
+
+    if index_type == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, params["nlist"])
+    elif index_type == "ivf_pq":
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, params["nlist"], params["m"], params["nbits"])
+    else:
+        hnsw = faiss.IndexHNSWFlat(dim, params["M"])
+        hnsw.hnsw.efConstruction = params["ef_construction"]
+        hnsw.hnsw.efSearch = params["ef_search"]
+        return faiss.IndexIDMap2(hnsw)
+    index.nprobe = params["nprobe"]
+    return index
+
+
+def training_size(index) -> int:
+    """Number of vectors to train `index` on, or 0 if it needs no (more) training."""
+    import faiss
+    if index.is_trained:
+        return 0
+    ivf = faiss.extract_index_ivf(index)
+    size = 39 * ivf.nlist
+    if isinstance(ivf, faiss.IndexIVFPQ):
+        size = max(size, 39 * (1 << ivf.pq.nbits))
+    return size
+
+
+def build_index(vectors: np.ndarray, ids: np.ndarray, index_type: str = None, **params):
+    """
+    Build, train and fill an ID-aware FAISS index.
+
+    Args:
+        vectors (np.ndarray): float32 matrix of shape (n, dim).
+        ids (np.ndarray): int64 ids, one per row of `vectors`.
+        index_type (str): One of INDEX_TYPES. Defaults to NOTES_INDEX_TYPE or "flat".
+        **params: Overrides for the values from `default_params`.
+
+    Returns:
+        faiss.Index: The populated index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    n, dim = vectors.shape
+    index = create_index(index_type, dim, n, **params)
+    if not index.is_trained:
+        index.train(vectors)
+    if n:
+        index.add_with_ids(vectors, np.asarray(ids, dtype='int64'))
+    return index
+
+
+class StreamingIndexBuilder:
+    """
+    Fill an index batch by batch without holding every embedding in memory.
+
+    Flat and HNSW indexes take each batch as it arrives. IVF indexes buffer batches
+    until they have `training_size` vectors, train on them and then add straight
+    through. If the stream ends before that, the buffered vectors are indexed with
+    `build_index`, which sizes the parameters for what actually arrived.
+
+    Args:
+        index_type (str): One of INDEX_TYPES. Defaults to NOTES_INDEX_TYPE or "flat".
+        n_vectors (int): Expected collection size, used to size the parameters.
+        index: An existing index to add to instead of creating a new one.
+    """
+
+    def __init__(self, index_type: str = None, n_vectors: int = 0, index=None):
+        self.index_type = index_type or DEFAULT_INDEX_TYPE
+        self.n_vectors = n_vectors
+        self.index = index
+        self._buffer = []  # [(vectors, ids)] waiting for training
+        self._buffered = 0
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        ids = np.asarray(ids, dtype='int64')
+        if self.index is None:
+            self.index = create_index(self.index_type, vectors.shape[1], self.n_vectors)
+        if not self.index.is_trained:
+            self._buffer.append((vectors, ids))
+            self._buffered += len(vectors)
+            if self._buffered < training_size(self.index):
+                return
+            vectors = np.concatenate([v for v, _ in self._buffer])
+            ids = np.concatenate([i for _, i in self._buffer])
+            self._buffer, self._buffered = [], 0
+            self.index.train(vectors)
+        self.index.add_with_ids(vectors, ids)
+
+    def finish(self, dim: int):
+        """Return the finished index; `dim` is used if no vectors arrived at all."""
+        if self._buffer:
+            vectors = np.concatenate([v for v, _ in self._buffer])
+            ids = np.concatenate([i for _, i in self._buffer])
+            self._buffer, self._buffered = [], 0
+            self.index = build_index(vectors, ids, self.index_type)
+        elif self.index is None:
+            self.index = build_index(np.empty((0, dim), dtype='float32'), np.empty(0, dtype='int64'), self.index_type)
+        return self.index
+
+
+def index_type_of(index) -> str:
+    """Return which of INDEX_TYPES a FAISS index was built as."""
+    import faiss
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def upgrade_index(index, index_type: str):
+    """
+    Rebuild a flat stand-in for an IVF index as `index_type` once it is large enough.
+
+    Returns `index` unchanged unless `index_type` is an IVF type, `index` is flat and it
+    holds at least MIN_IVF_VECTORS vectors. The vectors and ids are read back out of
+    the flat index, so nothing is re-embedded.
+    """
+    import faiss
+    if not index_type.startswith("ivf") or index_type_of(index) != "flat" or index.ntotal < MIN_IVF_VECTORS:
+        return index
+    ids = faiss.vector_to_array(index.id_map)
+    vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    return build_index(vectors, ids, index_type)
+
+
+def supports_ids(index) -> bool:
+    """True if `index` maps vectors to caller-chosen ids (i.e. was built by `build_index`)."""
+    import faiss
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF))
+
+
+def remove_ids(index, ids):
+    """
+    Remove `ids` from an index and return the index to keep using.
+
+    HNSW graphs cannot delete nodes, so an HNSW index is rebuilt from its own stored
+    vectors (no re-embedding needed); every other type removes in place.
+    """
+    import faiss
+    ids = np.asarray(ids, dtype='int64')
+    if index_type_of(index) != "hnsw":
+        index.remove_ids(ids)
+        return index
+
+    all_ids = faiss.vector_to_array(index.id_map)
+    keep = ~np.isin(all_ids, ids)
+    inner = faiss.downcast_index(index.index)
+    vectors = inner.reconstruct_n(0, inner.ntotal)[keep]
+    return build_index(vectors, all_ids[keep], "hnsw", M=inner.hnsw.nb_neighbors(1),
+                       ef_construction=inner.hnsw.efConstruction, ef_search=inner.hnsw.efSearch)
+
+
+def benchmark(vectors: np.ndarray, index_types=INDEX_TYPES, k: int = 10, n_queries: int = 200,
+              seed: int = 0) -> list[dict]:
+    """
+    Compare index types on a set of vectors against the exact flat baseline.
+
+    Queries are stored vectors with a little Gaussian noise, so each has a meaningful
+    neighbourhood. For every index type this reports recall@k against flat search,
+    single-query latency percentiles, build time and serialized index size.
+
+    Args:
+        vectors (np.ndarray): float32 matrix of shape (n, dim).
+        index_types: Index types to benchmark. Defaults to all of INDEX_TYPES.
+        k (int): Neighbours per query for recall@k. Defaults to 10.
+        n_queries (int): Number of queries to time. Defaults to 200.
+        seed (int): Random seed for query selection. Defaults to 0.
+
+    Returns:
+        list[dict]: One result dict per index type.
+    """
+    import faiss
+    import tempfile
+    import time
+
+    rng = np.random.default_rng(seed)
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    ids = np.arange(len(vectors), dtype='int64')
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    noise = rng.normal(scale=float(vectors.std()) * 0.05, size=(len(picks), vectors.shape[1]))
+    queries = (vectors[picks] + noise).astype('float32')
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(vectors, ids, index_type)
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, I = index.search(query[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = I[0]
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.faiss")
+            faiss.write_index(index, path)
+            size = os.path.getsize(path)
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        results.append({"index_type": index_type, f"recall@{k}": float(recall),
+                        "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                        "build_s": build_seconds, "size_mb": size / 1e6})
+    return results
+
+
+def _load_vectors(index_path: str) -> np.ndarray:
+    """
+    Pull the stored vectors back out of an existing flat, HNSW or IVF-flat index.
+
+    Raises:
+        ValueError: For an IVF-PQ index, which only keeps lossy codes of its vectors.
+    """
+    import faiss
+    index = faiss.read_index(index_path)
+    index_type = index_type_of(index)
+    if index_type == "ivf_pq":
+        raise ValueError(f"{index_path} is an IVF-PQ index, which stores compressed codes rather than "
+                         "the vectors; benchmark a flat, HNSW or IVF-flat index instead.")
+    if index_type == "ivf_flat":
+        # IVF-flat codes are the raw float32 vectors, list by list
+        invlists = index.invlists
+        parts = [np.frombuffer(faiss.rev_swig_ptr(invlists.get_codes(l), invlists.list_size(l) * invlists.code_size),
+                               dtype='float32').reshape(-1, index.d)
+                 for l in range(index.nlist) if invlists.list_size(l)]
+        return np.concatenate(parts) if parts else np.empty((0, index.d), dtype='float32')
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    return inner.reconstruct_n(0, inner.ntotal)
+
+
+if __name__ == "__main__":
+    import argparse
+    from tools.md_files import INDEX_PATH, PASSAGES_INDEX_PATH
+
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types against exact search.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--passages", action="store_true", help="Use the vectors in the passages index.")
+    source.add_argument("--index", type=str, help="Use the vectors stored in this flat, HNSW or IVF-flat index file.")
+    source.add_argument("--synthetic", type=int, help="Use this many random clustered vectors instead.")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors.")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("-k", type=int, default=10, help="Neighbours per query for recall@k.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries to time.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(max(1, args.synthetic // 100), args.dim))
+        vectors = centers[rng.integers(len(centers), size=args.synthetic)] + rng.normal(scale=0.3, size=(args.synthetic, args.dim))
+    else:
+        try:
+            vectors = _load_vectors(args.index or (PASSAGES_INDEX_PATH if args.passages else INDEX_PATH))
+        except ValueError as e:
+            parser.error(str(e))
+
+    print(f"Benchmarking {len(vectors)} vectors of dim {vectors.shape[1]}")
+    print(f"{'type':<10}{'recall@' + str(args.k):>11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'build s':>10}{'size MB':>10}")
+    for row in benchmark(vectors, args.types, k=args.k, n_queries=args.queries):
+        print(f"{row['index_type']:<10}{row[f'recall@{args.k}']:>11.3f}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+              f"{row['p99_ms']:>10.3f}{row['build_s']:>10.2f}{row['size_mb']:>10.2f}")
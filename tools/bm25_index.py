@@ -0,0 +1,453 @@
+"""Persisted BM25 inverted index over note text.
+
+Semantic search is weak on exact identifiers (model names, people, ticket ids), so
+`reindex_notes` maintains this lexical index next to the FAISS one and
+`md_files.hybrid_search` fuses the two rankings.
+
+The index is stored as numpy arrays in a single `.npz` (loaded without pickle) and
+made of up to two segments, each with:
+
+- `vocab`: its sorted term strings; a term's id is its position.
+- Postings: for each term, the ids of the documents containing it, sorted and
+  delta-encoded as LEB128 varints in one byte array, with the matching term
+  frequencies alongside.
+- A forward index of each document's (term id, tf) pairs, used when segments are merged.
+
+An incremental update marks replaced and deleted documents dead and indexes the new
+versions into the small second segment, so saving one edited note doesn't rewrite
+the postings of the whole vault. The segments are merged once the second one (or
+the share of dead documents) grows past a fraction of the index.
+
+Decoding a posting list and scoring is vectorised with numpy, so a keyword lookup
+touches only the bytes of the query terms' postings.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+
+# Identifiers such as "gpt-4.1" or "nemotron-h-lawsky" are kept whole and also split
+# into their parts, so both the full name and a fragment of it match
+TOKEN_RE = re.compile(r"\w+(?:[.\-/]\w+)*")
+PART_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase terms of `text`: each word, plus each compound identifier as a whole."""
+    terms = []
+    for token in TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        if "." in token or "-" in token or "/" in token:
+            terms.extend(PART_RE.findall(token))
+    return terms
+
+
+def analyze(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Tokenize `text` into its distinct terms and their counts, the form stored per document."""
+    from collections import Counter
+    counts = Counter(tokenize(text))
+    terms = np.array(list(counts), dtype=str)
+    tfs = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    return terms, np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16)
+
+
+def _varint_encode(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """LEB128-encode non-negative integers; returns (bytes, byte length of each value)."""
+    values = values.astype(np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += values >= (np.uint64(1) << np.uint64(7 * k))
+    starts = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=starts[1:])
+    out = np.zeros(starts[-1], dtype=np.uint8)
+    for k in range(int(lengths.max()) if len(values) else 0):
+        has = lengths > k
+        chunk = (values[has] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (lengths[has] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[:-1][has] + k] = (chunk | more).astype(np.uint8)
+    return out, lengths
+
+
+def _varint_decode(data: np.ndarray) -> np.ndarray:
+    """Decode a run of LEB128 varints produced by `_varint_encode`."""
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = data < 0x80
+    group = np.zeros(len(data), dtype=np.int64)
+    np.cumsum(ends[:-1], out=group[1:])
+    group_starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    shift = (np.arange(len(data)) - group_starts[group]) * 7
+    parts = (data & 0x7F).astype(np.int64) << shift
+    return np.bincount(group, weights=parts, minlength=group[-1] + 1).astype(np.int64)
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Positions covered by the ranges [start, start + length), concatenated in order."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    ends = np.cumsum(lengths)
+    return np.repeat(np.asarray(starts, dtype=np.int64) - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+
+
+class _Segment:
+    """Postings and forward index for a set of documents, identified by index-wide doc ids."""
+
+    FIELDS = ("vocab", "doc_ids", "fwd_offsets", "fwd_terms", "fwd_tfs",
+              "post_offsets", "post_bytes", "post_starts", "post_tfs")
+
+    def __init__(self, **arrays):
+        for field in self.FIELDS:
+            setattr(self, field, arrays[field])
+
+    @classmethod
+    def build(cls, doc_ids: np.ndarray, documents: list) -> "_Segment":
+        """
+        Index `documents`, a list of (terms, tfs) pairs as returned by `analyze`, under
+        the ascending index-wide `doc_ids`.
+        """
+        term_lists = [terms.tolist() for terms, _ in documents]
+        vocab = sorted(set().union(*term_lists)) if term_lists else []
+        position = {term: i for i, term in enumerate(vocab)}
+        lengths = np.array([len(terms) for terms in term_lists], dtype=np.int64)
+        fwd_terms = np.fromiter((position[t] for terms in term_lists for t in terms),
+                                dtype=np.int64, count=int(lengths.sum()))
+        fwd_tfs = (np.concatenate([tfs for _, tfs in documents]) if documents
+                   else np.zeros(0, dtype=np.uint16)).astype(np.uint16)
+        return cls.from_forward(doc_ids, np.array(vocab, dtype=str), lengths, fwd_terms, fwd_tfs)
+
+    @classmethod
+    def from_forward(cls, doc_ids: np.ndarray, vocab: np.ndarray, lengths: np.ndarray,
+                     fwd_terms: np.ndarray, fwd_tfs: np.ndarray) -> "_Segment":
+        """
+        Index documents given as a forward index: each document's number of distinct
+        terms (`lengths`), then all their term ids into the sorted `vocab` and their tfs.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        fwd_terms = np.asarray(fwd_terms, dtype=np.int64)
+        fwd_tfs = np.asarray(fwd_tfs, dtype=np.uint16)
+        fwd_offsets = np.zeros(len(doc_ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=fwd_offsets[1:])
+
+        n_terms = len(vocab)
+        local_docs = np.repeat(np.arange(len(doc_ids), dtype=np.int64), lengths)
+        # Unique (term, doc) keys, so an unstable sort still orders each list by doc
+        order = np.argsort(fwd_terms * max(len(doc_ids), 1) + local_docs)
+        terms = fwd_terms[order]
+        docs = doc_ids[local_docs[order]]
+        counts = np.bincount(terms, minlength=n_terms)
+        post_starts = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(counts, out=post_starts[1:])
+
+        # Gaps between consecutive doc ids of a term; each list starts from 0
+        deltas = np.diff(docs, prepend=0)
+        first = post_starts[:-1][counts > 0]
+        deltas[first] = docs[first]
+        post_bytes, byte_lengths = _varint_encode(deltas)
+        cumulative = np.zeros(len(byte_lengths) + 1, dtype=np.int64)
+        np.cumsum(byte_lengths, out=cumulative[1:])
+
+        return cls(vocab=vocab, doc_ids=doc_ids,
+                   fwd_offsets=fwd_offsets, fwd_terms=fwd_terms.astype(np.int32), fwd_tfs=fwd_tfs,
+                   post_offsets=cumulative[post_starts], post_bytes=post_bytes,
+                   post_starts=post_starts, post_tfs=fwd_tfs[order])
+
+    @classmethod
+    def empty(cls) -> "_Segment":
+        return cls.build(np.zeros(0, dtype=np.int64), [])
+
+    def forward(self, keep: np.ndarray = None) -> tuple:
+        """
+        (doc ids, distinct terms per document, term ids, tfs) of the documents whose doc
+        id is set in the boolean `keep` mask, or of every document.
+        """
+        lengths = np.diff(self.fwd_offsets)
+        if keep is None:
+            return self.doc_ids, lengths, self.fwd_terms, self.fwd_tfs
+        rows = np.flatnonzero(keep[self.doc_ids])
+        at = _ranges(self.fwd_offsets[rows], lengths[rows])
+        return self.doc_ids[rows], lengths[rows], self.fwd_terms[at], self.fwd_tfs[at]
+
+    @classmethod
+    def combine(cls, parts: list) -> "_Segment":
+        """
+        Index together several forward indexes, given as (vocab, `forward` result) pairs
+        whose term ids refer to their own vocab; the doc ids may come in any order.
+        """
+        vocabs = [vocab for vocab, _ in parts if len(vocab)]
+        vocab = np.unique(np.concatenate(vocabs)) if vocabs else np.zeros(0, dtype=str)
+        doc_ids, lengths, terms, tfs = ([np.zeros(0, dtype=dtype)]
+                                        for dtype in (np.int64, np.int64, np.int64, np.uint16))
+        for part_vocab, (part_ids, part_lengths, part_terms, part_tfs) in parts:
+            doc_ids.append(part_ids)
+            lengths.append(part_lengths)
+            terms.append(np.searchsorted(vocab, part_vocab)[part_terms] if len(part_terms) else part_terms)
+            tfs.append(part_tfs)
+        doc_ids, lengths, terms, tfs = (np.concatenate(arrays) for arrays in (doc_ids, lengths, terms, tfs))
+        if np.any(doc_ids[1:] < doc_ids[:-1]):
+            order = np.argsort(doc_ids, kind="stable")
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            at = _ranges(offsets[order], lengths[order])
+            doc_ids, lengths, terms, tfs = doc_ids[order], lengths[order], terms[at], tfs[at]
+        return cls.from_forward(doc_ids, vocab, lengths, terms, tfs)
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        """Return (doc ids, term frequencies) for one already-tokenized term."""
+        i = int(np.searchsorted(self.vocab, term))
+        if i >= len(self.vocab) or self.vocab[i] != term:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint16)
+        return self.postings_at(i)
+
+    def postings_at(self, i: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return (doc ids, term frequencies) for the term with id `i`."""
+        docs = np.cumsum(_varint_decode(self.post_bytes[self.post_offsets[i]:self.post_offsets[i + 1]]))
+        return docs, self.post_tfs[self.post_starts[i]:self.post_starts[i + 1]]
+
+
+class AnalyzedDocuments:
+    """
+    `analyze` results collected for one `BM25Index.update`, stored compactly.
+
+    `analyze` returns each document's terms as a fixed-width unicode array, several
+    times the size of the counts. A reindex hands its changed notes over one at a time,
+    so each is reduced on arrival to int32 ids into a shared vocabulary plus its uint16
+    counts, and the index is built from those ids without decoding them back to strings.
+    """
+
+    def __init__(self):
+        self.names = []
+        self._vocab = {}  # term -> id, in order of first appearance
+        self._lengths, self._terms, self._tfs = [], [], []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, analyzed: tuple[np.ndarray, np.ndarray]) -> None:
+        """Add one document's `analyze` result; a name must only be added once."""
+        terms, tfs = analyzed
+        vocab = self._vocab
+        self._terms.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in terms.tolist()),
+                                       dtype=np.int32, count=len(terms)))
+        self._tfs.append(np.asarray(tfs, dtype=np.uint16))
+        self._lengths.append(len(terms))
+        self.names.append(name)
+
+    def forward(self) -> tuple:
+        """(sorted vocab, (local doc ids, lengths, term ids, tfs)), as `_Segment.combine` takes."""
+        vocab = np.array(list(self._vocab), dtype=str)
+        order = np.argsort(vocab, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        terms = rank[np.concatenate(self._terms)] if self._terms else np.zeros(0, dtype=np.int64)
+        tfs = np.concatenate(self._tfs) if self._tfs else np.zeros(0, dtype=np.uint16)
+        lengths = np.array(self._lengths, dtype=np.int64)
+        return vocab[order], (np.arange(len(self.names), dtype=np.int64), lengths, terms, tfs)
+
+
+class BM25Index:
+    """
+    Okapi BM25 over whole notes.
+
+    Build or refresh it with `update`, persist it with `save`, and open the persisted
+    copy with `BM25Index.load`.
+
+    Args:
+        k1 (float): Term frequency saturation. Defaults to 1.2.
+        b (float): Document length normalisation. Defaults to 0.75.
+    """
+
+    # Merge the segments when the second one holds more than this share of the live
+    # documents, or when more than this share of all documents are dead
+    MERGE_RATIO = 0.1
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_names = []
+        self.doc_lens = np.zeros(0, dtype=np.int32)
+        self.live = np.zeros(0, dtype=bool)
+        self.main = _Segment.empty()
+        self.delta = _Segment.empty()
+        self._ids = None
+
+    def __len__(self) -> int:
+        return int(self.live.sum())
+
+    @property
+    def names(self) -> list[str]:
+        """Names of the indexed (live) notes."""
+        return [self.doc_names[i] for i in np.flatnonzero(self.live)]
+
+    def _id_of(self) -> dict:
+        if self._ids is None:
+            self._ids = {self.doc_names[i]: int(i) for i in np.flatnonzero(self.live)}
+        return self._ids
+
+    # ---------- building ---------- #
+
+    def update(self, documents=None, remove=(), keep=None) -> None:
+        """
+        Add or replace documents and drop others.
+
+        Args:
+            documents (dict | AnalyzedDocuments): Note name -> text (or its `analyze`
+                result) for new or changed notes.
+            remove: Note names to drop.
+            keep (set[str]): If given, also drop every note not in this set.
+        """
+        if not isinstance(documents, AnalyzedDocuments):
+            analyzed = AnalyzedDocuments()
+            for name, doc in (documents or {}).items():
+                analyzed.add(name, analyze(doc) if isinstance(doc, str) else doc)
+            documents = analyzed
+        names = documents.names
+        vocab, (_, lengths, terms, tfs) = documents.forward()
+
+        ids = self._id_of()
+        for name in set(remove) | set(names):
+            if name in ids:
+                self.live[ids[name]] = False
+        if keep is not None:
+            for name, i in ids.items():
+                if name not in keep:
+                    self.live[i] = False
+
+        first_new = len(self.doc_names)
+        new_ids = np.arange(first_new, first_new + len(names), dtype=np.int64)
+        self.doc_names.extend(names)
+        sums = np.concatenate(([0], np.cumsum(tfs, dtype=np.int64)))
+        ends = np.cumsum(lengths)
+        self.doc_lens = np.concatenate((self.doc_lens, (sums[ends] - sums[ends - lengths]).astype(np.int32)))
+        self.live = np.concatenate((self.live, np.ones(len(names), dtype=bool)))
+        self._ids = None
+
+        # Re-index the second segment's surviving documents plus the new ones
+        parts = [(self.delta.vocab, self.delta.forward(self.live)), (vocab, (new_ids, lengths, terms, tfs))]
+        n_delta = sum(len(forward[0]) for _, forward in parts)
+        n_live = int(self.live.sum())
+        n_dead = len(self.live) - n_live
+        if n_delta > self.MERGE_RATIO * max(n_live, 1) or n_dead > self.MERGE_RATIO * len(self.live):
+            self._merge(parts)
+        else:
+            self.delta = _Segment.combine(parts)
+
+    def _merge(self, delta_parts: list) -> None:
+        """Rebuild everything into one segment, renumbering the live documents from 0."""
+        parts = [(self.main.vocab, self.main.forward(self.live))] + delta_parts
+        old_ids = np.sort(np.concatenate([forward[0] for _, forward in parts]))
+        parts = [(vocab, (np.searchsorted(old_ids, ids), lengths, terms, tfs))
+                 for vocab, (ids, lengths, terms, tfs) in parts]
+        self.doc_names = [self.doc_names[i] for i in old_ids]
+        self.doc_lens = self.doc_lens[old_ids]
+        self.live = np.ones(len(old_ids), dtype=bool)
+        self.main = _Segment.combine(parts)
+        self.delta = _Segment.empty()
+        self._ids = None
+
+    # ---------- persistence ---------- #
+
+    def save(self, path: str) -> None:
+        """Write the index atomically to `path` (an .npz file)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {f"{prefix}_{field}": getattr(segment, field)
+                  for prefix, segment in (("main", self.main), ("delta", self.delta))
+                  for field in _Segment.FIELDS}
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, doc_names=np.array(self.doc_names, dtype=str), doc_lens=self.doc_lens,
+                 live=self.live, params=np.array([self.k1, self.b]), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Open an index written by `save`."""
+        index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            index.k1, index.b = (float(x) for x in data["params"])
+            index.doc_names = data["doc_names"].tolist()
+            index.doc_lens = data["doc_lens"]
+            index.live = data["live"]
+            index.main, index.delta = (
+                _Segment(**{field: data[f"{prefix}_{field}"] for field in _Segment.FIELDS})
+                for prefix in ("main", "delta"))
+        return index
+
+    # ---------- queries ---------- #
+
+    def notes_containing(self, fragment: str, max_terms: int = 5000):
+        """
+        Notes with a term that contains `fragment`, found by scanning the vocabulary.
+
+        Terms are lowercase runs of word characters (plus compound identifiers), so for
+        a lowercase `fragment` made only of word characters this is exactly the set of
+        notes whose text contains it, ignoring case.
+
+        Args:
+            fragment (str): Lowercase substring to look for.
+            max_terms (int): Give up if more terms than this match. Defaults to 5000.
+
+        Returns:
+            set[str] | None: Note names, or None if the fragment is too common to be
+                worth answering from the index.
+        """
+        docs = []
+        for segment in (self.main, self.delta):
+            if not len(segment.vocab):
+                continue
+            hits = np.flatnonzero(np.strings.find(segment.vocab, fragment) >= 0)
+            if len(hits) > max_terms:
+                return None
+            docs.extend(segment.postings_at(i)[0] for i in hits)
+        if not docs:
+            return set()
+        docs = np.unique(np.concatenate(docs))
+        docs = docs[self.live[docs]]
+        return {self.doc_names[i] for i in docs}
+
+    def search(self, query: str, top_k: int = 5) -> list[tuple[str, float]]:
+        """
+        Rank notes for `query` by BM25.
+
+        Returns:
+            list[tuple[str, float]]: (note name, score) pairs, best first; notes that
+                contain none of the query terms are left out.
+        """
+        n_docs = len(self)
+        if not n_docs:
+            return []
+        avg_len = max(float(self.doc_lens[self.live].mean()), 1.0)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lens / avg_len)
+        scores = np.zeros(len(self.doc_names), dtype=np.float64)
+        for term in set(tokenize(query)):
+            matches = [segment.postings(term) for segment in (self.main, self.delta)]
+            docs = np.concatenate([docs for docs, _ in matches])
+            tfs = np.concatenate([tfs for _, tfs in matches]).astype(np.float64)
+            alive = self.live[docs]
+            docs, tfs = docs[alive], tfs[alive]
+            if not len(docs):
+                continue
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        hits = np.flatnonzero(scores > 0)
+        if not len(hits):
+            return []
+        best = hits[np.argsort(-scores[hits], kind="stable")[:top_k]]
+        return [(self.doc_names[i], float(scores[i])) for i in best]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_bm25_index(path: str) -> BM25Index:
+    """Return the process-wide BM25 index for `path`, reloading it when the file changes."""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    cached = _indexes.get(path)
+    if cached is None or cached[0] != signature:
+        with _indexes_lock:
+            cached = _indexes.get(path)
+            if cached is None or cached[0] != signature:
+                cached = (signature, BM25Index.load(path))
+                _indexes[path] = cached
+    return cached[1]
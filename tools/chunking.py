@@ -0,0 +1,104 @@
+"""Split markdown notes into heading-aware chunks for passage-level embedding."""
+import re
+
+from tools.md_files import FENCE_RE, HEADING_RE
+
+FRONTMATTER_RE = re.compile(r"^---\s*\n.*?\n---\s*(\n|$)", re.DOTALL)
+
+
+def _sections(text: str):
+    """Yield (heading_path, start, end) character spans, one per heading section."""
+    start = 0
+    m = FRONTMATTER_RE.match(text)
+    if m:
+        start = m.end()
+
+    heading_stack = []  # [(level, title)]
+    section_start = start
+    section_path = []
+    in_fence = False
+    pos = start
+    for line in text[start:].splitlines(keepends=True):
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            m = HEADING_RE.match(line.rstrip("\r\n"))
+            if m:
+                yield section_path, section_start, pos
+                level = len(m.group(1))
+                while heading_stack and heading_stack[-1][0] >= level:
+                    heading_stack.pop()
+                heading_stack.append((level, m.group(2)))
+                section_path = [title for _, title in heading_stack]
+                section_start = pos
+        pos += len(line)
+    yield section_path, section_start, len(text)
+
+
+def _window_end(text: str, start: int, end: int, max_chars: int) -> int:
+    """Pick where a window starting at `start` should stop, preferring paragraph, line, then word breaks."""
+    if end - start <= max_chars:
+        return end
+    limit = start + max_chars
+    floor = start + max_chars // 2
+    for sep in ("\n\n", "\r\n\r\n", "\n", " "):
+        cut = text.rfind(sep, floor, limit)
+        if cut != -1:
+            return cut + len(sep)
+    return limit
+
+
+def split_markdown(text: str, max_chars: int = 1000, overlap: int = 200) -> list[dict]:
+    """
+    Split a markdown note into chunks along its headings.
+
+    The frontmatter is skipped, and headings inside fenced code blocks are ignored.
+    Every heading starts a new chunk. Sections longer than `max_chars` are split into
+    windows that break on paragraph, line or word boundaries, with consecutive windows
+    sharing about `overlap` characters.
+
+    Args:
+        text (str): The full note content.
+        max_chars (int): Maximum characters per chunk. Defaults to 1000.
+        overlap (int): Characters shared between consecutive windows of a long section. Defaults to 200.
+
+    Returns:
+        list[dict]: One dict per chunk with the keys "heading_path" (list of heading
+            titles from the top level down), "text", and "start"/"end" (byte offsets
+            of the chunk in the UTF-8 encoded note). For the offsets to match the file,
+            `text` must be read without newline translation (`newline=""`), so that
+            CRLF line endings are kept.
+    """
+    if overlap >= max_chars:
+        raise ValueError("overlap must be smaller than max_chars")
+
+    chunks = []
+    for heading_path, sec_start, sec_end in _sections(text):
+        start = sec_start
+        while start < sec_end:
+            end = _window_end(text, start, sec_end, max_chars)
+            chunk_text = text[start:end]
+            if chunk_text.strip():
+                chunks.append({"heading_path": list(heading_path), "text": chunk_text,
+                               "start": start, "end": end})
+            if end >= sec_end:
+                break
+            next_start = max(end - overlap, start + 1)
+            # Start the overlapping window on a word boundary
+            space = text.find(" ", next_start, end)
+            start = space + 1 if space != -1 else next_start
+
+    # Convert character offsets to byte offsets in one pass over the text
+    if not text.isascii():
+        byte_offsets = {}
+        wanted = sorted({c["start"] for c in chunks} | {c["end"] for c in chunks})
+        nbytes = 0
+        prev = 0
+        for offset in wanted:
+            nbytes += len(text[prev:offset].encode("utf-8"))
+            byte_offsets[offset] = nbytes
+            prev = offset
+        for chunk in chunks:
+            chunk["start"] = byte_offsets[chunk["start"]]
+            chunk["end"] = byte_offsets[chunk["end"]]
+    return chunks
@@ -0,0 +1,211 @@
+"""A fake OpenAI-compatible (Ollama-like) server for testing LLM pipelines offline.
+
+It answers `POST /v1/chat/completions`, streamed or not, with a deterministic reply
+built from the request. Requests written by dspy's ChatAdapter get a well-formed
+answer for every `[[ ## field ## ]]` the prompt asks for, so dspy programs such as
+`NoteGenerator` run end to end. `GET /` answers like Ollama's health check.
+
+Like Ollama, the server processes at most `slots` requests at once and queues the
+rest. `latency` and `tokens_per_sec` shape the timing, and `fail_rate` makes a share
+of requests fail with HTTP 500 to exercise retries.
+
+    python -m tools.fake_openai_server --port 11435 --slots 4 --latency 0.5
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OUTPUT_FIELD_RE = re.compile(r"^\s*\d+\. `(\w+)`", re.MULTILINE)
+
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def fake_reply(messages: list[dict]) -> str:
+    """A deterministic answer to `messages`; follows dspy's ChatAdapter format when the prompt uses it."""
+    system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    if not isinstance(user, str):
+        user = json.dumps(user)
+    digest = hashlib.sha1(user.encode("utf-8")).hexdigest()[:8]
+    context = re.search(r"\[\[ ## context ## \]\]\n(.*?)(?:\n\n\[\[ ##|\Z)", user, re.DOTALL)
+    topic = (context.group(1) if context else user).strip().splitlines()[0][:80] if user.strip() else "Untitled"
+
+    # ChatAdapter lists the output fields in the system prompt: "Your output fields are: 1. `name` ..."
+    section = re.search(r"Your output fields are:(.*?)(?:\n\n[A-Z]|\Z)", system, re.DOTALL)
+    outputs = OUTPUT_FIELD_RE.findall(section.group(1)) if section else []
+    if not outputs:
+        return f"Answer {digest} about {topic}."
+    parts = []
+    for field in outputs:
+        if field == "reasoning":
+            value = f"The context is about {topic}; a short structured note covers it."
+        elif "note" in field:
+            value = (f"---\ntags:\n  - generated\naliases: []\ncreated: 2024-01-01\n---\n\n# {topic}\n\n"
+                     f"Summary {digest} of {topic}.\n\n## Details\n\nPoints about {topic}.\n")
+        else:
+            value = f"{field} {digest}"
+        parts.append(f"[[ ## {field} ## ]]\n{value}")
+    return "\n\n".join(parts) + "\n\n[[ ## completed ## ]]"
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """
+    HTTP server with Ollama-like queuing; use as a context manager to run it on a background thread.
+
+    Args:
+        port (int): Port to listen on; 0 picks a free one (see `base_url`).
+        slots (int): Requests processed at once; the rest wait. Defaults to 4.
+        latency (float): Seconds before the first token. Defaults to 0.
+        tokens_per_sec (float): Generation speed; 0 means instant. Defaults to 0.
+        fail_rate (float): Fraction of requests answered with HTTP 500. Defaults to 0.
+        seed (int): Seed for the failures. Defaults to 0.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, slots: int = 4, latency: float = 0.0, tokens_per_sec: float = 0.0,
+                 fail_rate: float = 0.0, seed: int = 0, host: str = "127.0.0.1"):
+        super().__init__((host, port), _Handler)
+        self.slots = threading.Semaphore(slots)
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.active = 0
+        self.max_active = 0
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def should_fail(self) -> bool:
+        with self._rng_lock:
+            self.requests += 1
+            fail = self._rng.random() < self.fail_rate
+            self.failures += fail
+            return fail
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeOpenAIServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/v1"):
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith("/v1/models"):
+            self._json(200, {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "fake"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.startswith("/v1/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.slots:
+            with server._rng_lock:
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+            try:
+                self._complete(request)
+            finally:
+                with server._rng_lock:
+                    server.active -= 1
+
+    def _complete(self, request: dict) -> None:
+        server = self.server
+        time.sleep(server.latency)
+        if server.should_fail():
+            self._json(500, {"error": {"message": "simulated failure", "type": "server_error"}})
+            return
+        messages = request.get("messages", [])
+        reply = fake_reply(messages)
+        model = request.get("model", "fake")
+        created = int(time.time())
+        completion_id = f"chatcmpl-{hashlib.sha1(reply.encode()).hexdigest()[:12]}"
+        usage = {"prompt_tokens": sum(_count_tokens(str(m.get("content", ""))) for m in messages),
+                 "completion_tokens": _count_tokens(reply)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        delay = 1 / server.tokens_per_sec if server.tokens_per_sec else 0.0
+
+        if not request.get("stream"):
+            time.sleep(delay * usage["completion_tokens"])
+            self._json(200, {"id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                             "choices": [{"index": 0, "finish_reason": "stop",
+                                          "message": {"role": "assistant", "content": reply}}],
+                             "usage": usage})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def send(delta: dict, finish_reason=None, extra=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send({"role": "assistant", "content": ""})
+        for piece in re.findall(r"\S+\s*|\s+", reply):
+            time.sleep(delay)
+            send({"content": piece})
+        include_usage = (request.get("stream_options") or {}).get("include_usage")
+        send({}, "stop", {"usage": usage} if include_usage else None)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI-compatible server for offline tests.")
+    parser.add_argument("--port", type=int, default=11435, help="Port (default: %(default)s).")
+    parser.add_argument("--slots", type=int, default=4, help="Requests processed at once (default: %(default)s).")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="Generation speed; 0 = instant.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests that fail with 500.")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(args.port, args.slots, args.latency, args.tokens_per_sec, args.fail_rate)
+    print(f"Serving on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,138 @@
+"""On-disk storage for the FAISS indexes and their per-vector metadata.
+
+Vectors stay in the FAISS file and are memory-mapped read-only when searching, so
+opening an index is nearly free and every process (CLI runs, the agent, batch jobs)
+shares the same pages through the OS page cache. Metadata lives in a small SQLite
+table keyed by vector id and is only read for the ids a search actually returns.
+
+Older `*_index.faiss` + `*_meta.pkl` pairs are converted by `migrate_pickle_meta`,
+or for every pair in a directory with `python -m tools.index_store`.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+
+def read_index_mmap(index_path: str):
+    """Open a FAISS index read-only with its vectors memory-mapped, falling back to a normal read."""
+    import faiss
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(index_path, flags)
+    except RuntimeError:
+        return faiss.read_index(index_path)
+
+
+def write_index_atomic(index, index_path: str) -> None:
+    """
+    Write a FAISS index to a temporary file and rename it into place.
+
+    Processes that have the old file memory-mapped keep reading the old inode
+    instead of seeing a half-written file.
+    """
+    import faiss
+    tmp_path = index_path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, index_path)
+
+
+class MetaStore:
+    """
+    Vector id -> JSON metadata, stored in SQLite and read lazily.
+
+    Metadata is a note name for the notes index and a dict for the passages index.
+    Lookups only touch the rows asked for, so opening the store costs nothing
+    regardless of how many vectors are indexed. The store also remembers the next
+    unused id, so ids are never handed out twice, even across a full rebuild.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, meta TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def __getitem__(self, item_id: int):
+        with self._lock:
+            row = self._conn.execute("SELECT meta FROM items WHERE id = ?", (int(item_id),)).fetchone()
+        if row is None:
+            raise KeyError(item_id)
+        return json.loads(row[0])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def get_many(self, ids) -> dict:
+        """Return {id: metadata} for the given ids; ids without metadata are left out."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, meta FROM items WHERE id IN ({placeholders})", ids).fetchall()
+        return {item_id: json.loads(meta) for item_id, meta in rows}
+
+    def next_id(self) -> int:
+        """The lowest id above every id this store has held, including cleared ones."""
+        with self._lock:
+            max_id = self._conn.execute("SELECT MAX(id) FROM items").fetchone()[0]
+            row = self._conn.execute("SELECT value FROM counters WHERE name = 'next_id'").fetchone()
+        return max(max_id + 1 if max_id is not None else 0, row[0] if row else 0)
+
+    def update(self, put: list[tuple[int, object]] = (), delete=(), clear: bool = False, next_id: int = None) -> None:
+        """Apply deletions, then insertions, in a single transaction, and record `next_id` if given."""
+        with self._lock, self._conn:
+            if clear:
+                self._conn.execute("DELETE FROM items")
+            self._conn.executemany("DELETE FROM items WHERE id = ?", [(int(i),) for i in delete])
+            self._conn.executemany("INSERT OR REPLACE INTO items (id, meta) VALUES (?, ?)",
+                                   [(int(i), json.dumps(meta)) for i, meta in put])
+            if next_id is not None:
+                self._conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('next_id', ?)",
+                                   (int(next_id),))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def migrate_pickle_meta(pickle_path: str, meta_path: str = None) -> str:
+    """
+    Convert a legacy `*_meta.pkl` file into a SQLite metadata store.
+
+    A list is stored under its positions, which are the ids of the plain
+    `IndexFlatL2` files it was written with; a dict keeps its own ids. The FAISS
+    file itself needs no conversion.
+
+    Args:
+        pickle_path (str): Path of the legacy metadata pickle.
+        meta_path (str): Where to write the SQLite store. Defaults to the pickle
+            path with a `.sqlite` extension.
+
+    Returns:
+        str: The path of the SQLite store.
+    """
+    import pickle
+    meta_path = meta_path or os.path.splitext(pickle_path)[0] + ".sqlite"
+    with open(pickle_path, "rb") as f:
+        meta = pickle.load(f)
+    items = meta.items() if isinstance(meta, dict) else enumerate(meta)
+    store = MetaStore(meta_path)
+    store.update(put=list(items), clear=True)
+    store.close()
+    return meta_path
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Convert *_meta.pkl index metadata to SQLite stores.")
+    parser.add_argument("directory", nargs="?", default="data/faiss", help="Directory holding the index files.")
+    args = parser.parse_args()
+
+    for pickle_path in sorted(glob.glob(os.path.join(args.directory, "*_meta.pkl"))):
+        print(f"{pickle_path} -> {migrate_pickle_meta(pickle_path)}")
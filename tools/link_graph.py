@@ -0,0 +1,402 @@
+"""Persisted graph of the [[wikilinks]] between notes.
+
+The vault is parsed once into forward links, backlinks, unresolved links and the
+heading/block anchors each note defines. Afterwards only notes whose mtime or size
+changed are re-parsed. Adjacency is stored compactly as CSR arrays of integer note ids
+in `data/index/link_graph.npz` (loaded without pickle); the raw per-note parse results
+used for incremental updates live next to it in `link_graph.json`.
+
+Link targets resolve the way Obsidian resolves them: an exact note path first, then a
+case-insensitive path, then a case-insensitive file name (shortest path wins).
+"""
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from tools import md_files
+from tools.md_files import FENCE_RE, HEADING_RE, WIKILINK_RE
+
+INDEX_DIR = "data/index"
+GRAPH_PATH = os.path.join(INDEX_DIR, "link_graph.npz")
+GRAPH_STATE_PATH = os.path.join(INDEX_DIR, "link_graph.json")
+
+BLOCK_ID_RE = re.compile(r"\s\^([A-Za-z0-9-]+)\s*$")
+INLINE_CODE_RE = re.compile(r"`[^`\n]*`")
+
+
+def parse_note_links(content: str) -> dict:
+    """
+    Extract the wikilinks and anchors of one note, ignoring anything inside code.
+
+    Returns:
+        dict: "links" as [target, anchor] pairs (anchor is "" when the link has none,
+            alias text is dropped), "headings" and "blocks" (block ids without the ^).
+    """
+    links, headings, blocks = [], [], []
+    in_fence = False
+    for line in content.splitlines():
+        if FENCE_RE.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        heading = HEADING_RE.match(line)
+        if heading:
+            headings.append(heading.group(2))
+        block = BLOCK_ID_RE.search(line)
+        if block:
+            blocks.append(block.group(1))
+        if "[[" in line:
+            for raw in WIKILINK_RE.findall(INLINE_CODE_RE.sub("", line)):
+                target, _, anchor = raw.split("|")[0].partition("#")
+                links.append([target.strip(), anchor.strip()])
+    return {"links": links, "headings": headings, "blocks": blocks}
+
+
+class _Resolver:
+    """Map link targets to note names like Obsidian does."""
+
+    def __init__(self, names: list[str]):
+        self.exact = set(names)
+        self.by_lower_path = {}
+        self.by_lower_base = {}
+        for name in sorted(names, key=len):
+            lower = name.lower().replace(os.sep, "/")
+            self.by_lower_path.setdefault(lower, name)
+            self.by_lower_base.setdefault(lower.rsplit("/", 1)[-1], name)
+
+    def resolve(self, target: str):
+        if target.endswith(".md"):
+            target = target[:-3]
+        if target in self.exact:
+            return target
+        lower = target.lower().replace("\\", "/")
+        return self.by_lower_path.get(lower) or self.by_lower_base.get(lower)
+
+
+def _csr(n: int, sources: np.ndarray, targets: np.ndarray):
+    """Sort an edge list into (offsets, neighbours) compressed sparse rows."""
+    order = np.lexsort((targets, sources))
+    counts = np.bincount(sources, minlength=n)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, targets[order].astype(np.int32)
+
+
+class LinkGraph:
+    """
+    In-memory link graph with integer note ids and CSR adjacency.
+
+    Build or refresh it with `update`, persist it with `save`, and open the persisted
+    copy with `LinkGraph.load`.
+    """
+
+    def __init__(self, names: list[str] = (), fwd_offsets=None, fwd_targets=None,
+                 back_offsets=None, back_sources=None, state: dict = None):
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        empty = np.zeros(len(self.names) + 1, dtype=np.int64)
+        self.fwd_offsets = empty if fwd_offsets is None else fwd_offsets
+        self.fwd_targets = np.zeros(0, dtype=np.int32) if fwd_targets is None else fwd_targets
+        self.back_offsets = empty if back_offsets is None else back_offsets
+        self.back_sources = np.zeros(0, dtype=np.int32) if back_sources is None else back_sources
+        self._state = state
+        self._resolver = None
+
+    # ---------- building ---------- #
+
+    @property
+    def state(self) -> dict:
+        """Per-note parse results and stat fields; read from disk on first use."""
+        if self._state is None:
+            try:
+                with open(GRAPH_STATE_PATH, "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._state = {}
+        return self._state
+
+    def update(self, incremental: bool = True, notes: list[str] = None) -> dict:
+        """
+        Re-parse new and changed notes and rebuild the adjacency arrays.
+
+        Args:
+            incremental (bool): Reuse parse results for notes whose mtime and size are
+                unchanged. Defaults to True.
+            notes (list[str]): With `incremental`, only check these notes instead of
+                listing the vault; any of them that no longer exist are removed.
+
+        Returns:
+            dict: Lists of note names under "added", "updated" and "removed".
+        """
+        old_state = self.state if incremental else {}
+        report = {"added": [], "updated": [], "removed": []}
+        if incremental and notes is not None:
+            from tools.vault_scan import NoteEntry
+            checked = set(notes)
+            state = {name: parsed for name, parsed in old_state.items() if name not in checked}
+            entries = []
+            for note in notes:
+                path = os.path.join(md_files.VAULT_PATH, note + '.md')
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append(NoteEntry(note, path, stat.st_size, stat.st_mtime))
+        else:
+            state = {}
+            entries = md_files.get_note_entries(refresh_stats=True)
+        for entry in entries:
+            old = old_state.get(entry.name)
+            if old and old["mtime"] == entry.mtime and old["size"] == entry.size:
+                state[entry.name] = old
+                continue
+            try:
+                with open(entry.path, "r", encoding="utf-8") as file:
+                    parsed = parse_note_links(file.read())
+            except FileNotFoundError:
+                continue
+            state[entry.name] = dict(parsed, mtime=entry.mtime, size=entry.size)
+            report["updated" if old else "added"].append(entry.name)
+        report["removed"] = [name for name in old_state if name not in state]
+        self._set_state(state)
+        return report
+
+    def _set_state(self, state: dict) -> None:
+        self._state = state
+        self.names = sorted(state)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self._resolver = _Resolver(self.names)
+
+        sources, targets = [], []
+        for source, parsed in state.items():
+            source_id = self.ids[source]
+            for target, _ in parsed["links"]:
+                resolved = self._resolver.resolve(target) if target else None
+                if resolved is not None and resolved != source:
+                    sources.append(source_id)
+                    targets.append(self.ids[resolved])
+        # A note linking to the same target twice is one edge
+        edges = np.unique(np.array([sources, targets], dtype=np.int64).reshape(2, -1), axis=1)
+        n = len(self.names)
+        self.fwd_offsets, self.fwd_targets = _csr(n, edges[0], edges[1])
+        self.back_offsets, self.back_sources = _csr(n, edges[1], edges[0])
+
+    def save(self) -> None:
+        """Write the adjacency arrays and the per-note parse results to `data/index`."""
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        tmp_path = GRAPH_PATH + ".tmp.npz"
+        np.savez(tmp_path, names=np.array(self.names, dtype=str),
+                 fwd_offsets=self.fwd_offsets, fwd_targets=self.fwd_targets,
+                 back_offsets=self.back_offsets, back_sources=self.back_sources)
+        os.replace(tmp_path, GRAPH_PATH)
+        with open(GRAPH_STATE_PATH + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(GRAPH_STATE_PATH + ".tmp", GRAPH_STATE_PATH)
+
+    @classmethod
+    def load(cls) -> "LinkGraph":
+        """Open the persisted graph; the per-note parse results are only read if needed."""
+        with np.load(GRAPH_PATH, allow_pickle=False) as data:
+            return cls(data["names"].tolist(), data["fwd_offsets"], data["fwd_targets"],
+                       data["back_offsets"], data["back_sources"])
+
+    # ---------- queries ---------- #
+
+    def _id(self, note: str) -> int:
+        if note in self.ids:
+            return self.ids[note]
+        if self._resolver is None:
+            self._resolver = _Resolver(self.names)
+        resolved = self._resolver.resolve(note)
+        if resolved is None:
+            raise KeyError(f"Note '{note}' is not in the link graph.")
+        return self.ids[resolved]
+
+    def links(self, note: str) -> list[str]:
+        """Notes that `note` links to."""
+        i = self._id(note)
+        return [self.names[j] for j in self.fwd_targets[self.fwd_offsets[i]:self.fwd_offsets[i + 1]]]
+
+    def backlinks(self, note: str) -> list[str]:
+        """Notes that link to `note`."""
+        i = self._id(note)
+        return [self.names[j] for j in self.back_sources[self.back_offsets[i]:self.back_offsets[i + 1]]]
+
+    def neighbors(self, note: str, depth: int = 1, direction: str = "both") -> dict[str, int]:
+        """
+        Breadth-first neighbourhood of `note`.
+
+        Args:
+            note (str): The starting note.
+            depth (int): Maximum number of link hops. Defaults to 1.
+            direction (str): "out" follows links, "in" follows backlinks, "both" follows
+                either. Defaults to "both".
+
+        Returns:
+            dict[str, int]: Each reachable note (excluding `note`) and its hop distance.
+        """
+        if direction not in ("out", "in", "both"):
+            raise ValueError("direction must be 'out', 'in' or 'both'")
+        adjacency = []
+        if direction in ("out", "both"):
+            adjacency.append((self.fwd_offsets, self.fwd_targets))
+        if direction in ("in", "both"):
+            adjacency.append((self.back_offsets, self.back_sources))
+
+        start = self._id(note)
+        distance = {start: 0}
+        frontier = np.array([start], dtype=np.int64)
+        for hop in range(1, depth + 1):
+            reached = [neighbours[offsets[i]:offsets[i + 1]] for offsets, neighbours in adjacency for i in frontier]
+            if not reached:
+                break
+            candidates = np.unique(np.concatenate(reached))
+            frontier = np.array([i for i in candidates.tolist() if i not in distance], dtype=np.int64)
+            if not len(frontier):
+                break
+            for i in frontier.tolist():
+                distance[i] = hop
+        del distance[start]
+        return {self.names[i]: hop for i, hop in distance.items()}
+
+    def orphans(self) -> list[str]:
+        """Notes with no resolved links in either direction."""
+        no_out = np.diff(self.fwd_offsets) == 0
+        no_in = np.diff(self.back_offsets) == 0
+        return [self.names[i] for i in np.flatnonzero(no_out & no_in)]
+
+    def unresolved(self, note: str = None) -> dict[str, list[str]]:
+        """Link targets that match no note, per source note (or just for `note`)."""
+        if self._resolver is None:
+            self._resolver = _Resolver(self.names)
+        sources = [self.names[self._id(note)]] if note else self.names
+        result = {}
+        for source in sources:
+            missing = sorted({target for target, _ in self.state.get(source, {}).get("links", [])
+                              if target and self._resolver.resolve(target) is None})
+            if missing:
+                result[source] = missing
+        return result
+
+    def anchors(self, note: str) -> dict[str, list[str]]:
+        """Headings and block ids defined in `note`, i.e. the valid `#` and `#^` link anchors."""
+        parsed = self.state.get(self.names[self._id(note)], {})
+        return {"headings": parsed.get("headings", []), "blocks": parsed.get("blocks", [])}
+
+
+_graph = None
+_graph_signature = None
+_graph_lock = threading.Lock()
+
+
+def update_link_graph(incremental: bool = True, verbose: bool = False, notes: list[str] = None) -> dict:
+    """
+    Bring the persisted link graph up to date with the vault and save it.
+
+    Args:
+        incremental (bool): Only re-parse notes whose mtime or size changed. Defaults to True.
+        verbose (bool): If True, print a summary. Defaults to False.
+        notes (list[str]): With `incremental`, only check these notes. Ignored when
+            no graph has been saved yet, so the first save always covers the vault.
+            Defaults to None.
+
+    Returns:
+        dict: Lists of note names under "added", "updated" and "removed".
+    """
+    global _graph, _graph_signature
+    with _graph_lock:
+        graph = LinkGraph()
+        if incremental and os.path.exists(GRAPH_PATH):
+            graph = LinkGraph.load()
+        else:
+            notes = None  # nothing saved to carry the other notes over from: build it all
+        report = graph.update(incremental=incremental, notes=notes)
+        graph.save()
+        _graph, _graph_signature = graph, None
+    if verbose:
+        print(f"Link graph: {len(report['added'])} added, {len(report['updated'])} updated, "
+              f"{len(report['removed'])} removed, {len(graph.names)} notes, {len(graph.fwd_targets)} links")
+    return report
+
+
+def get_link_graph() -> LinkGraph:
+    """Return the process-wide link graph, building it on first use and reloading it when the file changes."""
+    global _graph, _graph_signature
+    if not os.path.exists(GRAPH_PATH):
+        update_link_graph()
+    stat = os.stat(GRAPH_PATH)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if _graph is None or (_graph_signature is not None and _graph_signature != signature):
+        with _graph_lock:
+            _graph = LinkGraph.load()
+    _graph_signature = signature
+    return _graph
+
+
+##Tools for ReAct Agent
+
+
+def get_backlinks(note: str) -> list[str]:
+    """
+    Get the notes that link to a note.
+
+    Args:
+        note (str): The note name (without the '.md' extension).
+
+    Returns:
+        list[str]: Names of the notes containing a [[link]] to `note`.
+    """
+    return get_link_graph().backlinks(note)
+
+
+def get_outgoing_links(note: str) -> list[str]:
+    """
+    Get the notes that a note links to.
+
+    Args:
+        note (str): The note name (without the '.md' extension).
+
+    Returns:
+        list[str]: Names of the existing notes that `note` links to with [[links]].
+    """
+    return get_link_graph().links(note)
+
+
+def get_neighbors(note: str, depth: int = 1) -> dict[str, int]:
+    """
+    Get the notes connected to a note by links in either direction, up to `depth` hops away.
+
+    Useful for multi-hop questions: start from a relevant note and explore related notes
+    without running another semantic search.
+
+    Args:
+        note (str): The note name (without the '.md' extension).
+        depth (int): The maximum number of link hops. Defaults to 1.
+
+    Returns:
+        dict[str, int]: Connected note names mapped to their distance in hops.
+    """
+    return get_link_graph().neighbors(note, depth)
+
+
+def orphans() -> list[str]:
+    """
+    Get the notes that have no links to or from any other note.
+
+    Returns:
+        list[str]: Names of the unconnected notes.
+    """
+    return get_link_graph().orphans()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or update the wikilink graph index.")
+    parser.add_argument("--full", action="store_true", help="Re-parse every note instead of only changed ones.")
+    args = parser.parse_args()
+    update_link_graph(incremental=not args.full, verbose=True)
@@ -0,0 +1,352 @@
+"""Persistent, size-bounded cache of LLM responses shared by every pipeline.
+
+Responses are stored in one SQLite file (`data/cache/llm_responses.sqlite`), keyed by
+a hash of the model, the normalised messages (line endings and trailing whitespace
+don't matter) and the sampling parameters; credentials, endpoints, timeouts and retry
+settings are left out of the key. Entries expire after a TTL, and once the cache grows
+past its size limit the least recently used entries are evicted.
+
+Two wrappers use it:
+
+- `dspy_modules.cached_lm.CachedLM`, a drop-in `dspy.LM`;
+- `cache_openai_client`, which wraps an OpenAI client (e.g. the one `ollama.start_ollama`
+  returns) so `chat.completions.create` is cached, streamed or not.
+
+Both also record each call's token usage in `tools.token_usage`'s ledger.
+
+Set `LLM_CACHE=off` to bypass the cache, or use `with bypass_cache():` for one block.
+`LLM_CACHE_MAX_MB` (default 512) and `LLM_CACHE_TTL_DAYS` (default 30, 0 = never)
+override the limits.
+"""
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = "data/cache"
+CACHE_PATH = os.path.join(CACHE_DIR, "llm_responses.sqlite")
+
+# Request options that don't change what the model answers
+NON_SEMANTIC_PARAMS = {
+    "api_key", "api_base", "base_url", "api_version", "organization", "timeout", "request_timeout",
+    "num_retries", "max_retries", "cache", "cache_in_memory", "user", "metadata", "extra_headers",
+}
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextlib.contextmanager
+def bypass_cache():
+    """Within this block every LLM call goes to the model and nothing is cached."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def _normalize_text(text: str) -> str:
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def _normalize_message(message) -> dict:
+    message = dict(message)
+    content = message.get("content")
+    if isinstance(content, str):
+        message["content"] = _normalize_text(content)
+    elif isinstance(content, list):
+        message["content"] = [{**part, "text": _normalize_text(part["text"])}
+                              if isinstance(part, dict) and isinstance(part.get("text"), str) else part
+                              for part in content]
+    return message
+
+
+def cache_key(model: str, messages: list, params: dict = None, endpoint: str = "chat") -> str:
+    """
+    Hash a request into a cache key.
+
+    Args:
+        model (str): Model name as sent to the API.
+        messages (list[dict]): Chat messages; content is compared after normalising
+            line endings and trailing whitespace.
+        params (dict): Request options. Sampling parameters are part of the key;
+            `NON_SEMANTIC_PARAMS` are ignored.
+        endpoint (str): Distinguishes response shapes, e.g. "chat" and "chat.stream".
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    params = {k: v for k, v in (params or {}).items() if k not in NON_SEMANTIC_PARAMS and v is not None}
+    payload = {"endpoint": endpoint, "model": model,
+               "messages": [_normalize_message(m) for m in messages], "params": params}
+    blob = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite store of JSON-serialisable responses with LRU eviction and expiry.
+
+    Args:
+        path (str): Database file. Defaults to `data/cache/llm_responses.sqlite`.
+        max_bytes (int): Total size of stored responses before the least recently
+            used are evicted. Defaults to `LLM_CACHE_MAX_MB` (512 MB).
+        ttl (float): Seconds an entry stays valid; None or 0 means forever.
+            Defaults to `LLM_CACHE_TTL_DAYS` (30 days).
+        bypass (bool): Never read or write. Defaults to `LLM_CACHE=off`.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = None, ttl: float = None, bypass: bool = None):
+        self.path = path
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("LLM_CACHE_MAX_MB", 512)) * 2**20)
+        if ttl is None:
+            ttl = float(os.getenv("LLM_CACHE_TTL_DAYS", 30)) * 86400
+        self.ttl = ttl or None
+        if bypass is None:
+            bypass = os.getenv("LLM_CACHE", "on").lower() in ("0", "off", "false", "no")
+        self.bypass = bypass
+        self.hits = self.misses = self.stores = self.evictions = self.expired = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @property
+    def active(self) -> bool:
+        """Whether calls right now may use the cache."""
+        return not self.bypass and not _bypass.get()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, value TEXT, "
+                         "size INTEGER, created REAL, last_access REAL, expires REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str):
+        """Return the stored response for `key`, or None on a miss or when bypassed."""
+        if not self.active:
+            return None
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] < now:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count(db, "expired", 1)
+                row = None
+            if row is None:
+                self._count(db, "misses", 1)
+                db.commit()
+                return None
+            db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count(db, "hits", 1)
+            db.commit()
+        return json.loads(row[0])
+
+    def _count(self, db: sqlite3.Connection, name: str, n: int) -> None:
+        """Bump a counter for this process and in the all-time totals on disk."""
+        if n:
+            setattr(self, name, getattr(self, name) + n)
+            db.execute("INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                       (name, n, n))
+
+    def put(self, key: str, model: str, value, ttl: float = None) -> None:
+        """Store a JSON-serialisable response, then evict down to `max_bytes` if needed."""
+        if not self.active:
+            return
+        blob = json.dumps(value, default=str, ensure_ascii=False)
+        now = time.time()
+        ttl = ttl if ttl is not None else self.ttl
+        with self._lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (key, model, blob, len(blob), now, now, now + ttl if ttl else None))
+            self._count(db, "stores", 1)
+            self._evict(db, now)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        self._count(db, "expired",
+                    db.execute("DELETE FROM responses WHERE expires IS NOT NULL AND expires < ?", (now,)).rowcount)
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the limit so the next few stores don't evict again
+        target = total - int(self.max_bytes * 0.9)
+        freed, doomed = 0, []
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self._count(db, "evictions", len(doomed))
+
+    def clear(self) -> None:
+        """Delete every entry."""
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM responses")
+            db.commit()
+            db.execute("VACUUM")
+
+    def stats(self) -> dict:
+        """
+        Counters for this process, all-time totals and the current size.
+
+        Returns:
+            dict: "hits", "misses", "hit_rate", "stores", "evictions", "expired" for this
+                process; "total" with the same counters since the cache was created;
+                "entries", "bytes", "max_bytes" and "bypass".
+        """
+        with self._lock:
+            db = self._db()
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            totals = dict(db.execute("SELECT name, value FROM counters"))
+        lookups = self.hits + self.misses
+        total_lookups = totals.get("hits", 0) + totals.get("misses", 0)
+        names = ("hits", "misses", "stores", "evictions", "expired")
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores, "evictions": self.evictions, "expired": self.expired,
+                "total": {**{name: totals.get(name, 0) for name in names},
+                          "hit_rate": totals.get("hits", 0) / total_lookups if total_lookups else 0.0},
+                "entries": entries, "bytes": size, "max_bytes": self.max_bytes, "bypass": not self.active}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(path: str = CACHE_PATH) -> ResponseCache:
+    """Return the process-wide ResponseCache for `path`, creating it on first use."""
+    cache = _caches.get(path)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(path, ResponseCache(path))
+    return cache
+
+
+#### OpenAI client wrapper
+
+class _ReplayStream:
+    """Iterates stored chunks like an `openai.Stream`, or records a live one as it is consumed."""
+
+    def __init__(self, chunks, on_complete=None):
+        self._chunks = chunks
+        self._on_complete = on_complete
+        self._live = on_complete is not None
+
+    def __iter__(self):
+        recorded = []
+        for chunk in self._chunks:
+            if self._live:
+                recorded.append(chunk.model_dump())
+            yield chunk
+        if self._live:
+            self._on_complete(recorded)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        close = getattr(self._chunks, "close", None)
+        if close:
+            close()
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache_path: str):
+        self._completions = completions
+        self._cache_path = cache_path
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+    def create(self, *, model: str, messages: list, **kwargs):
+        """`chat.completions.create`, answered from the response cache when possible."""
+        from openai.types.chat import ChatCompletion, ChatCompletionChunk
+        from tools.token_usage import record_response_usage, record_stream_usage
+
+        started = time.perf_counter()
+        cache = get_response_cache(self._cache_path)
+        stream = bool(kwargs.get("stream"))
+        key = stored = None
+        if cache.active:
+            params = {k: v for k, v in kwargs.items() if k != "stream"}
+            key = cache_key(model, messages, params, endpoint="chat.stream" if stream else "chat")
+            stored = cache.get(key)
+        if stored is not None:
+            if stream:
+                record_stream_usage(model, stored, time.perf_counter() - started, messages, cached=True)
+                return _ReplayStream([ChatCompletionChunk.model_validate(chunk) for chunk in stored])
+            record_response_usage(model, stored, time.perf_counter() - started, cached=True, source="openai",
+                                  messages=messages)
+            return ChatCompletion.model_validate(stored)
+        response = self._completions.create(model=model, messages=messages, **kwargs)
+        if stream:
+            def on_complete(chunks):
+                if key is not None:
+                    cache.put(key, model, chunks)
+                record_stream_usage(model, chunks, time.perf_counter() - started, messages)
+            return _ReplayStream(response, on_complete=on_complete)
+        if key is not None:
+            cache.put(key, model, response.model_dump())
+        record_response_usage(model, response, time.perf_counter() - started, source="openai", messages=messages)
+        return response
+
+
+class _CachedChat:
+    def __init__(self, chat, cache_path: str):
+        self._chat = chat
+        self.completions = _CachedCompletions(chat.completions, cache_path)
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CachedOpenAIClient:
+    """
+    Wraps an OpenAI client so `chat.completions.create` goes through the response cache.
+
+    Every other attribute is passed through to the wrapped client, which stays
+    available as `.client`.
+    """
+
+    def __init__(self, client, cache_path: str = CACHE_PATH):
+        self.client = client
+        self.chat = _CachedChat(client.chat, cache_path)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def cache_openai_client(client, cache_path: str = CACHE_PATH) -> CachedOpenAIClient:
+    """Return `client` wrapped so chat completions are cached on disk."""
+    return CachedOpenAIClient(client, cache_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache.")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached response.")
+    parser.add_argument("--path", default=CACHE_PATH, help="Cache database (default: %(default)s).")
+    args = parser.parse_args()
+    response_cache = get_response_cache(args.path)
+    if args.clear:
+        response_cache.clear()
+    for name, value in response_cache.stats().items():
+        print(f"{name}: {value}")
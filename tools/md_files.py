@@ -1,5 +1,6 @@
 """All the read/write operations for markdown files in the vault."""
 import os
+import re
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -7,20 +8,47 @@ load_dotenv()
 raw_path = os.getenv('VAULT_PATH', '.')
 VAULT_PATH = os.path.expanduser(raw_path)
 TOOL_VERSION = os.getenv('TOOL_VERSION')
+# Folders that are never treated as part of the note collection
+EXCLUDED_DIRS = {".obsidian", "Excalidraw"}
+# Windows reserved basenames (case-insensitive)
+WINDOWS_RESERVED_NAMES = {
+    'CON','PRN','AUX','NUL',
+    *(f'COM{i}' for i in range(1,10)),
+    *(f'LPT{i}' for i in range(1,10))
+}
+
+# Markdown syntax shared by every module that parses notes. All are MULTILINE so they
+# work on a single line (`match`) as well as on a whole note (`finditer`)
+# [[target#anchor|alias]] and ![[embeds]]; group 1 is everything between the brackets
+WIKILINK_RE = re.compile(r"!?\[\[([^\]]+?)\]\]")
+# The same link split into (embed "!", target, "#anchor", "|alias")
+WIKILINK_PARTS_RE = re.compile(r"(!?)\[\[([^\]|#]*)((?:#[^\]|]*)?)((?:\|[^\]]*)?)\]\]")
+# ATX heading; group 1 is the hashes, group 2 the text without closing hashes
+HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.*?)[ \t]*#*[ \t]*$", re.MULTILINE)
+# Opening or closing line of a fenced code block; group 1 is the marker
+FENCE_RE = re.compile(r"^[ \t]*(```|~~~)", re.MULTILINE)
 
 def get_notes_list() -> list[str]:
     """Get a list of all markdown file paths in the vault, relative to the vault root."""
-    notes_list = []
-    for root, _, files in os.walk(VAULT_PATH):
-        # Skip the .obsidian folder and its subfolders
-        if ".obsidian" in root.split(os.sep) or 'Excalidraw' in root.split(os.sep):
-            continue
-        for file in files:
-            if file.endswith('.md'):
-                # Construct the relative path and remove the '.md' extension
-                relative_path = os.path.relpath(os.path.join(root, file), VAULT_PATH)
-                notes_list.append(relative_path[:-3])  # Remove the '.md' extension
-    return notes_list
+    # Remove the '.md' extension; the .obsidian and Excalidraw folders are skipped
+    return [entry.name for entry in get_note_entries()]
+
+def get_note_entries(refresh_stats: bool = False) -> list:
+    """
+    Get every note in the vault with its path, size and mtime.
+
+    Listings are cached per directory by `tools.vault_scan.VaultScanner`, so repeat
+    calls only re-read folders whose contents changed.
+
+    Args:
+        refresh_stats (bool): Re-stat notes in unchanged folders so size and mtime
+            reflect in-place edits. Defaults to False.
+
+    Returns:
+        list[NoteEntry]: Entries with `name` (as in `get_notes_list`), `path`, `size` and `mtime`.
+    """
+    from tools.vault_scan import get_scanner
+    return get_scanner(VAULT_PATH, EXCLUDED_DIRS).scan(refresh_stats=refresh_stats)
 
 def get_note_content(note_name: str) -> str:
     """
@@ -48,9 +76,49 @@ def get_note_content(note_name: str) -> str:
         return file.read()
 
 
-def create_note(note_name: str, content: str = "", extra_tags: list[str] = None, extra_properties: dict = None) -> None:
-    """Create a new markdown note with the given name and content, allowing extra tags and properties."""
-    # Generate YAML frontmatter
+def assert_note_name_is_valid(filename: str) -> None:
+    """ 
+    Check if a filename is compatible with Obsidian vault requirements.
+    
+    Returns True if:
+      - It does not include OS-level forbidden characters
+      - It does not include Obsidian-reserved link/anchor characters
+      - It is not a Windows reserved name (e.g., CON, PRN, AUX, NUL, COM1–COM9, LPT1–LPT9)
+      - It does not end with a space or dot on Windows, nor does the name before ".md"
+
+    Raises:
+        ValueError: If any of these checks fails.
+    """
+    # Forbidden by Windows: < > : " / \\ | ? * and control characters 0–31
+    os_forbidden = r'[<>:"/\\|?*\x00-\x1F]'
+    # macOS also forbids ':', but it's already in os_forbidden
+    # Obsidian link/anchor conflicts: [ ] # ^
+    obsidian_forbidden = r'[\[\]#^]'
+    # Check OS-level forbidden
+    if re.search(os_forbidden, filename):
+        raise ValueError(f"Filename '{filename}' contains OS-level forbidden characters.")
+    # Check Obsidian-specific forbidden
+    if re.search(obsidian_forbidden, filename):
+        raise ValueError(f"Filename '{filename}' contains Obsidian-specific forbidden characters.")
+    # Check reserved Windows names
+    name_root = filename.split('.')[0].upper()
+    if name_root in WINDOWS_RESERVED_NAMES:
+        raise ValueError(f"Filename '{filename}' is a Windows reserved name.")
+    # On Windows, filenames cannot end with space or dot
+    stem = filename[:-len('.md')] if filename.endswith('.md') else filename
+    if filename.endswith((' ', '.')) or stem.endswith((' ', '.')):
+        raise ValueError(f"Filename '{filename}' cannot end with a space or dot.")
+
+
+def format_frontmatter(properties: dict) -> str:
+    """Render properties as the `---` frontmatter block `create_note` writes; lists become YAML block lists."""
+    return "---\n" + "\n".join(
+        f"{key}: {value if not isinstance(value, list) else '\n  - '.join([''] + value)}"
+        for key, value in properties.items()
+    ) + "\n---\n"
+
+def _note_frontmatter(extra_tags: list[str] = None, extra_properties: dict = None) -> str:
+    """The frontmatter block for a new note, as written by `create_note`."""
     yaml_frontmatter = {
         "created": datetime.now().strftime('%Y-%m-%d'),
         "tags": ["llm-generated",] + (extra_tags if extra_tags else []),
@@ -60,23 +128,335 @@ def create_note(note_name: str, content: str = "", extra_tags: list[str] = None,
     # Add extra properties if provided
     if extra_properties:
         yaml_frontmatter.update(extra_properties)
+    return format_frontmatter(yaml_frontmatter)
 
-    # Convert frontmatter to YAML string
-    yaml_frontmatter_str = "---\n" + "\n".join(
-        f"{key}: {value if not isinstance(value, list) else '\n  - '.join([''] + value)}"
-        for key, value in yaml_frontmatter.items()
-    ) + "\n---\n"
-
+def create_note(note_name: str, content: str = "", extra_tags: list[str] = None, extra_properties: dict = None) -> None:
+    """Create a new markdown note with the given name and content, allowing extra tags and properties."""
     # Prepend the YAML frontmatter to the content
-    full_content = f"{yaml_frontmatter_str}\n{content}"
+    full_content = f"{_note_frontmatter(extra_tags, extra_properties)}\n{content}"
 
     note_path = os.path.join(VAULT_PATH, note_name + '.md')
     with open(note_path, 'w', encoding='utf-8') as file:
         file.write(full_content)
 
 
+class NoteStream:
+    """
+    Writes a new note piece by piece, then moves it into the vault in one step.
+
+    Content goes to a hidden temporary file next to the final note (not a `.md` file,
+    so indexers and Obsidian ignore it) and is flushed on every `write`, so it can be
+    followed while it grows. On a clean exit the file is fsynced and atomically renamed
+    to `<note_name>.md`; if an exception escapes the `with` block it is deleted and no
+    note is created. The frontmatter matches `create_note`.
+
+    Args:
+        note_name (str): The name of the note (without the '.md' extension).
+        extra_tags (list[str]): Tags added after "llm-generated".
+        extra_properties (dict): Extra frontmatter properties.
+    """
+
+    def __init__(self, note_name: str, extra_tags: list[str] = None, extra_properties: dict = None):
+        self.path = os.path.join(VAULT_PATH, note_name + '.md')
+        directory, filename = os.path.split(self.path)
+        self.tmp_path = os.path.join(directory, f".{filename}.partial")
+        self._frontmatter = _note_frontmatter(extra_tags, extra_properties)
+        self._file = None
+
+    def __enter__(self) -> "NoteStream":
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+        self.write(f"{self._frontmatter}\n")
+        return self
+
+    def write(self, text: str) -> None:
+        self._file.write(text)
+        self._file.flush()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self._file.close()
+            os.remove(self.tmp_path)
+            return
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+
+
+FAISS_DIR = "data/faiss"
+INDEX_PATH = os.path.join(FAISS_DIR, "notes_index.faiss")
+META_PATH = os.path.join(FAISS_DIR, "notes_meta.sqlite")
+MANIFEST_PATH = os.path.join(FAISS_DIR, "notes_manifest.json")
+PASSAGES_INDEX_PATH = os.path.join(FAISS_DIR, "passages_index.faiss")
+PASSAGES_META_PATH = os.path.join(FAISS_DIR, "passages_meta.sqlite")
+PASSAGES_MANIFEST_PATH = os.path.join(FAISS_DIR, "passages_manifest.json")
+BM25_PATH = os.path.join(FAISS_DIR, "notes_bm25.npz")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def _load_manifest(manifest_path: str = MANIFEST_PATH) -> dict:
+    """Load a reindex manifest, or an empty one if it is missing or unreadable."""
+    import json
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"model": EMBEDDING_MODEL, "next_id": 0, "notes": {}}
+    manifest.setdefault("next_id", 0)
+    manifest.setdefault("notes", {})
+    if any("ids" not in entry for entry in manifest["notes"].values()):
+        # Older single-id manifests can't map notes to their chunk ids; rebuild
+        return {"model": EMBEDDING_MODEL, "next_id": 0, "notes": {}}
+    return manifest
+
+
+def _save_manifest(manifest: dict, manifest_path: str = MANIFEST_PATH) -> None:
+    """Atomically write a reindex manifest next to its FAISS index."""
+    import json
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def _read_notes(entries: list, threads: int = 8, prefetch: int = 64, newline: str = None):
+    """
+    Yield (entry, content) for each note entry, in order, reading ahead on a thread pool.
+
+    At most `prefetch` files are read but not yet consumed at any time. Notes that were
+    deleted after being listed yield None as their content. `newline` is passed to
+    `open`; "" keeps CRLF line endings, so offsets in the content match the file.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    def read(entry):
+        try:
+            with open(entry.path, 'r', encoding='utf-8', newline=newline) as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        pending = deque()
+        for entry in entries:
+            pending.append((entry, pool.submit(read, entry)))
+            if len(pending) >= prefetch:
+                entry, future = pending.popleft()
+                yield entry, future.result()
+        while pending:
+            entry, future = pending.popleft()
+            yield entry, future.result()
+
+
+class _BatchEncoder:
+    """
+    Embeds batches of texts in the background while the caller prepares the next ones.
+
+    With `workers` <= 1 the shared in-process model runs on one background thread;
+    otherwise batches are spread over that many spawned processes, each loading its
+    own copy of the model. `submit` blocks once `max_in_flight` batches are pending and
+    returns whichever results are finished, in submission order.
+    """
+
+    def __init__(self, workers: int = 1, max_in_flight: int = None):
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        from tools import search_engine
+
+        self.dim = None
+        self._pending = deque()
+        if workers > 1:
+            import multiprocessing
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=search_engine.init_encoder_process, initargs=(EMBEDDING_MODEL, workers))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        self._encode = search_engine.encode_batch
+        self._max_in_flight = max_in_flight or max(2, 2 * workers)
+
+    def _collect(self, block: bool):
+        done = []
+        while self._pending and (self._pending[0][1].done() or (block and len(self._pending) >= self._max_in_flight)):
+            ids, future = self._pending.popleft()
+            embeddings = future.result()
+            self.dim = embeddings.shape[1]
+            done.append((ids, embeddings))
+        return done
+
+    def submit(self, ids: list[int], texts: list[str]) -> list:
+        """Queue a batch; return the (ids, embeddings) pairs that have finished meanwhile."""
+        done = self._collect(block=True)
+        self._pending.append((list(ids), self._executor.submit(self._encode, list(texts))))
+        return done + self._collect(block=False)
+
+    def drain(self) -> list:
+        """Wait for every queued batch and shut the workers down."""
+        done = []
+        while self._pending:
+            ids, future = self._pending.popleft()
+            embeddings = future.result()
+            self.dim = embeddings.shape[1]
+            done.append((ids, embeddings))
+        self._executor.shutdown()
+        return done
+
+
+def _update_embedding_index(index_path: str, meta_path: str, manifest_path: str,
+                            items_for_note, incremental: bool = False, verbose: bool = False,
+                            index_type: str = None, notes: list[str] = None, batch_size: int = 64,
+                            read_threads: int = 8, workers: int = 1, on_content=None,
+                            count_items=None) -> dict:
+    """
+    Shared reindex pipeline behind `reindex_notes` and `reindex_passages`.
+
+    `items_for_note(note, content)` returns the (text to embed, metadata) pairs for one
+    note. Each pair gets its own id in an ID-mapped FAISS index; the manifest records
+    which ids belong to which note so a changed or deleted note can be swapped out alone.
+    If `notes` is given on an incremental run, only those notes are checked (a note that
+    no longer exists is removed) and the vault is not listed at all.
+
+    The work is streamed: changed notes are read ahead on `read_threads` threads, their
+    texts are cut into `batch_size` batches for the encoder (in this process, or across
+    `workers` processes), and each embedded batch goes straight into the index. At most
+    a few batches are in flight at once, so memory stays flat as the vault grows.
+
+    `on_content(note, content)`, if given, is called for every note whose content was
+    (re)embedded, so other indexes can be updated from the same read.
+
+    Notes are read without newline translation, so item metadata such as byte offsets
+    refers to the file as stored, CRLF line endings included. A new index is sized for
+    one vector per note unless `count_items(note, content)` says how many items a note
+    yields; then, for index types sized from the vector count, the notes are read once
+    more up front to count them.
+    """
+    import faiss
+    import hashlib
+    from tools import ann_index
+    from tools.index_store import MetaStore, write_index_atomic
+
+    index_type = index_type or ann_index.DEFAULT_INDEX_TYPE
+    old_manifest = _load_manifest(manifest_path)
+    index = None
+    built_type = old_manifest.get("index_type", "flat")
+    # A flat index stands in for an IVF one until there are enough vectors to train on
+    if incremental and old_manifest["notes"] and old_manifest.get("model") == EMBEDDING_MODEL \
+            and (built_type == index_type or (built_type == "flat" and index_type.startswith("ivf"))) \
+            and os.path.exists(index_path) and os.path.exists(meta_path):
+        index = faiss.read_index(index_path)
+        if not ann_index.supports_ids(index):
+            # Indexes written before the manifest existed are not ID-mapped
+            index = None
+    rebuild = index is None
+    store = MetaStore(meta_path)
+    if rebuild:
+        # Ids keep increasing across rebuilds: until the new index is swapped in, searches
+        # return the old index's ids, which must not pick up other notes' metadata
+        old_manifest = {"model": EMBEDDING_MODEL, "next_id": max(store.next_id(), old_manifest["next_id"]),
+                        "notes": {}}
+
+    old_entries = old_manifest["notes"]
+    next_id = old_manifest["next_id"]
+    new_entries = {}
+    report = {"added": [], "updated": [], "removed": []}
+
+    if notes is not None and not rebuild:
+        # Targeted update: carry every other note over untouched
+        from tools.vault_scan import NoteEntry
+        notes = set(notes)
+        new_entries = {note: entry for note, entry in old_entries.items() if note not in notes}
+        candidates = []
+        for note in notes:
+            note_path = os.path.join(VAULT_PATH, note + '.md')
+            try:
+                stat = os.stat(note_path)
+            except FileNotFoundError:
+                continue  # deleted; dropped below like any removed note
+            candidates.append(NoteEntry(note, note_path, stat.st_size, stat.st_mtime))
+    else:
+        candidates = get_note_entries(refresh_stats=True)
+
+    to_read = []
+    for candidate in candidates:
+        entry = old_entries.get(candidate.name)
+        if entry and entry["mtime"] == candidate.mtime and entry["size"] == candidate.size:
+            new_entries[candidate.name] = entry
+        else:
+            to_read.append(candidate)
+
+    n_vectors = len(to_read)
+    if index is None and count_items is not None and index_type != "flat":
+        n_vectors = sum(count_items(entry.name, content)
+                        for entry, content in _read_notes(to_read, read_threads, newline="") if content is not None)
+    builder = ann_index.StreamingIndexBuilder(index_type, n_vectors, index)
+    encoder = _BatchEncoder(workers)
+    new_meta = []  # (id, metadata)
+    batch_ids, batch_texts = [], []
+
+    for (note, note_path, size, mtime), content in _read_notes(to_read, read_threads, newline=""):
+        if content is None:
+            continue  # deleted since it was listed; dropped below like any removed note
+        entry = old_entries.get(note)
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if entry and entry["sha256"] == digest:
+            # Touched but not edited: keep the embeddings, refresh the stat fields
+            new_entries[note] = dict(entry, mtime=mtime, size=size)
+            continue
 
-def reindex_notes():
+        if on_content is not None:
+            on_content(note, content)
+        ids = []
+        for text, item_meta in items_for_note(note, content):
+            ids.append(next_id)
+            new_meta.append((next_id, item_meta))
+            batch_ids.append(next_id)
+            batch_texts.append(text)
+            next_id += 1
+            if len(batch_texts) >= batch_size:
+                for done_ids, embeddings in encoder.submit(batch_ids, batch_texts):
+                    builder.add(embeddings, done_ids)
+                batch_ids, batch_texts = [], []
+        new_entries[note] = {"ids": ids, "mtime": mtime, "size": size, "sha256": digest}
+        report["updated" if entry else "added"].append(note)
+
+    if batch_texts:
+        for done_ids, embeddings in encoder.submit(batch_ids, batch_texts):
+            builder.add(embeddings, done_ids)
+    for done_ids, embeddings in encoder.drain():
+        builder.add(embeddings, done_ids)
+    dim = encoder.dim
+    if dim is None and builder.index is None:
+        # Nothing was embedded but an empty index still has to be written
+        from tools.search_engine import get_embedding_model
+        dim = get_embedding_model().get_sentence_embedding_dimension()
+    index = builder.finish(dim=dim)
+
+    report["removed"] = [note for note in old_entries if note not in new_entries]
+    stale_ids = [i for note in report["removed"] + report["updated"] for i in old_entries[note]["ids"]]
+    if stale_ids:
+        index = ann_index.remove_ids(index, stale_ids)
+    index = ann_index.upgrade_index(index, index_type)
+
+    # Update the metadata (id -> item metadata) store, then swap in the new FAISS index.
+    # Ids are never reused and searches skip ids whose metadata is missing, so readers
+    # never see a broken pair, even during a rebuild.
+    store.update(put=new_meta, delete=stale_ids, clear=rebuild, next_id=next_id)
+    store.close()
+    write_index_atomic(index, index_path)
+
+    _save_manifest({"model": EMBEDDING_MODEL, "index_type": ann_index.index_type_of(index), "next_id": next_id,
+                    "notes": new_entries}, manifest_path)
+
+    if verbose:
+        print(f"Reindex {os.path.basename(index_path)}: {len(report['added'])} added, "
+              f"{len(report['updated'])} updated, {len(report['removed'])} removed, "
+              f"{index.ntotal} vectors for {len(new_entries)} notes")
+    return report
+
+
+def reindex_notes(incremental: bool = False, verbose: bool = False, index_type: str = None,
+                  notes: list[str] = None, batch_size: int = 64, workers: int = 1) -> dict:
     """
     Reindex all notes in the vault for semantic search.
 
@@ -85,51 +465,141 @@ def reindex_notes():
     and stores the embeddings in a FAISS index for efficient similarity search. 
     Additionally, it saves the metadata (note names) associated with the embeddings.
 
+    Every note gets a stable integer id, and the index is an ID-mapped FAISS index,
+    so single notes can be replaced or dropped without rebuilding everything. A
+    manifest of each note's path, mtime, size and content hash is kept next to the
+    index. In incremental mode only new or changed notes are read and embedded,
+    and deleted notes are removed from the index. The BM25 keyword index used by
+    `hybrid_search` is updated from the same reads.
+
     Steps:
-    1. Retrieve the list of all notes in the vault using `get_notes_list`.
-    2. Read the content of each note using `get_note_content` and prepend the note name.
-    3. Generate embeddings for the note content using the "all-MiniLM-L6-v2" model.
-    4. Create a FAISS index and add the embeddings to it.
-    5. Save the FAISS index to a file for later use.
-    6. Save the metadata (note names) to a pickle file.
+    1. Retrieve the list of all notes in the vault using `get_note_entries`.
+    2. Compare each note's mtime/size (then content hash) against the manifest.
+    3. Read new and changed notes on a thread pool and embed them in fixed-size batches
+       using the "all-MiniLM-L6-v2" model, adding each batch to the index as it finishes.
+    4. Remove stale ids from the FAISS index.
+    5. Save the FAISS index, the metadata (id -> note name) and the manifest.
+    6. Apply the same changes to the BM25 index.
+
+    Args:
+        incremental (bool): If True, only embed new or changed notes and drop deleted ones.
+            Falls back to a full rebuild when there is no usable index or manifest.
+            Defaults to False.
+        verbose (bool): If True, print a summary of what changed. Defaults to False.
+        index_type (str): FAISS index type, one of "flat", "ivf_flat", "ivf_pq" or "hnsw"
+            (see `tools.ann_index`). Defaults to the NOTES_INDEX_TYPE environment variable,
+            or "flat". Changing it forces a full rebuild. An IVF type is built flat until
+            there are enough vectors to train on, then converted on a later run; the
+            manifest records the type actually built.
+        notes (list[str]): With `incremental`, only check these notes instead of the whole
+            vault; any of them that no longer exist are removed. Defaults to None.
+        batch_size (int): Texts per encoder batch. Defaults to 64.
+        workers (int): Encoder processes; above 1, batches are embedded in parallel by
+            that many processes, each with its own model. The worker processes are
+            spawned, so scripts calling this need an `if __name__ == "__main__":` guard.
+            Defaults to 1.
+
+    Returns:
+        dict: Lists of note names under "added", "updated" and "removed".
 
     Raises:
         FileNotFoundError: If the FAISS index or metadata file cannot be written to the specified path.
 
     Outputs:
         - FAISS index file: "data/faiss/notes_index.faiss"
-        - Metadata file: "data/faiss/notes_meta.pkl"
+        - Metadata store: "data/faiss/notes_meta.sqlite"
+        - Manifest file: "data/faiss/notes_manifest.json"
+        - BM25 index: "data/faiss/notes_bm25.npz"
     """
-    from sentence_transformers import SentenceTransformer
-    import faiss
-    import pickle
-    from tools.md_files import get_notes_list, get_note_content
-
-    # Load the SentenceTransformer model
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    from tools.bm25_index import AnalyzedDocuments, analyze
+
+    # Keep only each changed note's term ids and counts, not its text, until the FAISS side is done
+    analyzed = AnalyzedDocuments()
+    report = _update_embedding_index(
+        INDEX_PATH, META_PATH, MANIFEST_PATH,
+        lambda note, content: [(note + '\n\n' + content, note)],
+        incremental=incremental, verbose=verbose, index_type=index_type, notes=notes,
+        batch_size=batch_size, workers=workers,
+        on_content=lambda note, content: analyzed.add(note, analyze(note + '\n\n' + content)),
+    )
+    _update_bm25_index(analyzed, report["removed"], verbose=verbose)
+    return report
+
+
+def _update_bm25_index(analyzed, removed: list[str], verbose: bool = False) -> None:
+    """
+    Apply a reindex to the BM25 index and save it.
 
-    # Retrieve the list of notes and their content
-    notes_list = get_notes_list()
-    note_content = []
-    for note in notes_list:
-        content = get_note_content(note)
-        content = note + '\n\n' + content
-        note_content.append(content)
+    `analyzed` is the `AnalyzedDocuments` of the notes the reindex (re)embedded.
+    Notes that the manifest lists but the BM25 index lacks (e.g. its file was deleted)
+    are read and added, and notes the manifest no longer lists are dropped, so the two
+    indexes always cover the same notes.
+    """
+    from tools.bm25_index import BM25Index, analyze
+
+    index = BM25Index.load(BM25_PATH) if os.path.exists(BM25_PATH) else BM25Index()
+    current = set(_load_manifest(MANIFEST_PATH)["notes"])
+    missing = current - set(index.names) - set(analyzed.names)
+    if missing:
+        from tools.vault_scan import NoteEntry
+        entries = [NoteEntry(note, os.path.join(VAULT_PATH, note + '.md'), 0, 0.0) for note in sorted(missing)]
+        for entry, content in _read_notes(entries):
+            if content is not None:
+                analyzed.add(entry.name, analyze(entry.name + '\n\n' + content))
+    index.update(documents=analyzed, remove=removed, keep=current)
+    index.save(BM25_PATH)
+    if verbose:
+        print(f"Reindex {os.path.basename(BM25_PATH)}: {len(analyzed)} notes tokenized, {len(index)} notes")
+
+
+def reindex_passages(incremental: bool = False, verbose: bool = False,
+                     max_chars: int = 1000, overlap: int = 200, index_type: str = None,
+                     notes: list[str] = None, batch_size: int = 64, workers: int = 1) -> dict:
+    """
+    Build the chunk-level index used by `search_passages`.
 
-    # Generate embeddings for the notes
-    embeddings = model.encode(note_content, convert_to_numpy=True)
+    Notes are split on markdown headings with `tools.chunking.split_markdown`, and
+    sections longer than `max_chars` are windowed with `overlap` characters of
+    overlap, so text deep inside long notes gets its own embedding instead of
+    being truncated away. Each vector's metadata holds the note name, heading path
+    and the chunk's byte offsets in the note file, as stored on disk (CRLF line
+    endings included).
 
-    # Create a FAISS index and add the embeddings
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
+    Args:
+        incremental (bool): If True, only re-chunk and embed new or changed notes. Defaults to False.
+        verbose (bool): If True, print a summary of what changed. Defaults to False.
+        max_chars (int): Maximum characters per chunk. Defaults to 1000.
+        overlap (int): Characters shared between consecutive windows of a long section. Defaults to 200.
+        index_type (str): FAISS index type, as for `reindex_notes`. Defaults to NOTES_INDEX_TYPE or "flat".
+        notes (list[str]): With `incremental`, only check these notes, as for `reindex_notes`.
+        batch_size (int): Texts per encoder batch. Defaults to 64.
+        workers (int): Encoder processes, as for `reindex_notes`. Defaults to 1.
 
-    # Save the FAISS index to a file
-    faiss.write_index(index, "data/faiss/notes_index.faiss")
+    Returns:
+        dict: Lists of note names under "added", "updated" and "removed".
 
-    # Save the metadata (note names) to a pickle file
-    with open("data/faiss/notes_meta.pkl", "wb") as f:
-        pickle.dump(notes_list, f)
+    Outputs:
+        - FAISS index file: "data/faiss/passages_index.faiss"
+        - Metadata store: "data/faiss/passages_meta.sqlite"
+        - Manifest file: "data/faiss/passages_manifest.json"
+    """
+    from tools.chunking import split_markdown
+
+    def items_for_note(note, content):
+        items = []
+        for chunk in split_markdown(content, max_chars=max_chars, overlap=overlap):
+            heading = " > ".join(chunk["heading_path"])
+            text = f"{note}\n{heading}\n\n{chunk['text']}" if heading else f"{note}\n\n{chunk['text']}"
+            items.append((text, {"note": note, "heading_path": chunk["heading_path"],
+                                 "start": chunk["start"], "end": chunk["end"]}))
+        return items
+
+    return _update_embedding_index(
+        PASSAGES_INDEX_PATH, PASSAGES_META_PATH, PASSAGES_MANIFEST_PATH,
+        items_for_note, incremental=incremental, verbose=verbose, index_type=index_type, notes=notes,
+        batch_size=batch_size, workers=workers,
+        count_items=lambda note, content: len(split_markdown(content, max_chars=max_chars, overlap=overlap)),
+    )
 
 def search_notes(query: str, top_k: int = 5):
     """
@@ -137,7 +607,9 @@ def search_notes(query: str, top_k: int = 5):
 
     This function uses a precomputed FAISS index and a SentenceTransformer model
     to find the top-k most relevant notes in the vault. The notes are ranked
-    based on their semantic similarity to the query.
+    based on their semantic similarity to the query. The model and index are
+    kept resident by `tools.search_engine.NoteSearchEngine`, so only the first
+    call pays the loading cost.
 
     Args:
         query (str): The search query to find relevant notes.
@@ -146,18 +618,95 @@ def search_notes(query: str, top_k: int = 5):
     Returns:
         list: A list of note names corresponding to the top-k search results.
     """
-    from sentence_transformers import SentenceTransformer
-    import faiss
-    import pickle
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    index = faiss.read_index('data/faiss/notes_index.faiss')
-    with open("data/faiss/notes_meta.pkl", "rb") as f:
-        notes_list = pickle.load(f)
-    query_vec = model.encode([query],convert_to_numpy=True)
-    result = index.search(query_vec, top_k)
-    D,I = index.search(query_vec, top_k)
-    return [notes_list[idx] for idx in I[0]]
+    from tools.search_engine import get_search_engine
+    return get_search_engine().search(query, top_k)
+
+
+def search_notes_batch(queries: list[str], top_k: int = 5, merge: bool = False) -> list:
+    """
+    Search for the most relevant notes for several queries at once.
+
+    All queries are embedded in one batch and searched with a single FAISS call,
+    so N queries cost about as much as one. Useful for query reformulations or
+    several keywords that should be resolved together.
+
+    Args:
+        queries (list[str]): The search queries.
+        top_k (int): The number of top results per query. Defaults to 5.
+        merge (bool): If True, fuse the per-query rankings into one deduplicated
+            list with reciprocal-rank fusion. Defaults to False.
+
+    Returns:
+        list: Without `merge`, one list of (note name, distance) pairs per query, closest
+            first. With `merge`, a single list of (note name, fused score) pairs, best first.
+    """
+    from tools.search_engine import get_search_engine, reciprocal_rank_fusion
+    results = get_search_engine().search_meta_batch(queries, top_k)
+    if merge:
+        return reciprocal_rank_fusion([[note for note, _ in ranked] for ranked in results])[:top_k]
+    return results
+
+
+def hybrid_search(query: str, top_k: int = 5, alpha: float = 0.5) -> list[str]:
+    """
+    Search for notes by meaning and by exact keywords at the same time.
+
+    The semantic (FAISS) ranking and the BM25 keyword ranking are fused with weighted
+    reciprocal-rank fusion. Prefer this over `search_notes` when the query contains
+    names, identifiers or other exact terms, e.g. a model name or a person.
+
+    Args:
+        query (str): The search query.
+        top_k (int): The number of notes to return. Defaults to 5.
+        alpha (float): Weight of the semantic ranking between 0 and 1; the keyword
+            ranking gets 1 - alpha. 1.0 is pure semantic search, 0.0 pure keyword
+            search. Defaults to 0.5.
+
+    Returns:
+        list[str]: Note names, best match first.
+    """
+    from tools.bm25_index import get_bm25_index
+    from tools.search_engine import get_search_engine, reciprocal_rank_fusion
+
+    # Fuse deeper lists than requested so notes ranked moderately by both can surface
+    candidates = max(4 * top_k, 20)
+    semantic = [note for note, _ in get_search_engine().search_meta(query, candidates)] if alpha > 0 else []
+    lexical = []
+    if alpha < 1 and os.path.exists(BM25_PATH):
+        lexical = [note for note, _ in get_bm25_index(BM25_PATH).search(query, candidates)]
+    fused = reciprocal_rank_fusion([semantic, lexical], weights=[alpha, 1 - alpha])
+    return [note for note, _ in fused[:top_k]]
+
+
+def search_passages(query: str, top_k: int = 5) -> list[dict]:
+    """
+    Search for the note sections most relevant to a query.
+
+    Unlike `search_notes`, which ranks whole notes, this searches the chunk-level
+    index built by `reindex_passages` and returns the matching section text, so
+    only the relevant part of a long note needs to be read.
+
+    Args:
+        query (str): The search query to find relevant passages.
+        top_k (int): The number of top passages to return. Defaults to 5.
+
+    Returns:
+        list[dict]: One dict per passage with the keys "note" (note name),
+            "heading" (heading path joined with " > ") and "text" (the section text).
+    """
+    from tools.search_engine import get_search_engine
+    engine = get_search_engine(PASSAGES_INDEX_PATH, PASSAGES_META_PATH)
+    passages = []
+    for meta, _ in engine.search_meta(query, top_k):
+        note_path = os.path.join(VAULT_PATH, meta["note"] + '.md')
+        try:
+            with open(note_path, 'rb') as file:
+                file.seek(meta["start"])
+                text = file.read(meta["end"] - meta["start"]).decode('utf-8', errors='ignore')
+        except FileNotFoundError:
+            continue
+        passages.append({"note": meta["note"], "heading": " > ".join(meta["heading_path"]), "text": text})
+    return passages
 
 
 if __name__ == "__main__":
@@ -0,0 +1,262 @@
+"""Fuzzy, alias-aware lookup of note names.
+
+Generated text rarely names a note exactly: "Stablecoin Future" should find
+"Future of Stablecoins", and "Dwarkesh Podcast" should find "Dwarkesh Patel Podcast".
+`NameIndex` is built once per vault state from every note name (full path and file
+name) plus the `aliases` in the notes' frontmatter. It keeps posting lists from
+normalised word tokens and from character trigrams to the names containing them.
+A lookup only walks the posting lists of the query's rare tokens, those in at most
+`MAX_POSTINGS` names, and scores the best names sharing one, or failing any shared
+token a trigram, with the query. Common words like "notes" therefore cost nothing to
+look up, and a lookup stays well under a millisecond however large the vault is.
+
+Names are normalised by lowercasing, dropping stopwords and stripping plural
+endings. The score blends an idf-weighted token overlap, which ignores word order,
+with trigram similarity, which tolerates typos; 1.0 means the normalised forms are
+identical.
+"""
+import math
+import os
+import re
+import threading
+
+from tools.md_files import WIKILINK_PARTS_RE
+
+WORD_RE = re.compile(r"\w+")
+STOPWORDS = {"a", "an", "and", "the", "of", "on", "in", "for", "to", "with", "at", "by", "from", "vs", "or"}
+
+
+def _stem(word: str) -> str:
+    """Crude plural stripping: 'stablecoins' -> 'stablecoin', 'policies' -> 'policy'."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize_tokens(name: str) -> list[str]:
+    """The tokens a name is matched on."""
+    words = WORD_RE.findall(name.lower().replace("_", " "))
+    tokens = [_stem(w) for w in words if w not in STOPWORDS]
+    return tokens or [_stem(w) for w in words]
+
+
+def link_targets(names) -> set[str]:
+    """The [[link]] targets Obsidian resolves to these notes: paths and file names, any case."""
+    targets = {name.strip().lower() for name in names}
+    targets.update(os.path.basename(name).strip().lower() for name in names)
+    return targets
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Inverted index from name tokens and trigrams to note names and aliases.
+
+    Args:
+        names (list[str]): Note names as returned by `get_notes_list`.
+        aliases (list[tuple[str, str]]): (note name, alias) pairs.
+    """
+
+    # Only the best candidates by shared token weight are fully scored
+    MAX_CANDIDATES = 64
+    # Tokens in more names than this don't generate candidates, unless the query has no rarer one
+    MAX_POSTINGS = 256
+
+    def __init__(self, names: list[str], aliases: list[tuple[str, str]] = ()):
+        self.surfaces = []        # (surface text, target note)
+        self.exact = {}           # lowercase surface -> target note
+        self.aliases = [(name, alias) for name, alias in aliases if alias and alias.strip()]
+        for name in names:
+            for surface in {name, os.path.basename(name)}:
+                self._add(surface, name)
+        self.link_targets = link_targets(names)
+        for name, alias in self.aliases:
+            self._add(alias, name)
+
+        self._tokens = []         # per surface: set of tokens
+        self._grams = []          # per surface: trigram set of the normalised form
+        token_postings, gram_postings = {}, {}
+        for i, (surface, _) in enumerate(self.surfaces):
+            tokens = set(normalize_tokens(surface))
+            grams = _trigrams(" ".join(sorted(tokens)))
+            self._tokens.append(tokens)
+            self._grams.append(grams)
+            for token in tokens:
+                token_postings.setdefault(token, []).append(i)
+            for gram in grams:
+                gram_postings.setdefault(gram, []).append(i)
+        self._token_postings = token_postings
+        self._gram_postings = gram_postings
+        n = max(len(self.surfaces), 1)
+        self._idf = {token: math.log(1 + n / len(ids)) for token, ids in token_postings.items()}
+        self._default_idf = math.log(1 + n)
+        self._surface_weights = [self._weight(tokens) for tokens in self._tokens]
+
+    def is_note(self, target: str) -> bool:
+        """Whether a [[link]] target resolves to a note as written (path or file name, any case)."""
+        return target.strip().lower() in self.link_targets
+
+    def _add(self, surface: str, target: str) -> None:
+        surface = surface.strip()
+        if surface and surface.lower() not in self.exact:
+            self.exact[surface.lower()] = target
+            self.surfaces.append((surface, target))
+
+    def _weight(self, tokens) -> float:
+        return sum(self._idf.get(token, self._default_idf) for token in tokens)
+
+    def lookup(self, candidate: str, top_k: int = 5) -> list[tuple[str, float]]:
+        """
+        Find the notes whose name or alias best matches `candidate`.
+
+        Returns:
+            list[tuple[str, float]]: (note name, score in [0, 1]) pairs, best first,
+                one entry per note.
+        """
+        candidate = candidate.strip()
+        exact = self.exact.get(candidate.lower())
+        if exact is not None:
+            return [(exact, 1.0)]
+        tokens = set(normalize_tokens(candidate))
+        if not tokens:
+            return []
+
+        # Candidate generation: names sharing a rare token, weighted by the tokens' idf.
+        # Common tokens still count when the candidates are scored below.
+        known = sorted((t for t in tokens if t in self._token_postings), key=lambda t: len(self._token_postings[t]))
+        rare = [t for t in known if len(self._token_postings[t]) <= self.MAX_POSTINGS] or known[:1]
+        shared = {}
+        for token in rare:
+            weight = self._idf.get(token)
+            for i in self._token_postings.get(token, ()):
+                shared[i] = shared.get(i, 0.0) + weight
+        grams = _trigrams(" ".join(sorted(tokens)))
+        if not shared:
+            # No whole token in common: fall back to trigrams to catch misspellings
+            for gram in grams:
+                for i in self._gram_postings.get(gram, ()):
+                    shared[i] = shared.get(i, 0.0) + 1.0
+        best_ids = sorted(shared, key=shared.get, reverse=True)[:self.MAX_CANDIDATES]
+
+        query_weight = self._weight(tokens)
+        scores = {}
+        for i in best_ids:
+            common = tokens & self._tokens[i]
+            token_score = 2 * self._weight(common) / (query_weight + self._surface_weights[i])
+            gram_score = len(grams & self._grams[i]) / len(grams | self._grams[i])
+            score = 0.7 * token_score + 0.3 * gram_score
+            target = self.surfaces[i][1]
+            if score > scores.get(target, 0.0):
+                scores[target] = score
+        return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)[:top_k]
+
+    def mentioned_in(self, text: str, top_k: int = 20, min_coverage: float = 0.5) -> list[tuple[str, float]]:
+        """
+        Find the notes whose name or alias occurs in a longer text, in any word order.
+
+        A name's coverage is the idf-weighted share of its tokens found in `text`. Names
+        with at least `min_coverage` are ranked by coverage times the weight of the
+        tokens found, so complete and specific names come first.
+
+        Returns:
+            list[tuple[str, float]]: (note name, score) pairs, best first, one entry per note.
+        """
+        shared = {}
+        for token in set(normalize_tokens(text)):
+            weight = self._idf.get(token)
+            for i in self._token_postings.get(token, ()):
+                shared[i] = shared.get(i, 0.0) + weight
+        scores = {}
+        for i, weight in shared.items():
+            coverage = weight / self._surface_weights[i]
+            if coverage < min_coverage:
+                continue
+            target = self.surfaces[i][1]
+            score = coverage * weight
+            if score > scores.get(target, 0.0):
+                scores[target] = score
+        return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)[:top_k]
+
+    def resolve(self, candidate: str, min_score: float = 0.6):
+        """Return (note name, score) for the best match of `candidate`, or None below `min_score`."""
+        matches = self.lookup(candidate, top_k=1)
+        if matches and matches[0][1] >= min_score:
+            return matches[0]
+        return None
+
+
+_index = None
+_index_key = None
+_index_lock = threading.Lock()
+
+
+def get_name_index(names: list[str] = None) -> NameIndex:
+    """
+    Return the name index for `names` (defaults to the vault's notes) and their aliases.
+
+    The index is cached and rebuilt only when the note list or the note metadata index
+    changes. Aliases come from `tools.note_metadata` when its index exists.
+    """
+    global _index, _index_key
+    from tools import md_files
+    from tools.note_metadata import METADATA_PATH
+
+    names = md_files.get_notes_list() if names is None else names
+    try:
+        metadata_stamp = os.stat(METADATA_PATH).st_mtime_ns
+    except FileNotFoundError:
+        metadata_stamp = None
+    key = (tuple(names), metadata_stamp)
+    with _index_lock:
+        if _index is None or _index_key != key:
+            aliases = []
+            if metadata_stamp is not None:
+                from tools.note_metadata import get_metadata_index
+                known = set(names)
+                aliases = [(note, alias) for key_name in ("aliases", "alias")
+                           for note, alias in get_metadata_index().property_values(key_name) if note in known]
+            _index = NameIndex(names, aliases)
+            _index_key = key
+        return _index
+
+
+def resolve_note_name(candidate: str, min_score: float = 0.6, names: list[str] = None):
+    """
+    Find the existing note that a possibly inexact name or alias refers to.
+
+    Args:
+        candidate (str): A note name as written, e.g. "Stablecoin Future".
+        min_score (float): Minimum similarity in [0, 1] to accept. Defaults to 0.6.
+        names (list[str]): Note names to match against. Defaults to the vault's notes.
+
+    Returns:
+        tuple[str, float] | None: (note name, score), or None if nothing is close enough.
+    """
+    return get_name_index(names).resolve(candidate, min_score)
+
+
+def repair_links(text: str, names: list[str] = None, min_score: float = 0.75) -> str:
+    """
+    Point [[links]] whose target doesn't exist at the closest existing note.
+
+    `[[Stablecoin Future]]` becomes `[[Future of Stablecoins|Stablecoin Future]]`; anchors
+    and display text are kept. Links with no match of at least `min_score` are left alone.
+    """
+    index = get_name_index(names)
+
+    def repair(match):
+        embed, target, anchor, display = match.groups()
+        if not target.strip() or index.is_note(target):
+            return match.group(0)
+        resolved = index.resolve(target, min_score)
+        if resolved is None:
+            return match.group(0)
+        return f"{embed}[[{resolved[0]}{anchor}{display or '|' + target}]]"
+
+    return WIKILINK_PARTS_RE.sub(repair, text)
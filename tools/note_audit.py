@@ -0,0 +1,245 @@
+"""Run the note quality checks of `dspy_modules.note_gen` over a whole vault.
+
+Notes are streamed from the vault (or from any folder of generated notes) and scored
+in batches across a process pool, each worker holding one `NoteEvaluator` built from
+the vault's note list. One record per note is appended to the output as soon as its
+batch finishes, so an interrupted audit keeps what it has done. Re-running the audit
+skips notes whose size and mtime match their record, and notes whose content hash is
+unchanged keep their previous results without being evaluated again. The output is
+rewritten at the end with one record per note still present.
+
+Output is JSON Lines, or CSV when the path ends in `.csv`; check results are stored
+as 0/1 per check column in CSV and as a {check: bool} object in JSONL.
+"""
+import csv
+import hashlib
+import json
+import os
+
+from tools import md_files
+
+AUDIT_DIR = "data/audit"
+AUDIT_PATH = os.path.join(AUDIT_DIR, "note_audit.jsonl")
+
+_worker_evaluator = None
+
+
+def _init_worker(vault_files: list[str]) -> None:
+    global _worker_evaluator
+    from dspy_modules.note_gen import NoteEvaluator
+    _worker_evaluator = NoteEvaluator(vault_files)
+
+
+def _audit_batch(batch: list) -> list[dict]:
+    """Evaluate (name, path, size, mtime, previous hash) items in a worker process."""
+    records = []
+    for name, path, size, mtime, known_hash in batch:
+        record = {"note": name, "size": size, "mtime": mtime}
+        try:
+            with open(path, "rb") as file:
+                raw = file.read()
+        except FileNotFoundError:
+            continue
+        record["sha1"] = hashlib.sha1(raw).hexdigest()
+        if record["sha1"] == known_hash:
+            record["unchanged"] = True
+            records.append(record)
+            continue
+        try:
+            checks = _worker_evaluator.check(raw.decode("utf-8"))
+            record["score"] = sum(checks.values()) / len(checks)
+            record["checks"] = checks
+        except Exception as e:
+            record["score"] = 0.0
+            record["checks"] = {}
+            record["error"] = f"{type(e).__name__}: {e}"
+        records.append(record)
+    return records
+
+
+class _AuditFile:
+    """Reads and appends audit records in JSONL or CSV."""
+
+    def __init__(self, path: str, checks: list[str]):
+        self.path = path
+        self.checks = checks
+        self.is_csv = path.endswith(".csv")
+        self.fields = ["note", "sha1", "size", "mtime", "score", *checks, "error"]
+
+    def load(self) -> dict:
+        """Return {note: record} from an existing audit, the last record of a note winning."""
+        records = {}
+        try:
+            with open(self.path, "r", encoding="utf-8", newline="") as f:
+                if self.is_csv:
+                    for row in csv.DictReader(f):
+                        records[row["note"]] = self._from_row(row)
+                else:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # torn last line of an interrupted run
+                        records[record["note"]] = record
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _from_row(self, row: dict) -> dict:
+        record = {"note": row["note"], "sha1": row["sha1"], "size": int(row["size"]),
+                  "mtime": float(row["mtime"]), "score": float(row["score"]),
+                  "checks": {c: row[c] == "1" for c in self.checks if row.get(c, "") != ""}}
+        if row.get("error"):
+            record["error"] = row["error"]
+        return record
+
+    def _to_row(self, record: dict) -> dict:
+        row = {k: record.get(k, "") for k in ("note", "sha1", "size", "mtime", "score", "error")}
+        row.update({c: int(ok) for c, ok in record["checks"].items()})
+        return row
+
+    def open_append(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        f = open(self.path, "a", encoding="utf-8", newline="")
+        if self.is_csv:
+            writer = csv.DictWriter(f, fieldnames=self.fields)
+            if new_file:
+                writer.writeheader()
+            return f, lambda record: writer.writerow(self._to_row(record))
+        return f, lambda record: f.write(json.dumps(record) + "\n")
+
+    def rewrite(self, records) -> None:
+        """Atomically replace the file with `records`."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            if self.is_csv:
+                writer = csv.DictWriter(f, fieldnames=self.fields)
+                writer.writeheader()
+                writer.writerows(self._to_row(record) for record in records)
+            else:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+        os.replace(tmp_path, self.path)
+
+
+def audit_notes(output_path: str = AUDIT_PATH, notes_dir: str = None, workers: int = None,
+                batch_size: int = 256, full: bool = False, verbose: bool = False) -> dict:
+    """
+    Score every note with the `dspy_modules.note_gen` checks and record the results.
+
+    Args:
+        output_path (str): JSONL or CSV file of per-note results; also the resume state.
+            Defaults to `data/audit/note_audit.jsonl`.
+        notes_dir (str): Audit the notes in this folder (e.g. generated notes) instead of
+            the vault. Links are still checked against the vault's notes.
+        workers (int): Worker processes. Defaults to the number of CPUs.
+        batch_size (int): Notes per task sent to a worker. Defaults to 256.
+        full (bool): Ignore previous results and evaluate every note again.
+        verbose (bool): Print progress and the summary.
+
+    Returns:
+        dict: Summary with "notes", "evaluated", "skipped", "errors", "mean_score" and
+            "pass_rates" ({check: fraction of notes passing}).
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from dspy_modules.note_gen import NoteEvaluator
+    from tools.vault_scan import VaultScanner
+
+    vault_files = md_files.get_notes_list()
+    if notes_dir is None:
+        entries = md_files.get_note_entries(refresh_stats=True)
+    else:
+        entries = VaultScanner(os.path.abspath(os.path.expanduser(notes_dir)), md_files.EXCLUDED_DIRS).scan()
+
+    audit_file = _AuditFile(output_path, NoteEvaluator.CHECKS)
+    previous = {} if full else audit_file.load()
+    if full and os.path.exists(output_path):
+        os.remove(output_path)
+
+    current, todo = {}, []
+    for entry in entries:
+        record = previous.get(entry.name)
+        if record and record["size"] == entry.size and record["mtime"] == entry.mtime and "checks" in record:
+            current[entry.name] = record
+        else:
+            todo.append((entry.name, entry.path, entry.size, entry.mtime, record["sha1"] if record else None))
+
+    evaluated = 0
+    workers = workers or os.cpu_count() or 1
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    f, write = audit_file.open_append()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(vault_files,)) as pool:
+            pending = deque()
+            for i, batch in enumerate(batches):
+                pending.append(pool.submit(_audit_batch, batch))
+                # Keep every worker busy without queueing the whole vault at once
+                while pending and (len(pending) > 2 * workers or i == len(batches) - 1):
+                    evaluated += _collect(pending.popleft().result(), previous, current, write)
+                    if verbose:
+                        print(f"\rAudited {len(current)}/{len(entries)} notes", end="", flush=True)
+    finally:
+        f.close()
+    skipped = len(current) - evaluated
+    audit_file.rewrite(current[name] for name in sorted(current))
+
+    summary = summarize(current.values(), NoteEvaluator.CHECKS)
+    summary.update(evaluated=evaluated, skipped=skipped)
+    if verbose:
+        print()
+        print_summary(summary)
+    return summary
+
+
+def _collect(records: list[dict], previous: dict, current: dict, write) -> int:
+    """Merge a finished batch into `current`, append its records and return how many were evaluated."""
+    evaluated = 0
+    for record in records:
+        if record.pop("unchanged", False):
+            old = previous[record["note"]]
+            record = {**old, "size": record["size"], "mtime": record["mtime"]}
+        else:
+            evaluated += 1
+        current[record["note"]] = record
+        write(record)
+    return evaluated
+
+
+def summarize(records, checks: list[str]) -> dict:
+    """Aggregate pass rates per check and the mean score over audit records."""
+    records = list(records)
+    n = len(records)
+    passes = {check: 0 for check in checks}
+    for record in records:
+        for check, ok in record["checks"].items():
+            passes[check] = passes.get(check, 0) + ok
+    return {
+        "notes": n,
+        "errors": sum(1 for record in records if record.get("error")),
+        "mean_score": sum(record["score"] for record in records) / n if n else 0.0,
+        "pass_rates": {check: count / n if n else 0.0 for check, count in passes.items()},
+    }
+
+
+def print_summary(summary: dict) -> None:
+    print(f"{summary['notes']} notes ({summary.get('evaluated', 0)} evaluated, "
+          f"{summary.get('skipped', 0)} unchanged), {summary['errors']} errors")
+    print(f"Mean score: {summary['mean_score']:.3f}")
+    for check, rate in sorted(summary["pass_rates"].items(), key=lambda item: item[1]):
+        print(f"  {rate:7.1%}  {check}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Audit note quality across the vault with the note_gen checks.")
+    parser.add_argument("--output", default=AUDIT_PATH, help="Results file, .jsonl or .csv (default: %(default)s).")
+    parser.add_argument("--dir", dest="notes_dir", help="Audit the notes in this folder instead of the vault.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--full", action="store_true", help="Re-evaluate every note, ignoring previous results.")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    audit_notes(args.output, notes_dir=args.notes_dir, workers=args.workers, full=args.full, verbose=True)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
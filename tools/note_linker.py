@@ -0,0 +1,141 @@
+"""Insert [[links]] to existing notes into generated text in one pass.
+
+`NoteLinker` compiles every note name into an Aho-Corasick automaton once, and
+`link` then walks the text a single time, whatever the number of notes. The
+automaton runs over word tokens (runs of word characters, single punctuation
+marks) rather than characters, so a name only matches on word boundaries and the
+automaton stays small. Overlapping candidates are resolved leftmost-longest:
+"Machine Learning Basics" wins over "Machine Learning" and the text inside it is
+not linked again.
+
+Aliases link to their note as `[[Note|alias]]`. Frontmatter, fenced and inline code,
+existing wikilinks, markdown links and bare URLs are left untouched.
+"""
+import re
+import threading
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+PROTECTED_RE = re.compile(
+    r"\A---[ \t]*\n.*?\n---[ \t]*(?:\n|\Z)"          # frontmatter
+    r"|^[ \t]*(```|~~~).*?(?:^[ \t]*\1[^\n]*$|\Z)"     # fenced code, to the end if unclosed
+    r"|`[^`\n]+`"                                    # inline code
+    r"|!?\[\[.*?\]\]"                                # wikilinks and embeds
+    r"|!?\[[^\]\n]*\]\([^)\n]*\)"                     # markdown links and images
+    r"|<?https?://[^\s>]+>?",                        # bare URLs
+    re.DOTALL | re.MULTILINE,
+)
+
+
+class NoteLinker:
+    """
+    Aho-Corasick automaton over note names, matched token by token.
+
+    Args:
+        names (list[str]): Note names to link to.
+        aliases (list[tuple[str, str]]): (note name, alias) pairs; mentions of an alias
+            link to its note. Defaults to none.
+        ignore_case (bool): Also link occurrences that differ in case; those become
+            `[[Name|text as written]]`. Defaults to False.
+    """
+
+    def __init__(self, names: list[str], ignore_case: bool = False, aliases: list[tuple[str, str]] = ()):
+        self.ignore_case = ignore_case
+        self._goto = [{}]
+        self._fail = [0]
+        self._depth = [0]
+        self._name = [None]      # note whose name or alias ends at this node
+        self._next_out = [0]     # nearest node on the fail chain with a name
+        # Real names first, so a name wins over another note's identical alias
+        for surface, name in [(name, name) for name in names] + [(alias, name) for name, alias in aliases]:
+            node = 0
+            for token in self._tokens(surface):
+                nxt = self._goto[node].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][token] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._depth.append(self._depth[node] + 1)
+                    self._name.append(None)
+                    self._next_out.append(0)
+                node = nxt
+            if node and self._name[node] is None:
+                self._name[node] = name
+        self._build_fail_links()
+
+    def _tokens(self, text: str) -> list[str]:
+        tokens = TOKEN_RE.findall(text)
+        return [t.lower() for t in tokens] if self.ignore_case else tokens
+
+    def _build_fail_links(self) -> None:
+        from collections import deque
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(token, 0)
+                self._fail[child] = fail
+                self._next_out[child] = fail if self._name[fail] is not None else self._next_out[fail]
+
+    def _matches(self, tokens: list[str]):
+        """Yield (first token, last token, note name) for every name occurring in `tokens`."""
+        node = 0
+        for j, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            out = node if self._name[node] is not None else self._next_out[node]
+            while out:
+                yield j - self._depth[out] + 1, j, self._name[out]
+                out = self._next_out[out]
+
+    def _link_segment(self, text: str) -> str:
+        spans = [(m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+        if not spans:
+            return text
+        tokens = [text[start:end] for start, end in spans]
+        if self.ignore_case:
+            tokens = [t.lower() for t in tokens]
+        # Leftmost-longest, non-overlapping
+        candidates = sorted(self._matches(tokens), key=lambda m: (m[0], m[0] - m[1]))
+        parts, cursor, last_token = [], 0, -1
+        for first, last, name in candidates:
+            if first <= last_token:
+                continue
+            start, end = spans[first][0], spans[last][1]
+            written = text[start:end]
+            parts.append(text[cursor:start])
+            parts.append(f"[[{name}]]" if written == name else f"[[{name}|{written}]]")
+            cursor, last_token = end, last
+        parts.append(text[cursor:])
+        return "".join(parts)
+
+    def link(self, text: str) -> str:
+        """Return `text` with every unlinked mention of a note name turned into a [[link]]."""
+        parts, cursor = [], 0
+        for protected in PROTECTED_RE.finditer(text):
+            parts.append(self._link_segment(text[cursor:protected.start()]))
+            parts.append(protected.group(0))
+            cursor = protected.end()
+        parts.append(self._link_segment(text[cursor:]))
+        return "".join(parts)
+
+
+_linker = None
+_linker_key = None
+_linker_lock = threading.Lock()
+
+
+def get_linker(names: list[str], ignore_case: bool = False, aliases: list[tuple[str, str]] = ()) -> NoteLinker:
+    """Return a NoteLinker for `names`, reusing the last one while the note list and aliases are unchanged."""
+    global _linker, _linker_key
+    key = (tuple(names), ignore_case, tuple(aliases))
+    with _linker_lock:
+        if _linker is None or _linker_key != key:
+            _linker = NoteLinker(names, ignore_case=ignore_case, aliases=aliases)
+            _linker_key = key
+        return _linker
@@ -0,0 +1,423 @@
+"""Persisted index of note frontmatter properties and tags.
+
+Each note's YAML frontmatter is read from the head of the file only (the read stops
+at the closing `---`), parsed once and stored in SQLite at
+`data/index/note_metadata.sqlite`, together with its tags, `created` date and
+`tool_version`. Later updates only re-read notes whose mtime or size changed, and
+tag or property questions are answered from indexed tables without touching the
+vault.
+
+By default every read is header-only and only frontmatter tags are indexed. Inline
+`#tags` live in the note body, so collecting them means streaming the rest of each
+file line by line (no YAML parsing); opt in with `inline_tags=True` (or
+`--inline-tags`). The choice is stored with the index and kept by later updates.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from tools import md_files
+from tools.md_files import FENCE_RE
+
+INDEX_DIR = "data/index"
+METADATA_PATH = os.path.join(INDEX_DIR, "note_metadata.sqlite")
+
+# Refuse to treat anything longer as frontmatter; a note whose opening '---' is
+# never closed would otherwise be read to the end
+MAX_FRONTMATTER_BYTES = 64 * 1024
+
+INLINE_CODE_RE = re.compile(r"`[^`\n]*`")
+# Obsidian tags: letters, digits, '_', '-' and '/' for nesting, at least one non-digit
+INLINE_TAG_RE = re.compile(r"(?<![\w#&/\[])#((?:[\w/-])*[^\W\d](?:[\w/-])*)")
+
+
+def _format_value(value) -> str:
+    """Render a scalar property value the way it is compared in queries."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _jsonable(value):
+    """Make YAML-parsed values (dates in particular) JSON serialisable."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _normalize_tags(raw) -> list[str]:
+    """Turn a `tags` property (list, or comma/space separated string) into bare tag names."""
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = re.split(r"[,\s]+", raw)
+    tags = []
+    for tag in raw if isinstance(raw, list) else [raw]:
+        tag = _format_value(tag).strip().lstrip("#")
+        if tag:
+            tags.append(tag)
+    return tags
+
+
+def read_note_metadata(path: str, inline_tags: bool = False) -> dict:
+    """
+    Read a note's frontmatter without reading the body (unless `inline_tags`).
+
+    Args:
+        path (str): Path of the markdown file.
+        inline_tags (bool): Also scan the body for inline #tags. Defaults to False.
+
+    Returns:
+        dict: "properties" (the parsed frontmatter, {} if there is none or it is not
+            valid YAML) and "tags" (frontmatter and inline tags, without '#', deduplicated
+            in order of appearance).
+    """
+    import yaml
+
+    properties = {}
+    tags = []
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        first = file.readline()
+        if first.rstrip() == "---":
+            lines, size = [], 0
+            for line in file:
+                if line.rstrip() == "---":
+                    try:
+                        parsed = yaml.safe_load("".join(lines))
+                    except yaml.YAMLError:
+                        parsed = None
+                    if isinstance(parsed, dict):
+                        properties = _jsonable(parsed)
+                    break
+                size += len(line)
+                if size > MAX_FRONTMATTER_BYTES:
+                    break
+                lines.append(line)
+            body = file
+        else:
+            body = [first]
+            if inline_tags:
+                body = _chain(body, file)
+        tags.extend(_normalize_tags(properties.get("tags", properties.get("tag"))))
+
+        if inline_tags:
+            in_fence = False
+            for line in body:
+                if FENCE_RE.match(line):
+                    in_fence = not in_fence
+                    continue
+                if in_fence or "#" not in line:
+                    continue
+                tags.extend(INLINE_TAG_RE.findall(INLINE_CODE_RE.sub("", line)))
+    return {"properties": properties, "tags": list(dict.fromkeys(tags))}
+
+
+def _chain(first_lines, rest):
+    yield from first_lines
+    yield from rest
+
+
+class NoteMetadataIndex:
+    """
+    SQLite index of note properties and tags.
+
+    Tables: `notes` (name, mtime, size, created, tool_version, properties as JSON),
+    `tags` (note, tag) and `properties` (note, key, value) with one row per list item,
+    each indexed for lookups by tag or by key and value. Tags and property values are
+    matched case-insensitively.
+
+    Args:
+        path (str): Path of the SQLite file. Defaults to METADATA_PATH.
+    """
+
+    def __init__(self, path: str = METADATA_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS notes (
+                name TEXT PRIMARY KEY, mtime REAL, size INTEGER,
+                created TEXT, tool_version TEXT, properties TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS tags (note TEXT NOT NULL, tag TEXT NOT NULL COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS tags_by_tag ON tags (tag);
+            CREATE INDEX IF NOT EXISTS tags_by_note ON tags (note);
+            CREATE TABLE IF NOT EXISTS properties (
+                note TEXT NOT NULL, key TEXT NOT NULL, value TEXT COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS properties_by_value ON properties (key, value);
+            CREATE INDEX IF NOT EXISTS properties_by_note ON properties (note);
+            CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._conn.commit()
+
+    # ---------- building ---------- #
+
+    def _delete(self, names) -> None:
+        rows = [(name,) for name in names]
+        for table, column in (("notes", "name"), ("tags", "note"), ("properties", "note")):
+            self._conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", rows)
+
+    def indexes_inline_tags(self) -> bool:
+        """Whether the index holds inline #tags from note bodies, not just frontmatter tags."""
+        with self._lock:
+            setting = self._conn.execute("SELECT value FROM settings WHERE key = 'inline_tags'").fetchone()
+        return setting is not None and setting[0] == "True"
+
+    def update(self, incremental: bool = True, notes: list[str] = None, inline_tags: bool = None) -> dict:
+        """
+        Re-read new and changed notes and drop deleted ones.
+
+        Args:
+            incremental (bool): Skip notes whose mtime and size are unchanged. Defaults to True.
+            notes (list[str]): With `incremental`, only check these notes instead of
+                listing the vault; any of them that no longer exist are removed. Ignored
+                until the index has been built once.
+            inline_tags (bool): Also index inline #tags, which requires reading note
+                bodies. Changing it forces a full rebuild. Defaults to the setting the
+                index was built with, or False for a new index.
+
+        Returns:
+            dict: Lists of note names under "added", "updated" and "removed".
+        """
+        from tools.vault_scan import NoteEntry
+
+        with self._lock:
+            setting = self._conn.execute("SELECT value FROM settings WHERE key = 'inline_tags'").fetchone()
+            if inline_tags is None:
+                inline_tags = setting is not None and setting[0] == "True"
+            # No setting means the index was never fully built; a partial update would pass for complete
+            if setting is None or setting[0] != str(inline_tags):
+                incremental = False
+            known = {name: (mtime, size) for name, mtime, size in
+                     self._conn.execute("SELECT name, mtime, size FROM notes")}
+            if not incremental:
+                notes = None
+
+        if notes is not None:
+            checked = set(notes)
+            entries = []
+            for note in notes:
+                path = os.path.join(md_files.VAULT_PATH, note + '.md')
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append(NoteEntry(note, path, stat.st_size, stat.st_mtime))
+        else:
+            entries = md_files.get_note_entries(refresh_stats=True)
+            checked = set(known)
+
+        report = {"added": [], "updated": [], "removed": []}
+        rows = []
+        present = set()
+        for entry in entries:
+            present.add(entry.name)
+            if incremental and known.get(entry.name) == (entry.mtime, entry.size):
+                continue
+            try:
+                metadata = read_note_metadata(entry.path, inline_tags=inline_tags)
+            except FileNotFoundError:
+                present.discard(entry.name)
+                continue
+            rows.append((entry, metadata))
+            report["updated" if entry.name in known else "added"].append(entry.name)
+        report["removed"] = sorted(name for name in checked if name in known and name not in present)
+
+        with self._lock, self._conn:
+            if not incremental:
+                self._conn.execute("DELETE FROM notes")
+                self._conn.execute("DELETE FROM tags")
+                self._conn.execute("DELETE FROM properties")
+            self._delete(report["removed"] + [entry.name for entry, _ in rows])
+            self._conn.executemany(
+                "INSERT INTO notes (name, mtime, size, created, tool_version, properties) VALUES (?, ?, ?, ?, ?, ?)",
+                [(entry.name, entry.mtime, entry.size,
+                  _format_value(meta["properties"]["created"]) if meta["properties"].get("created") is not None else None,
+                  _format_value(meta["properties"]["tool_version"]) if meta["properties"].get("tool_version") is not None else None,
+                  json.dumps(meta["properties"])) for entry, meta in rows])
+            self._conn.executemany("INSERT INTO tags (note, tag) VALUES (?, ?)",
+                                   [(entry.name, tag) for entry, meta in rows for tag in meta["tags"]])
+            self._conn.executemany(
+                "INSERT INTO properties (note, key, value) VALUES (?, ?, ?)",
+                [(entry.name, key, _format_value(item) if item is not None else None)
+                 for entry, meta in rows for key, value in meta["properties"].items()
+                 for item in (value if isinstance(value, list) else [value])])
+            self._conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('inline_tags', ?)",
+                               (str(inline_tags),))
+        return report
+
+    # ---------- queries ---------- #
+
+    def tag_counts(self) -> dict[str, int]:
+        """All tags with the number of notes using each, most used first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT MIN(tag), COUNT(DISTINCT note) AS n FROM tags GROUP BY tag ORDER BY n DESC, tag").fetchall()
+        return dict(rows)
+
+    def notes_with_tag(self, tag: str, nested: bool = True) -> list[str]:
+        """
+        Notes tagged with `tag` (with or without the leading '#').
+
+        Args:
+            tag (str): The tag to look up, matched case-insensitively.
+            nested (bool): Also match nested tags such as `tag/subtag`, as Obsidian does.
+                Defaults to True.
+        """
+        tag = tag.lstrip("#")
+        query = "SELECT DISTINCT note FROM tags WHERE tag = ?"
+        params = [tag]
+        if nested:
+            # Range scan over the index instead of LIKE, which can't use a NOCASE index with '_' in the tag
+            query += " OR (tag >= ? AND tag < ?)"
+            params += [tag + "/", tag + "0"]  # '0' sorts right after '/'
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query + " ORDER BY note", params)]
+
+    def notes_with_property(self, key: str, value=None) -> list[str]:
+        """
+        Notes whose property `key` equals `value`, or that have `key` at all if `value` is None.
+
+        List properties match if any item equals `value`. Values are compared as text,
+        case-insensitively: dates as YYYY-MM-DD, booleans as true/false.
+        """
+        with self._lock:
+            if value is None:
+                rows = self._conn.execute(
+                    "SELECT DISTINCT note FROM properties WHERE key = ? ORDER BY note", (key,))
+            else:
+                rows = self._conn.execute(
+                    "SELECT DISTINCT note FROM properties WHERE key = ? AND value = ? ORDER BY note",
+                    (key, _format_value(value)))
+            return [row[0] for row in rows]
+
+    def property_values(self, key: str) -> list[tuple[str, str]]:
+        """All (note, value) pairs of property `key`, one per list item, e.g. every alias."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT note, value FROM properties WHERE key = ? AND value IS NOT NULL ORDER BY note", (key,)).fetchall()
+
+    def properties(self, note: str) -> dict:
+        """The parsed frontmatter of `note`, or {} if it has none or is not indexed."""
+        with self._lock:
+            row = self._conn.execute("SELECT properties FROM notes WHERE name = ?", (note,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def tags(self, note: str) -> list[str]:
+        """The tags of `note`."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT tag FROM tags WHERE note = ? ORDER BY rowid", (note,))]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_metadata_index() -> NoteMetadataIndex:
+    """Return the process-wide metadata index, building it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            exists = os.path.exists(METADATA_PATH)
+            _index = NoteMetadataIndex()
+            if not exists:
+                _index.update(incremental=False)
+    return _index
+
+
+def update_note_metadata(incremental: bool = True, verbose: bool = False, notes: list[str] = None,
+                         inline_tags: bool = None) -> dict:
+    """
+    Bring the metadata index up to date with the vault.
+
+    Args:
+        incremental (bool): Only re-read notes whose mtime or size changed. Defaults to True.
+        verbose (bool): If True, print a summary. Defaults to False.
+        notes (list[str]): With `incremental`, only check these notes. Defaults to None.
+        inline_tags (bool): Also index inline #tags from note bodies. Defaults to the
+            index's current setting, or False (frontmatter only) for a new index.
+
+    Returns:
+        dict: Lists of note names under "added", "updated" and "removed".
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NoteMetadataIndex()
+    report = _index.update(incremental=incremental, notes=notes, inline_tags=inline_tags)
+    if verbose:
+        print(f"Note metadata: {len(report['added'])} added, {len(report['updated'])} updated, "
+              f"{len(report['removed'])} removed, {len(_index.tag_counts())} tags")
+    return report
+
+
+##Tools for ReAct Agent
+
+
+def get_tag_list() -> dict[str, int]:
+    """
+    Get every tag used in the vault.
+
+    Returns:
+        dict[str, int]: Tag names (without '#') mapped to the number of notes using them.
+    """
+    return get_metadata_index().tag_counts()
+
+
+def find_notes_by_tag(tag: str) -> list[str]:
+    """
+    Find the notes tagged with a tag, including its nested tags (e.g. `ml` also matches `ml/rl`).
+
+    Args:
+        tag (str): The tag, with or without the leading '#'.
+
+    Returns:
+        list[str]: Names of the tagged notes.
+    """
+    return get_metadata_index().notes_with_tag(tag)
+
+
+def find_notes_by_property(key: str, value: str) -> list[str]:
+    """
+    Find the notes whose frontmatter property `key` has the value `value`.
+
+    Args:
+        key (str): The property name, e.g. "created" or "aliases".
+        value (str): The value to match (case-insensitive; dates as YYYY-MM-DD).
+
+    Returns:
+        list[str]: Names of the matching notes.
+    """
+    return get_metadata_index().notes_with_property(key, value)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or update the note properties and tags index.")
+    parser.add_argument("--full", action="store_true", help="Re-read every note instead of only changed ones.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--inline-tags", dest="inline_tags", action="store_true", default=None,
+                       help="Also scan note bodies for inline #tags (kept for later updates).")
+    group.add_argument("--no-inline-tags", dest="inline_tags", action="store_false",
+                       help="Only read frontmatter (the default for a new index).")
+    parser.add_argument("--tags", action="store_true", help="Print the tag counts afterwards.")
+    args = parser.parse_args()
+    update_note_metadata(incremental=not args.full, verbose=True, inline_tags=args.inline_tags)
+    if args.tags:
+        for tag, count in get_metadata_index().tag_counts().items():
+            print(f"{count:6d}  #{tag}")
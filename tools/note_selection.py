@@ -0,0 +1,188 @@
+"""Choose the existing notes worth naming in a note-generation prompt.
+
+Putting every note name in the prompt costs tokens in proportion to the vault. The
+model only needs the notes related to the text at hand, so `select_related_notes`
+ranks note names against the input context two ways and fuses the rankings:
+
+- lexically, with `NameIndex.mentioned_in`: names and aliases whose words occur in
+  the context;
+- semantically, by cosine similarity between the note names' embeddings and a few
+  evenly spaced excerpts of the context.
+
+The name embeddings are stored in `data/faiss/note_titles.npz`. Only names added
+since the last call are encoded, so the first call on a large vault pays for
+encoding every name once. The result is capped at `top_k` names and `max_tokens`
+tokens, so the prompt stays the same size however large the vault grows.
+"""
+import os
+import threading
+
+import numpy as np
+
+from tools.md_files import EMBEDDING_MODEL, FAISS_DIR
+
+TITLES_PATH = os.path.join(FAISS_DIR, "note_titles.npz")
+DEFAULT_TOP_K = int(os.getenv("NOTE_LIST_K", 40))
+DEFAULT_MAX_TOKENS = int(os.getenv("NOTE_LIST_MAX_TOKENS", 600))
+QUERY_TOKENS = 200   # context excerpt per query, about what the embedding model reads
+MAX_QUERIES = 8
+
+
+def _title_text(name: str) -> str:
+    """The text embedded for a note name: folders and words spelled out."""
+    return name.replace("/", " / ").replace("_", " ").replace("-", " ")
+
+
+class TitleEmbeddings:
+    """
+    Normalised embeddings of note names, stored on disk and synced incrementally.
+
+    Args:
+        path (str): The .npz file. Defaults to `data/faiss/note_titles.npz`.
+        model_name (str): SentenceTransformer used for names and queries.
+    """
+
+    def __init__(self, path: str = TITLES_PATH, model_name: str = EMBEDDING_MODEL):
+        self.path = path
+        self.model_name = model_name
+        self.names = []
+        self.vectors = None
+        self._names_key = None
+        self._lock = threading.Lock()
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        from tools.search_engine import encode_batch
+        vectors = encode_batch(texts, self.model_name)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with np.load(self.path, allow_pickle=False) as data:
+            if str(data["model"]) != self.model_name:
+                return {}
+            return dict(zip(data["names"].tolist(), data["vectors"]))
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, names=np.array(self.names, dtype=str), vectors=self.vectors,
+                 model=np.array(self.model_name))
+        os.replace(tmp_path, self.path)
+
+    def sync(self, names: list[str]) -> None:
+        """Make the embeddings match `names`: encode new names, drop removed ones, save if anything changed."""
+        key = tuple(names)
+        with self._lock:
+            if key == self._names_key:
+                return
+            known = dict(zip(self.names, self.vectors)) if self.vectors is not None else self._load()
+            names = list(dict.fromkeys(names))
+            missing = [name for name in names if name not in known]
+            if missing:
+                known.update(zip(missing, self._encode([_title_text(name) for name in missing])))
+            changed = bool(missing) or len(known) != len(names)
+            self.names = names
+            self.vectors = (np.stack([known[name] for name in names]).astype("float32") if names
+                            else np.zeros((0, 0), dtype="float32"))
+            if changed:
+                self._save()
+            self._names_key = key
+
+    def search(self, queries: list[str], top_k: int = 20) -> list[tuple[str, float]]:
+        """Names most similar to any of `queries`, as (name, cosine similarity) pairs, best first."""
+        if not queries or not self.names:
+            return []
+        similarity = (self.vectors @ self._encode(queries).T).max(axis=1)
+        k = min(top_k, len(self.names))
+        best = np.argpartition(-similarity, k - 1)[:k]
+        best = best[np.argsort(-similarity[best])]
+        return [(self.names[i], float(similarity[i])) for i in best]
+
+
+_title_embeddings = {}
+_title_embeddings_lock = threading.Lock()
+
+
+def get_title_embeddings(path: str = TITLES_PATH) -> TitleEmbeddings:
+    """Return the process-wide TitleEmbeddings for `path`."""
+    embeddings = _title_embeddings.get(path)
+    if embeddings is None:
+        with _title_embeddings_lock:
+            embeddings = _title_embeddings.setdefault(path, TitleEmbeddings(path))
+    return embeddings
+
+
+def _context_queries(context: str, model: str = None) -> list[str]:
+    """Up to MAX_QUERIES evenly spaced excerpts of the context, each about QUERY_TOKENS long."""
+    from tools.token_usage import chunk_text
+    chunks = [chunk for chunk in chunk_text(context, QUERY_TOKENS, model) if chunk.strip()]
+    if len(chunks) <= MAX_QUERIES:
+        return chunks
+    step = len(chunks) / MAX_QUERIES
+    return [chunks[int(i * step)] for i in range(MAX_QUERIES)]
+
+
+def select_related_notes(context: str, names: list[str] = None, top_k: int = DEFAULT_TOP_K,
+                         max_tokens: int = DEFAULT_MAX_TOKENS, alpha: float = 0.5, model: str = None) -> list[str]:
+    """
+    Pick the note names most relevant to `context`, for the `note_list` of a prompt.
+
+    Args:
+        context (str): The text the note is generated from.
+        names (list[str]): Candidate note names. Defaults to the vault's notes.
+        top_k (int): Most names to return. Defaults to `NOTE_LIST_K` (40).
+        max_tokens (int): Token budget for the names, one per line. Defaults to
+            `NOTE_LIST_MAX_TOKENS` (600); 0 means no budget.
+        alpha (float): Weight of the semantic ranking between 0 and 1; the lexical
+            ranking gets 1 - alpha. Defaults to 0.5.
+        model (str): Model whose tokenizer counts the budget.
+
+    Returns:
+        list[str]: Note names, most relevant first.
+    """
+    from tools.md_files import get_notes_list
+    from tools.name_index import get_name_index
+    from tools.search_engine import reciprocal_rank_fusion
+    from tools.token_usage import count_tokens
+
+    names = get_notes_list() if names is None else names
+    if not names or not context.strip() or top_k <= 0:
+        return []
+    # Fuse deeper lists than requested so names ranked moderately by both can surface
+    candidates = max(2 * top_k, 20)
+    lexical = [name for name, _ in get_name_index(names).mentioned_in(context, candidates)] if alpha < 1 else []
+    semantic = []
+    if alpha > 0:
+        embeddings = get_title_embeddings()
+        embeddings.sync(names)
+        semantic = [name for name, _ in embeddings.search(_context_queries(context, model), candidates)]
+    fused = reciprocal_rank_fusion([semantic, lexical], weights=[alpha, 1 - alpha])
+
+    selected, used = [], 0
+    for name, _ in fused[:top_k]:
+        tokens = count_tokens(name + "\n", model)
+        if max_tokens and used + tokens > max_tokens:
+            break
+        selected.append(name)
+        used += tokens
+    return selected
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the notes that would be put in a prompt for some text.")
+    parser.add_argument("path", help="File with the context text.")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Most names (default: %(default)s).")
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS,
+                        help="Token budget for the names (default: %(default)s).")
+    parser.add_argument("--alpha", type=float, default=0.5, help="Semantic vs lexical weight (default: %(default)s).")
+    args = parser.parse_args()
+    with open(args.path, "r", encoding="utf-8") as f:
+        text = f.read()
+    for note in select_related_notes(text, top_k=args.top_k, max_tokens=args.max_tokens, alpha=args.alpha):
+        print(note)
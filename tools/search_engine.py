@@ -0,0 +1,187 @@
+"""Long-lived semantic search over the FAISS note index.
+
+Loading the SentenceTransformer model and opening the index costs seconds, so both
+are kept resident here and shared by every caller in the process. The index is
+memory-mapped and reopened only when its file changes on disk (e.g. after
+`reindex_notes`); metadata is looked up lazily per search in its SQLite store.
+"""
+import os
+import threading
+
+from tools.md_files import EMBEDDING_MODEL, INDEX_PATH, META_PATH
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL):
+    """Return a process-wide SentenceTransformer for `model_name`, loading it on first use."""
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_name)
+                _models[model_name] = model
+    return model
+
+
+def set_embedding_model(model, model_name: str = EMBEDDING_MODEL) -> None:
+    """
+    Use `model` for `model_name` in this process instead of loading a SentenceTransformer.
+
+    `model` needs SentenceTransformer's `encode(texts, convert_to_numpy=True)` and
+    `get_sentence_embedding_dimension()`; benchmarks use this to run offline with a stub.
+    """
+    with _models_lock:
+        _models[model_name] = model
+
+
+def init_encoder_process(model_name: str = EMBEDDING_MODEL, workers: int = 1) -> None:
+    """Process-pool initializer: split the CPU threads between workers and load the model once."""
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
+    get_embedding_model(model_name)
+
+
+def encode_batch(texts: list[str], model_name: str = EMBEDDING_MODEL):
+    """Embed a batch of texts with the process-wide model, as float32."""
+    return get_embedding_model(model_name).encode(texts, convert_to_numpy=True).astype('float32')
+
+
+class NoteSearchEngine:
+    """
+    Keeps the embedding model, FAISS index and metadata store open between searches.
+
+    Before every search the index file is stat'ed; if it changed since the last load,
+    it is reopened. Everything is opened lazily on first use. A legacy `*_meta.pkl`
+    next to the index is migrated to the SQLite store the first time it is needed.
+    """
+
+    def __init__(self, index_path: str = INDEX_PATH, meta_path: str = META_PATH,
+                 model_name: str = EMBEDDING_MODEL):
+        self.index_path = index_path
+        self.meta_path = meta_path
+        self.model_name = model_name
+        self._index = None
+        self._meta = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return get_embedding_model(self.model_name)
+
+    def _files_signature(self) -> tuple:
+        stat = os.stat(self.index_path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def reload(self) -> None:
+        """Reopen the FAISS index (memory-mapped) and the metadata store."""
+        from tools.index_store import MetaStore, migrate_pickle_meta, read_index_mmap
+        with self._lock:
+            signature = self._files_signature()
+            index = read_index_mmap(self.index_path)
+            if self._meta is None:
+                legacy_path = os.path.splitext(self.meta_path)[0] + ".pkl"
+                if not os.path.exists(self.meta_path) and os.path.exists(legacy_path):
+                    migrate_pickle_meta(legacy_path, self.meta_path)
+                self._meta = MetaStore(self.meta_path)
+            self._index, self._signature = index, signature
+
+    def _ensure_loaded(self):
+        if self._index is None or self._files_signature() != self._signature:
+            self.reload()
+        return self._index, self._meta
+
+    def search_meta(self, query: str, top_k: int = 5) -> list[tuple[object, float]]:
+        """
+        Search the index for the vectors closest to `query`.
+
+        Args:
+            query (str): The search query.
+            top_k (int): The number of results to return. Defaults to 5.
+
+        Returns:
+            list[tuple[object, float]]: (metadata, L2 distance) pairs, closest first. The
+                metadata is a note name for the notes index and a dict for the passages index.
+        """
+        return self.search_meta_batch([query], top_k)[0]
+
+    def search_meta_batch(self, queries: list[str], top_k: int = 5) -> list[list[tuple[object, float]]]:
+        """
+        Search for several queries at once.
+
+        All queries are encoded in one `model.encode` call and looked up with a single
+        `index.search` over the stacked query matrix.
+
+        Args:
+            queries (list[str]): The search queries.
+            top_k (int): The number of results per query. Defaults to 5.
+
+        Returns:
+            list[list[tuple[object, float]]]: For each query, (metadata, L2 distance) pairs, closest first.
+        """
+        if not queries:
+            return []
+        index, store = self._ensure_loaded()
+        query_vecs = self.model.encode(list(queries), convert_to_numpy=True)
+        D, I = index.search(query_vecs.astype('float32'), top_k)
+        meta = store.get_many({int(idx) for idx in I.ravel() if idx != -1})
+        # Ids missing from the store belong to a reindex that is still being written
+        return [[(meta[idx], float(dist)) for dist, idx in zip(dists, ids) if idx in meta]
+                for dists, ids in zip(D, I)]
+
+    def search_with_distances(self, query: str, top_k: int = 5) -> list[tuple[str, float]]:
+        """Search for the notes closest to `query` and return (note name, L2 distance) pairs."""
+        return self.search_meta(query, top_k)
+
+    def search(self, query: str, top_k: int = 5) -> list[str]:
+        """Search for the notes closest to `query` and return their names, closest first."""
+        return [note for note, _ in self.search_with_distances(query, top_k)]
+
+
+def reciprocal_rank_fusion(rankings: list[list], k: int = 60, weights: list[float] = None) -> list[tuple[object, float]]:
+    """
+    Merge several ranked lists into one with reciprocal-rank fusion.
+
+    Each item scores `sum(1 / (k + rank))` over the lists it appears in (rank starting
+    at 1), so items ranked well by several lists rise to the top and duplicates collapse.
+
+    Args:
+        rankings (list[list]): Ranked lists of hashable items, best first.
+        k (int): Damping constant; larger values flatten the rank weighting. Defaults to 60.
+        weights (list[float]): Per-list multipliers for the scores; lists weighted 0 are
+            ignored. Defaults to 1 for every list.
+
+    Returns:
+        list[tuple[object, float]]: (item, fused score) pairs, highest score first.
+    """
+    scores = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        if not weight:
+            continue
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_search_engine(index_path: str = INDEX_PATH, meta_path: str = META_PATH) -> NoteSearchEngine:
+    """Return the process-wide NoteSearchEngine for an index, creating it on first use."""
+    key = (index_path, meta_path)
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = NoteSearchEngine(index_path, meta_path)
+                _engines[key] = engine
+    return engine
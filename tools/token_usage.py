@@ -0,0 +1,440 @@
+"""Token counting, a persisted usage ledger, input budgets and usage reports.
+
+- `count_tokens(text, model)` uses the model's real tokenizer (tiktoken, loaded once
+  per encoding). OpenAI models get their own encoding; other models, such as those
+  served by Ollama, are counted with `TOKENIZER_ENCODING` (default cl100k_base) as an
+  approximation. Without tiktoken installed it falls back to `len(text) / 3.5`.
+- Every LLM response that goes through `dspy_modules.cached_lm.CachedLM` or a client
+  wrapped by `tools.llm_cache.cache_openai_client` is recorded in
+  `data/usage/usage.jsonl`. Each record holds the API's prompt and completion token
+  counts, latency, model, cost (when litellm knows the price) and the pipeline that
+  made the call. Set `LLM_USAGE_LEDGER=off` to stop recording, or to a path to record
+  elsewhere.
+- `enforce_budget` refuses text over a token limit, or splits it into chunks that fit.
+- `python -m tools.token_usage` prints tokens, cost and latency per pipeline.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+USAGE_DIR = "data/usage"
+USAGE_PATH = os.path.join(USAGE_DIR, "usage.jsonl")
+CHARS_PER_TOKEN = 3.5  # fallback when no tokenizer is available
+SENTENCE_END_RE = re.compile(r"(?<=[.!?]\s)")
+
+# Encodings of OpenAI model families, most specific prefix first
+OPENAI_ENCODINGS = (
+    ("gpt-4o", "o200k_base"), ("gpt-4.1", "o200k_base"), ("gpt-4.5", "o200k_base"), ("gpt-5", "o200k_base"),
+    ("o1", "o200k_base"), ("o3", "o200k_base"), ("o4", "o200k_base"),
+    ("gpt-4", "cl100k_base"), ("gpt-3.5", "cl100k_base"), ("text-embedding", "cl100k_base"),
+)
+
+_pipeline = contextvars.ContextVar("usage_pipeline", default=None)
+_collectors = contextvars.ContextVar("usage_collectors", default=())
+
+
+class TokenBudgetExceeded(ValueError):
+    """Raised when an input is over its token budget and may not be chunked."""
+
+
+#### Tokenizers
+
+class Tokenizer:
+    """
+    Counts tokens for one model.
+
+    Attributes:
+        name (str): The tiktoken encoding, or "chars/3.5" for the fallback.
+        exact (bool): Whether this is the model's own tokenizer rather than an approximation.
+    """
+
+    def __init__(self, encoding=None, exact: bool = False):
+        self._encoding = encoding
+        self.name = encoding.name if encoding is not None else f"chars/{CHARS_PER_TOKEN}"
+        self.exact = exact and encoding is not None
+
+    def encode(self, text: str) -> list[int]:
+        """
+        Token ids of `text`.
+
+        Raises:
+            RuntimeError: If no tiktoken encoding is loaded; the chars/3.5 fallback
+                only estimates counts and has no token ids.
+        """
+        if self._encoding is None:
+            raise RuntimeError("token ids need tiktoken and its encoding files; "
+                               f"the {self.name} fallback only estimates counts")
+        return self._encoding.encode(text, disallowed_special=())
+
+    def count(self, text: str) -> int:
+        """Number of tokens in `text`, estimated as len(text) / 3.5 without a tokenizer."""
+        if not text:
+            return 0
+        if self._encoding is None:
+            return round(len(text) / CHARS_PER_TOKEN)
+        return len(self.encode(text))
+
+
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
+
+
+def _encoding_name(model: str) -> tuple[str, bool]:
+    """(tiktoken encoding, whether it is the model's own) for a model name like "azure/gpt-4.1-mini"."""
+    base = (model or "").rsplit("/", 1)[-1].split(":")[0].lower()
+    for prefix, encoding in OPENAI_ENCODINGS:
+        if base.startswith(prefix):
+            return encoding, True
+    return os.getenv("TOKENIZER_ENCODING", "cl100k_base"), False
+
+
+def get_tokenizer(model: str = None) -> Tokenizer:
+    """Return the Tokenizer for `model`, loading each encoding only once per process."""
+    name, exact = _encoding_name(model)
+    tokenizer = _tokenizers.get((name, exact))
+    if tokenizer is None:
+        with _tokenizers_lock:
+            tokenizer = _tokenizers.get((name, exact))
+            if tokenizer is None:
+                try:
+                    import tiktoken
+                    encoding = tiktoken.get_encoding(name)
+                except Exception:  # not installed, or the encoding can't be downloaded
+                    encoding = None
+                tokenizer = _tokenizers[(name, exact)] = Tokenizer(encoding, exact)
+    return tokenizer
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Number of tokens in `text` for `model`."""
+    return get_tokenizer(model).count(text)
+
+
+#### Budgets
+
+def chunk_text(text: str, max_tokens: int, model: str = None) -> list[str]:
+    """
+    Split text into consecutive chunks of at most `max_tokens` tokens each.
+
+    Chunks end at paragraph breaks where possible, then at line breaks, then at the
+    end of a sentence. Only a single sentence longer than the limit is cut within it.
+    Joining the chunks gives back the text.
+    """
+    tokenizer = get_tokenizer(model)
+    if tokenizer.count(text) <= max_tokens:
+        return [text]
+    chunks, current, current_tokens = [], "", 0
+    for piece in _pieces(text, max_tokens, tokenizer):
+        tokens = tokenizer.count(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = "", 0
+        current += piece
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _pieces(text: str, max_tokens: int, tokenizer: Tokenizer):
+    """Paragraphs of `text`; those over `max_tokens` as lines, then sentences, then slices."""
+    for paragraph in re.split(r"(?<=\n\n)", text):
+        if tokenizer.count(paragraph) <= max_tokens:
+            yield paragraph
+            continue
+        for line in paragraph.splitlines(keepends=True):
+            if tokenizer.count(line) <= max_tokens:
+                yield line
+                continue
+            # Transcripts and scraped pages often have whole sections on one line
+            for sentence in SENTENCE_END_RE.split(line):
+                tokens = tokenizer.count(sentence)
+                if tokens <= max_tokens:
+                    yield sentence
+                    continue
+                # Cut by characters, at this sentence's own characters-per-token rate, so no character is split
+                step = max(1, int(len(sentence) * max_tokens / tokens * 0.9))
+                start = 0
+                while start < len(sentence):
+                    piece = sentence[start:start + step]
+                    while len(piece) > 1 and tokenizer.count(piece) > max_tokens:
+                        piece = piece[:len(piece) * 9 // 10]
+                    yield piece
+                    start += len(piece)
+
+
+def enforce_budget(text: str, max_tokens: int, model: str = None, mode: str = "refuse") -> list[str]:
+    """
+    Check `text` against a token budget.
+
+    Args:
+        text (str): The input to send to the model.
+        max_tokens (int): The budget; None or 0 means unlimited.
+        model (str): Model whose tokenizer counts the text.
+        mode (str): "refuse" raises when over budget; "chunk" splits the text into
+            pieces that each fit (see `chunk_text`).
+
+    Returns:
+        list[str]: `[text]` when it fits, otherwise the chunks.
+
+    Raises:
+        TokenBudgetExceeded: If the text is over budget and `mode` is "refuse".
+    """
+    if not max_tokens:
+        return [text]
+    tokens = count_tokens(text, model)
+    if tokens <= max_tokens:
+        return [text]
+    if mode == "chunk":
+        return chunk_text(text, max_tokens, model)
+    if mode != "refuse":
+        raise ValueError(f"Unknown budget mode '{mode}'; use 'refuse' or 'chunk'.")
+    raise TokenBudgetExceeded(f"Input is {tokens} tokens, over the budget of {max_tokens}.")
+
+
+#### Usage ledger
+
+@contextlib.contextmanager
+def usage_pipeline(name: str):
+    """
+    Attribute the LLM calls made within this block to pipeline `name` in the ledger.
+
+    An enclosing block keeps its name, so a pipeline built on another one (e.g. web
+    pages into `obsidify_text`) is reported under the outer pipeline.
+    """
+    token = _pipeline.set(_pipeline.get() or name)
+    try:
+        yield
+    finally:
+        _pipeline.reset(token)
+
+
+def current_pipeline() -> str:
+    """The pipeline set by `usage_pipeline`, else the name of the running script."""
+    name = _pipeline.get()
+    if name:
+        return name
+    script = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv and sys.argv[0] else ""))[0]
+    return script if script and script != "-c" else "interactive"
+
+
+@contextlib.contextmanager
+def collect_usage():
+    """Collect the usage records of the LLM calls made within this block (in this thread or task)."""
+    records = []
+    token = _collectors.set(_collectors.get() + (records,))
+    try:
+        yield records
+    finally:
+        _collectors.reset(token)
+
+
+class UsageLedger:
+    """
+    Append-only JSONL ledger of LLM calls.
+
+    Args:
+        path (str): Ledger file. Defaults to `LLM_USAGE_LEDGER` or `data/usage/usage.jsonl`;
+            "off" disables recording.
+    """
+
+    def __init__(self, path: str = None):
+        path = path or os.getenv("LLM_USAGE_LEDGER", USAGE_PATH)
+        self.enabled = path.lower() not in ("0", "off", "false", "no")
+        self.path = path if self.enabled else None
+        self.totals = {"calls": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int, latency: float,
+               cached: bool = False, cost: float = None, source: str = "dspy", estimated: bool = False,
+               pipeline: str = None) -> dict:
+        """Append one call to the ledger; returns the record."""
+        record = {"time": round(time.time(), 3), "pipeline": pipeline or current_pipeline(), "model": model,
+                  "source": source, "prompt_tokens": int(prompt_tokens or 0),
+                  "completion_tokens": int(completion_tokens or 0), "latency": round(latency, 4),
+                  "cached": cached, "cost": 0.0 if cached else cost, "estimated": estimated}
+        record["total_tokens"] = record["prompt_tokens"] + record["completion_tokens"]
+        with self._lock:
+            self.totals["calls"] += 1
+            self.totals["cached"] += cached
+            self.totals["prompt_tokens"] += record["prompt_tokens"]
+            self.totals["completion_tokens"] += record["completion_tokens"]
+            self.totals["cost"] += record["cost"] or 0.0
+            if self.enabled:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        for records in _collectors.get():
+            records.append(record)
+        return record
+
+    def read(self, since: float = None) -> list[dict]:
+        """Records in the ledger, optionally only those made after the timestamp `since`."""
+        if not self.enabled or not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a killed process
+                if since is None or record.get("time", 0) >= since:
+                    records.append(record)
+        return records
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_usage_ledger(path: str = None) -> UsageLedger:
+    """Return the process-wide UsageLedger for `path`, creating it on first use."""
+    ledger = _ledgers.get(path)
+    if ledger is None:
+        with _ledgers_lock:
+            ledger = _ledgers.setdefault(path, UsageLedger(path))
+    return ledger
+
+
+def _field(obj, name: str):
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int):
+    """Cost in USD from litellm's price list, or None if litellm is missing or doesn't know the model."""
+    try:
+        from litellm import cost_per_token
+        prompt_cost, completion_cost = cost_per_token(model=model, prompt_tokens=prompt_tokens,
+                                                      completion_tokens=completion_tokens)
+        return prompt_cost + completion_cost
+    except Exception:
+        return None
+
+
+def record_response_usage(model: str, response, latency: float, cached: bool = False,
+                          source: str = "dspy", messages: list = None) -> dict:
+    """
+    Record the usage reported with a chat completion (litellm or OpenAI, object or dict).
+
+    When the response carries no usage, prompt and completion are counted with the
+    model's tokenizer instead and the record is marked "estimated".
+    """
+    usage = _field(response, "usage")
+    prompt_tokens, completion_tokens = _field(usage, "prompt_tokens"), _field(usage, "completion_tokens")
+    estimated = prompt_tokens is None or completion_tokens is None
+    if estimated:
+        choices = _field(response, "choices") or []
+        text = "".join(_field(_field(choice, "message"), "content") or "" for choice in choices)
+        prompt_tokens, completion_tokens = _count_messages(messages, model), count_tokens(text, model)
+    cost = None
+    if not cached:
+        hidden = getattr(response, "_hidden_params", None) or {}
+        cost = hidden.get("response_cost") if isinstance(hidden, dict) else None
+        if cost is None:
+            cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    return get_usage_ledger().record(model, prompt_tokens, completion_tokens, latency, cached=cached,
+                                     cost=cost, source=source, estimated=estimated)
+
+
+def record_stream_usage(model: str, chunks: list[dict], latency: float, messages: list = None,
+                        cached: bool = False, source: str = "openai") -> dict:
+    """Record the usage of a streamed chat completion from its chunks (as dicts)."""
+    usage = next((chunk["usage"] for chunk in reversed(chunks) if chunk.get("usage")), None)
+    if usage:
+        return record_response_usage(model, {"usage": usage}, latency, cached=cached, source=source)
+    text = "".join((choice.get("delta") or {}).get("content") or ""
+                   for chunk in chunks for choice in chunk.get("choices") or [])
+    return record_response_usage(model, {"choices": [{"message": {"content": text}}]}, latency,
+                                 cached=cached, source=source, messages=messages)
+
+
+def _count_messages(messages: list, model: str) -> int:
+    total = 0
+    for message in messages or []:
+        content = _field(message, "content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        total += count_tokens(content or "", model) + 4  # role and separators
+    return total
+
+
+#### Reports
+
+def summarize_usage(records: list[dict], by: tuple[str, ...] = ("pipeline",)) -> dict:
+    """
+    Totals per group of ledger records.
+
+    Args:
+        records (list[dict]): Ledger records (see `UsageLedger.read`).
+        by (tuple[str]): Record fields to group by, e.g. ("pipeline", "model").
+
+    Returns:
+        dict: group tuple -> {"calls", "cached", "prompt_tokens", "completion_tokens",
+            "total_tokens", "cost", "latency_mean", "latency_p95"}. Latencies only count
+            calls that went to the model.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(tuple(record.get(field) for field in by), []).append(record)
+    summary = {}
+    for group, items in sorted(groups.items(), key=lambda item: tuple(str(v) for v in item[0])):
+        latencies = sorted(r["latency"] for r in items if not r.get("cached"))
+        summary[group] = {
+            "calls": len(items),
+            "cached": sum(1 for r in items if r.get("cached")),
+            "prompt_tokens": sum(r.get("prompt_tokens", 0) for r in items),
+            "completion_tokens": sum(r.get("completion_tokens", 0) for r in items),
+            "total_tokens": sum(r.get("total_tokens", 0) for r in items),
+            "cost": sum(r.get("cost") or 0.0 for r in items),
+            "latency_mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+        }
+    return summary
+
+
+def print_report(summary: dict, by: tuple[str, ...] = ("pipeline",)) -> None:
+    """Print `summarize_usage` output as a table."""
+    headers = [*by, "calls", "cached", "prompt", "completion", "cost $", "latency", "p95"]
+    rows = [[*(str(v) for v in group), str(s["calls"]), str(s["cached"]), f"{s['prompt_tokens']:,}",
+             f"{s['completion_tokens']:,}", f"{s['cost']:.4f}", f"{s['latency_mean']:.2f}s",
+             f"{s['latency_p95']:.2f}s"] for group, s in summary.items()]
+    if summary:
+        totals = [sum(s[k] for s in summary.values()) for k in ("calls", "cached", "prompt_tokens",
+                                                                 "completion_tokens", "cost")]
+        rows.append(["total", *[""] * (len(by) - 1), str(totals[0]), str(totals[1]), f"{totals[2]:,}",
+                     f"{totals[3]:,}", f"{totals[4]:.4f}", "", ""])
+    widths = [max(len(row[i]) for row in [headers, *rows]) for i in range(len(headers))]
+    for row in [headers, *rows]:
+        print("  ".join(cell.ljust(w) if i < len(by) else cell.rjust(w)
+                        for i, (cell, w) in enumerate(zip(row, widths))))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Report LLM token usage, cost and latency, or count tokens.")
+    parser.add_argument("--by", default="pipeline", help="Comma-separated fields to group by (default: %(default)s).")
+    parser.add_argument("--days", type=float, default=None, help="Only calls from the last N days.")
+    parser.add_argument("--ledger", default=None, help="Ledger file (default: LLM_USAGE_LEDGER or %s)." % USAGE_PATH)
+    parser.add_argument("--count", metavar="FILE", default=None, help="Count the tokens in FILE instead.")
+    parser.add_argument("--model", default=None, help="Model whose tokenizer --count uses.")
+    args = parser.parse_args()
+    if args.count:
+        with open(args.count, "r", encoding="utf-8") as f:
+            text = f.read()
+        tokenizer = get_tokenizer(args.model)
+        print(f"{tokenizer.count(text)} tokens ({tokenizer.name}{'' if tokenizer.exact else ', approximate'})")
+    else:
+        by = tuple(field.strip() for field in args.by.split(",") if field.strip())
+        since = time.time() - args.days * 86400 if args.days else None
+        print_report(summarize_usage(get_usage_ledger(args.ledger).read(since), by), by)
@@ -0,0 +1,557 @@
+"""Run Obsidian search queries against the vault without the Obsidian app.
+
+Supported syntax (see https://help.obsidian.md/plugins/search):
+
+- words and "quoted phrases", matched case-insensitively in the file name (not its
+  folders) or content;
+  `/regular expressions/`
+- implicit AND, `OR`, `-` for negation and parentheses for grouping
+- `file:`, `path:`, `content:` and `tag:` to restrict where a term matches; each also
+  takes a group, e.g. `file:(draft OR todo)`
+- `line:()`, `block:()`, `section:()`, `task:()`, `task-todo:()` and `task-done:()`
+  to require that the inner query matches within one line, paragraph, heading section
+  or task line
+- `match-case:` and `ignore-case:` before a term
+- `[property]` and `[property:value]` for frontmatter properties
+
+A query is parsed into a tree of predicates and planned against the indexes the repo
+already keeps: note names from the vault scanner, tags and properties from
+`tools.note_metadata` and word-level postings from the BM25 index. Every predicate
+first narrows the candidate notes from an index; an AND intersects its children
+smallest first and stops as soon as nothing is left. Only the notes that survive
+and still have a predicate no index answers exactly (phrases, regexes, `line:` and
+friends) are read from disk and checked.
+
+Index-backed answers reflect the indexes' last update (`reindex_notes`, the note
+metadata update or the vault watcher); notes missing from the BM25 index are always
+read and checked.
+"""
+import abc
+import os
+import re
+
+from tools import md_files
+from tools.md_files import FENCE_RE, HEADING_RE
+
+SCOPES = {"line", "block", "section", "task", "task-todo", "task-done"}
+FIELDS = {"file", "path", "content", "tag"}
+CASE_MODIFIERS = {"match-case", "ignore-case"}
+OPERATOR_RE = re.compile(r"(match-case|ignore-case|task-todo|task-done|file|path|content|tag|line|block|section|task):")
+WORD_RE = re.compile(r"\w+")
+TASK_RE = re.compile(r"^\s*[-*+]\s\[(.)\]\s")
+
+
+class QuerySyntaxError(ValueError):
+    """Raised when a search query can't be parsed."""
+
+
+# ---------- documents ---------- #
+
+class _Doc:
+    """A note being checked: its name and (once read) its text."""
+
+    def __init__(self, name: str, text: str = ""):
+        self.name = name
+        self.text = text
+
+
+def _units(text: str, scope: str) -> list[str]:
+    """Split note text into the units a scoped query must match within."""
+    if scope == "line":
+        return text.splitlines()
+    if scope == "block":
+        return [block for block in re.split(r"\n\s*\n", text) if block.strip()]
+    if scope == "section":
+        sections, current, in_fence = [], [], False
+        for line in text.splitlines():
+            if FENCE_RE.match(line):
+                in_fence = not in_fence
+            elif not in_fence and HEADING_RE.match(line) and current:
+                sections.append("\n".join(current))
+                current = []
+            current.append(line)
+        sections.append("\n".join(current))
+        return sections
+    # task scopes: the task lines, optionally filtered by status
+    tasks = []
+    for line in text.splitlines():
+        task = TASK_RE.match(line)
+        if not task:
+            continue
+        done = task.group(1) != " "
+        if scope == "task" or (scope == "task-done") == done:
+            tasks.append(line[task.end():])
+    return tasks
+
+
+# ---------- query plan ---------- #
+
+class _Context:
+    """Indexes and caches shared by the nodes while one query runs."""
+
+    def __init__(self):
+        self.universe = set(md_files.get_notes_list())
+        self._bm25 = False
+        self._metadata = None
+        self.candidate_cache = {}
+
+    @property
+    def bm25(self):
+        if self._bm25 is False:
+            from tools.bm25_index import get_bm25_index
+            self._bm25 = get_bm25_index(md_files.BM25_PATH) if os.path.exists(md_files.BM25_PATH) else None
+            # Notes added since the last reindex can't be ruled out by the index
+            self.unindexed = self.universe - set(self._bm25.names) if self._bm25 else self.universe
+        return self._bm25
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            from tools.note_metadata import get_metadata_index
+            self._metadata = get_metadata_index()
+        return self._metadata
+
+
+class Node(abc.ABC):
+    """A predicate in a query plan."""
+
+    def candidates(self, ctx: _Context) -> tuple[set | None, bool]:
+        """
+        Narrow the notes from the indexes, without reading any note.
+
+        Returns:
+            tuple: (a superset of the matching notes, or None if no index helps;
+                whether that set is exactly the matching notes).
+        """
+        key = id(self)
+        if key not in ctx.candidate_cache:
+            ctx.candidate_cache[key] = self._candidates(ctx)
+        return ctx.candidate_cache[key]
+
+    def _candidates(self, ctx: _Context):
+        return None, False
+
+    def matches(self, doc: _Doc, ctx: _Context, unit: str = None) -> bool:
+        """Check the predicate against a note (or, inside a scope, one unit of its text)."""
+        if unit is None:
+            found, exact = self.candidates(ctx)
+            if exact:
+                return doc.name in found
+        return self._matches(doc, ctx, unit)
+
+    @abc.abstractmethod
+    def _matches(self, doc: _Doc, ctx: _Context, unit: str = None) -> bool:
+        """Check the predicate by reading the note; `candidates` has not answered it exactly."""
+
+    def explain(self, ctx: _Context, depth: int = 0) -> list[str]:
+        found, exact = self.candidates(ctx)
+        how = "no index" if found is None else f"{len(found)} notes, {'exact' if exact else 'verify'}"
+        return ["  " * depth + f"{self!r}  [{how}]"]
+
+
+class And(Node):
+    def __init__(self, children: list[Node]):
+        self.children = children
+
+    def _ordered(self, ctx: _Context) -> list[Node]:
+        # Most selective first: index-backed children by candidate count, then the rest
+        def selectivity(child):
+            found, exact = child.candidates(ctx)
+            return (found is None, not exact, len(found) if found is not None else 0)
+        return sorted(self.children, key=selectivity)
+
+    def _candidates(self, ctx):
+        result, exact = None, True
+        for child in self._ordered(ctx):
+            found, child_exact = child.candidates(ctx)
+            if found is None:
+                exact = False
+                continue
+            result = set(found) if result is None else result & found
+            exact = exact and child_exact
+            if not result:
+                return set(), True
+        return result, exact and result is not None
+
+    def _matches(self, doc, ctx, unit=None):
+        return all(child.matches(doc, ctx, unit) for child in self._ordered(ctx))
+
+    def explain(self, ctx, depth=0):
+        lines = super().explain(ctx, depth)
+        for child in self._ordered(ctx):
+            lines.extend(child.explain(ctx, depth + 1))
+        return lines
+
+    def __repr__(self):
+        return "AND"
+
+
+class Or(And):
+    def _candidates(self, ctx):
+        result, exact = set(), True
+        for child in self.children:
+            found, child_exact = child.candidates(ctx)
+            if found is None:
+                return None, False
+            result |= found
+            exact = exact and child_exact
+        return result, exact
+
+    def _matches(self, doc, ctx, unit=None):
+        return any(child.matches(doc, ctx, unit) for child in self._ordered(ctx))
+
+    def __repr__(self):
+        return "OR"
+
+
+class Not(Node):
+    def __init__(self, child: Node):
+        self.child = child
+
+    def _candidates(self, ctx):
+        found, exact = self.child.candidates(ctx)
+        if found is not None and exact:
+            return ctx.universe - found, True
+        return None, False
+
+    def _matches(self, doc, ctx, unit=None):
+        return not self.child.matches(doc, ctx, unit)
+
+    def explain(self, ctx, depth=0):
+        return super().explain(ctx, depth) + self.child.explain(ctx, depth + 1)
+
+    def __repr__(self):
+        return "NOT"
+
+
+class Term(Node):
+    """
+    A word, "phrase" or /regex/ matched against the file name, path or content.
+
+    Args:
+        value (str): The text or pattern.
+        field (str): "file", "path", "content", or None for file name or content.
+        regex (bool): Treat `value` as a regular expression.
+        case_sensitive (bool): Match case exactly (`match-case:`).
+    """
+
+    def __init__(self, value: str, field: str = None, regex: bool = False, case_sensitive: bool = False):
+        self.value = value
+        self.field = field
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+        flags = 0 if case_sensitive else re.IGNORECASE
+        try:
+            self.pattern = re.compile(value if regex else re.escape(value), flags)
+        except re.error as e:
+            raise QuerySyntaxError(f"Invalid regular expression /{value}/: {e}") from e
+
+    def _candidates(self, ctx):
+        if self.field in ("file", "path"):
+            return {name for name in ctx.universe if self._search(self._name_text(name))}, True
+        if self.regex or ctx.bm25 is None:
+            return None, False
+        # Every run of word characters in the term lies inside one indexed term
+        result = None
+        for fragment in WORD_RE.findall(self.value.lower()):
+            found = ctx.bm25.notes_containing(fragment)
+            if found is None:
+                continue
+            result = found if result is None else result & found
+        if result is None:
+            return None, False
+        # The BM25 index also holds each note's folders, which a bare term doesn't match
+        exact = (self.field is None and not self.case_sensitive and not ctx.unindexed
+                 and WORD_RE.fullmatch(self.value) is not None
+                 and not any(self._search(os.path.dirname(name)) for name in result))
+        return result | ctx.unindexed, exact
+
+    def _name_text(self, name: str) -> str:
+        return os.path.basename(name) + ".md" if self.field == "file" else name + ".md"
+
+    def _search(self, text: str) -> bool:
+        return self.pattern.search(text) is not None
+
+    def _matches(self, doc, ctx, unit=None):
+        if self.field in ("file", "path"):
+            return self._search(self._name_text(doc.name))
+        if unit is not None:
+            return self._search(unit)
+        if self.field is None and self._search(os.path.basename(doc.name)):
+            return True
+        return self._search(doc.text)
+
+    def __repr__(self):
+        shown = f"/{self.value}/" if self.regex else f'"{self.value}"'
+        return f"{self.field or 'any'}:{'match-case:' if self.case_sensitive else ''}{shown}"
+
+
+class Tag(Node):
+    """`tag:#name`, answered from the metadata index (nested tags included)."""
+
+    def __init__(self, tag: str):
+        self.tag = tag.lstrip("#")
+        self.inline = re.compile(rf"(?<![\w/])#{re.escape(self.tag)}(?![\w-])", re.IGNORECASE)
+
+    def _tagged(self, ctx) -> set:
+        key = (id(self), "tagged")
+        if key not in ctx.candidate_cache:
+            ctx.candidate_cache[key] = set(ctx.metadata.notes_with_tag(self.tag)) & ctx.universe
+        return ctx.candidate_cache[key]
+
+    def _candidates(self, ctx):
+        if ctx.metadata.indexes_inline_tags():
+            return self._tagged(ctx), True
+        # Only frontmatter tags are indexed: a note holding the tag's words may still use it inline
+        words, _ = Term(self.tag)._candidates(ctx)
+        return (None, False) if words is None else (self._tagged(ctx) | words, False)
+
+    def _matches(self, doc, ctx, unit=None):
+        if unit is None:
+            if doc.name in self._tagged(ctx):
+                return True
+            unit = doc.text
+        return self.inline.search(unit) is not None
+
+    def __repr__(self):
+        return f"tag:#{self.tag}"
+
+
+class Property(Node):
+    """`[key]` or `[key:value]`, answered from the metadata index."""
+
+    def __init__(self, key: str, value: str = None):
+        self.key = key
+        self.value = value
+
+    def _candidates(self, ctx):
+        return set(ctx.metadata.notes_with_property(self.key, self.value)) & ctx.universe, True
+
+    def _matches(self, doc, ctx, unit=None):
+        return doc.name in self.candidates(ctx)[0]
+
+    def __repr__(self):
+        return f"[{self.key}]" if self.value is None else f"[{self.key}:{self.value}]"
+
+
+class Scoped(Node):
+    """`line:(...)`, `section:(...)` and friends: the inner query must match within one unit."""
+
+    def __init__(self, scope: str, child: Node):
+        self.scope = scope
+        self.child = child
+
+    def _candidates(self, ctx):
+        found, _ = self.child.candidates(ctx)
+        return found, False
+
+    def _matches(self, doc, ctx, unit=None):
+        return any(self.child.matches(doc, ctx, part) for part in _units(unit if unit is not None else doc.text, self.scope))
+
+    def explain(self, ctx, depth=0):
+        return super().explain(ctx, depth) + self.child.explain(ctx, depth + 1)
+
+    def __repr__(self):
+        return f"{self.scope}:()"
+
+
+# ---------- parsing ---------- #
+
+class _Parser:
+    """Recursive-descent parser: or := and (OR and)*, and := unary+, unary := -unary | primary."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.pos = 0
+
+    def _skip_space(self) -> None:
+        while self.pos < len(self.query) and self.query[self.pos].isspace():
+            self.pos += 1
+
+    def _peek(self) -> str:
+        self._skip_space()
+        return self.query[self.pos] if self.pos < len(self.query) else ""
+
+    def _at_or(self) -> bool:
+        self._skip_space()
+        return (self.query.startswith("OR", self.pos)
+                and (self.pos + 2 == len(self.query) or self.query[self.pos + 2].isspace()))
+
+    def parse(self) -> Node:
+        node = self._parse_or(None, False)
+        if self._peek():
+            raise QuerySyntaxError(f"Unexpected '{self._peek()}' at position {self.pos}")
+        return node
+
+    def _parse_or(self, field, case_sensitive) -> Node:
+        children = [self._parse_and(field, case_sensitive)]
+        while self._at_or():
+            self.pos += 2
+            children.append(self._parse_and(field, case_sensitive))
+        return children[0] if len(children) == 1 else Or(children)
+
+    def _parse_and(self, field, case_sensitive) -> Node:
+        children = []
+        while self._peek() and self._peek() != ")" and not self._at_or():
+            children.append(self._parse_unary(field, case_sensitive))
+        if not children:
+            raise QuerySyntaxError(f"Expected a search term at position {self.pos}")
+        return children[0] if len(children) == 1 else And(children)
+
+    def _parse_unary(self, field, case_sensitive) -> Node:
+        if self._peek() == "-":
+            self.pos += 1
+            return Not(self._parse_unary(field, case_sensitive))
+        return self._parse_primary(field, case_sensitive)
+
+    def _parse_primary(self, field, case_sensitive) -> Node:
+        char = self._peek()
+        if char == "(":
+            return self._parse_group(field, case_sensitive)
+        if char == "[":
+            end = self.query.find("]", self.pos)
+            if end == -1:
+                raise QuerySyntaxError(f"Unclosed '[' at position {self.pos}")
+            key, _, value = self.query[self.pos + 1:end].partition(":")
+            self.pos = end + 1
+            return Property(key.strip(), value.strip().strip('"') or None)
+        operator = OPERATOR_RE.match(self.query, self.pos)
+        if operator:
+            self.pos = operator.end()
+            name = operator.group(1)
+            if name in CASE_MODIFIERS:
+                return self._parse_primary(field, name == "match-case")
+            if name in SCOPES:
+                if self.pos >= len(self.query) or self.query[self.pos].isspace():
+                    return Scoped(name, And([]))  # bare task: matches any task
+                inner = self._parse_group(None, case_sensitive) if self.query[self.pos] == "(" \
+                    else self._parse_primary(None, case_sensitive)
+                return Scoped(name, inner)
+            if self.pos < len(self.query) and self.query[self.pos] == "(":
+                return self._parse_group(name, case_sensitive)
+            return self._parse_primary(name, case_sensitive)
+        value, regex = self._parse_value()
+        if field == "tag":
+            return Tag(value)
+        return Term(value, field, regex, case_sensitive)
+
+    def _parse_group(self, field, case_sensitive) -> Node:
+        self.pos += 1  # '('
+        if self._peek() == ")":
+            self.pos += 1
+            return And([])
+        node = self._parse_or(field, case_sensitive)
+        if self._peek() != ")":
+            raise QuerySyntaxError(f"Expected ')' at position {self.pos}")
+        self.pos += 1
+        return node
+
+    def _parse_value(self) -> tuple[str, bool]:
+        """Read a quoted phrase, a /regex/ or a bare word. Returns (value, is_regex)."""
+        self._skip_space()
+        if self.pos >= len(self.query):
+            raise QuerySyntaxError("Expected a search term at the end of the query")
+        quote = self.query[self.pos]
+        if quote in "\"/":
+            value, i = [], self.pos + 1
+            while i < len(self.query) and self.query[i] != quote:
+                if self.query[i] == "\\" and i + 1 < len(self.query) and (quote == '"' or self.query[i + 1] == "/"):
+                    i += 1
+                value.append(self.query[i])
+                i += 1
+            if i >= len(self.query):
+                raise QuerySyntaxError(f"Unclosed {quote} at position {self.pos}")
+            self.pos = i + 1
+            return "".join(value), quote == "/"
+        start = self.pos
+        while self.pos < len(self.query) and not self.query[self.pos].isspace() and self.query[self.pos] not in "()":
+            self.pos += 1
+        return self.query[start:self.pos], False
+
+
+def parse_query(query: str) -> Node:
+    """
+    Parse an Obsidian search query into a query plan.
+
+    Raises:
+        QuerySyntaxError: If the query is malformed.
+    """
+    if not query.strip():
+        raise QuerySyntaxError("Empty query")
+    return _Parser(query).parse()
+
+
+def run_query(query: str, limit: int = None) -> list[str]:
+    """
+    Find the notes matching an Obsidian search query.
+
+    Args:
+        query (str): The query, e.g. `tag:#meeting line:(nemotron eval) -path:archive`.
+        limit (int): Stop after this many matches. Defaults to no limit.
+
+    Returns:
+        list[str]: Matching note names, sorted.
+    """
+    plan = parse_query(query)
+    ctx = _Context()
+    found, exact = plan.candidates(ctx)
+    candidates = sorted(ctx.universe if found is None else found & ctx.universe)
+    if exact:
+        return candidates[:limit]
+
+    # Only the surviving candidates are read, ahead on a thread pool
+    from tools.vault_scan import NoteEntry
+    entries = [NoteEntry(name, os.path.join(md_files.VAULT_PATH, name + '.md'), 0, 0.0) for name in candidates]
+    results = []
+    for entry, content in md_files._read_notes(entries):
+        if content is not None and plan.matches(_Doc(entry.name, content), ctx):
+            results.append(entry.name)
+            if limit is not None and len(results) >= limit:
+                break
+    return results
+
+
+def explain_query(query: str) -> str:
+    """Show the query plan: each predicate, its candidate count and whether notes must be read to check it."""
+    ctx = _Context()
+    return "\n".join(parse_query(query).explain(ctx))
+
+
+##Tools for ReAct Agent
+
+
+def search_vault(query: str, limit: int = 20) -> list[str]:
+    """
+    Run an Obsidian search query over the vault and return the matching notes.
+
+    Supports words, "exact phrases", /regex/, OR, -exclusion, (grouping), file:, path:,
+    content:, tag:#tag, line:(...), block:(...), section:(...), task:(...),
+    task-todo:(...), task-done:(...), match-case: and [property:value].
+    Example: `tag:#meeting section:("action items" nemotron) -path:archive`
+
+    Args:
+        query (str): The Obsidian search query.
+        limit (int): The maximum number of notes to return. Defaults to 20.
+
+    Returns:
+        list[str]: Names of the matching notes.
+    """
+    try:
+        return run_query(query, limit)
+    except QuerySyntaxError as e:
+        return [f"Invalid query: {e}"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run an Obsidian search query against the vault.")
+    parser.add_argument("query", help="The search query.")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of results.")
+    parser.add_argument("--explain", action="store_true", help="Print the query plan before the results.")
+    args = parser.parse_args()
+    if args.explain:
+        print(explain_query(args.query))
+        print()
+    for note in run_query(args.query, args.limit):
+        print(note)
@@ -0,0 +1,125 @@
+"""Fast, cached listing of the markdown notes in a vault.
+
+`VaultScanner` walks the vault with `os.scandir`, pruning excluded folders before
+descending into them. It remembers every directory's mtime along with the notes and
+subdirectories found in it; a directory's mtime changes whenever an entry is added,
+removed or renamed in it, so a repeat scan only re-lists directories that changed and
+otherwise costs one stat per directory rather than per file.
+"""
+import os
+import threading
+import time
+from typing import NamedTuple
+
+
+class NoteEntry(NamedTuple):
+    """A note found in the vault."""
+    name: str     # path relative to the vault root, without the '.md' extension
+    path: str     # absolute path of the file
+    size: int
+    mtime: float
+
+
+class _DirState(NamedTuple):
+    mtime_ns: int
+    racy: bool            # modified too recently to trust the mtime on the next scan
+    notes: list           # [NoteEntry]
+    subdirs: list         # [(absolute path, relative path)]
+
+
+class VaultScanner:
+    """
+    Lists the notes under `root`, re-reading only directories whose mtime changed.
+
+    Args:
+        root (str): The vault root.
+        excluded_dirs: Folder names that are skipped wherever they appear.
+    """
+
+    # A directory modified within two seconds of being listed may change again
+    # without its mtime moving (coarse filesystem timestamps), so it is always re-listed.
+    RACY_WINDOW_NS = 2_000_000_000
+
+    def __init__(self, root: str, excluded_dirs):
+        self.root = root
+        self.excluded_dirs = frozenset(excluded_dirs)
+        self._dirs = {}
+        self._lock = threading.Lock()
+
+    def _list_dir(self, path: str, relative: str, mtime_ns: int, scan_start_ns: int) -> _DirState:
+        notes, subdirs = [], []
+        prefix = relative + os.sep if relative else ""
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir():
+                    # Like os.walk, don't descend into symlinked folders
+                    if name not in self.excluded_dirs and not entry.is_symlink():
+                        subdirs.append((entry.path, prefix + name))
+                elif name.endswith('.md'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue  # vanished mid-scan
+                    notes.append(NoteEntry(prefix + name[:-3], entry.path, stat.st_size, stat.st_mtime))
+        racy = mtime_ns >= scan_start_ns - self.RACY_WINDOW_NS
+        return _DirState(mtime_ns, racy, notes, subdirs)
+
+    def scan(self, refresh_stats: bool = False) -> list[NoteEntry]:
+        """
+        List every note in the vault.
+
+        Args:
+            refresh_stats (bool): Re-stat notes in directories that did not change, so
+                that size and mtime reflect in-place edits. Without it those entries
+                carry the values seen when their directory was last listed. Defaults to False.
+
+        Returns:
+            list[NoteEntry]: One entry per note.
+        """
+        with self._lock:
+            scan_start_ns = time.time_ns()
+            seen = {}
+            result = []
+            stack = [(self.root, "")]
+            while stack:
+                path, relative = stack.pop()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                state = self._dirs.get(path)
+                if state is None or state.racy or state.mtime_ns != mtime_ns:
+                    try:
+                        state = self._list_dir(path, relative, mtime_ns, scan_start_ns)
+                    except OSError:
+                        continue
+                elif refresh_stats:
+                    notes = []
+                    for note in state.notes:
+                        try:
+                            stat = os.stat(note.path)
+                        except OSError:
+                            continue
+                        notes.append(note._replace(size=stat.st_size, mtime=stat.st_mtime))
+                    state = state._replace(notes=notes)
+                seen[path] = state
+                result.extend(state.notes)
+                stack.extend(reversed(state.subdirs))
+            # Forget directories that were deleted or are no longer reachable
+            self._dirs = seen
+            return result
+
+
+_scanners = {}
+_scanners_lock = threading.Lock()
+
+
+def get_scanner(root: str, excluded_dirs) -> VaultScanner:
+    """Return the process-wide scanner for a vault root, creating it on first use."""
+    key = (root, frozenset(excluded_dirs))
+    scanner = _scanners.get(key)
+    if scanner is None:
+        with _scanners_lock:
+            scanner = _scanners.setdefault(key, VaultScanner(root, excluded_dirs))
+    return scanner
@@ -0,0 +1,220 @@
+"""Keep the search indexes live while notes are created, edited and deleted.
+
+`VaultWatcher` follows changes under VAULT_PATH (with inotify/FSEvents through the
+optional `watchdog` package, or by polling directory snapshots otherwise), skips the
+same folders as `get_notes_list`, debounces bursts of edits and applies them to the
+note and passage indexes, the link graph and the tag/property index incrementally on a background thread.
+Only the changed notes are re-read and re-embedded.
+
+Run in the foreground with `python -m tools.vault_watcher`.
+"""
+import logging
+import os
+import threading
+import time
+
+from tools import md_files
+
+logger = logging.getLogger("vault_watcher")
+
+
+def _note_name(path: str):
+    """Map an absolute path to a note name, or None if it is not an indexed note."""
+    if not path.endswith('.md'):
+        return None
+    relative_path = os.path.relpath(path, md_files.VAULT_PATH)
+    parts = relative_path.split(os.sep)
+    if parts[0] == os.pardir or not md_files.EXCLUDED_DIRS.isdisjoint(parts[:-1]):
+        return None
+    return relative_path[:-3]
+
+
+def _snapshot(refresh_stats: bool = False) -> dict:
+    """
+    Return {note name: (mtime, size)} for every note in the vault.
+
+    Without `refresh_stats` only directories whose mtime changed are re-listed and
+    their notes stat'ed, so a poll costs one stat per directory.
+    """
+    return {entry.name: (entry.mtime, entry.size) for entry in md_files.get_note_entries(refresh_stats=refresh_stats)}
+
+
+class VaultWatcher:
+    """
+    Background watcher that applies vault changes to the search indexes.
+
+    Args:
+        debounce (float): Seconds without new changes before a batch is indexed. Defaults to 0.5.
+        poll_interval (float): Seconds between snapshots when polling. A snapshot only
+            re-lists directories whose mtime changed, which catches new, deleted,
+            renamed and atomically saved notes. Defaults to 1.0.
+        stat_interval (float): Seconds between polls that also re-stat every note, to
+            catch edits written in place, which leave the directory mtime alone.
+            Defaults to 30.0.
+        passages (bool): Also keep the passage index up to date. Defaults to True.
+        link_graph (bool): Also keep the wikilink graph up to date. Defaults to True.
+        metadata (bool): Also keep the frontmatter and tag index up to date. Defaults to True.
+        use_watchdog (bool): Use `watchdog` for native file events if it is installed. Defaults to True.
+    """
+
+    def __init__(self, debounce: float = 0.5, poll_interval: float = 1.0, passages: bool = True,
+                 use_watchdog: bool = True, link_graph: bool = True, metadata: bool = True,
+                 stat_interval: float = 30.0):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.stat_interval = stat_interval
+        self.passages = passages
+        self.link_graph = link_graph
+        self.metadata = metadata
+        self.use_watchdog = use_watchdog
+        self._pending = set()
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    def notify(self, note: str) -> None:
+        """Queue a note (by name) to be re-checked on the next flush."""
+        with self._cond:
+            self._pending.add(note)
+            self._last_event = time.monotonic()
+            self._cond.notify()
+
+    def flush(self) -> dict:
+        """Index every pending change now. Returns the merged added/updated/removed report."""
+        with self._cond:
+            notes, self._pending = self._pending, set()
+        report = {"added": [], "updated": [], "removed": []}
+        if not notes:
+            return report
+        notes = sorted(notes)
+        reindexers = [md_files.reindex_notes]
+        if self.passages:
+            reindexers.append(md_files.reindex_passages)
+        if self.link_graph:
+            from tools.link_graph import update_link_graph
+            reindexers.append(update_link_graph)
+        if self.metadata:
+            from tools.note_metadata import update_note_metadata
+            reindexers.append(update_note_metadata)
+        for reindex in reindexers:
+            result = reindex(incremental=True, notes=notes)
+            for key in report:
+                report[key] = sorted(set(report[key]) | set(result[key]))
+        logger.info("Indexed %d added, %d updated, %d removed",
+                    len(report["added"]), len(report["updated"]), len(report["removed"]))
+        return report
+
+    def _index_loop(self) -> None:
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._pending and not self._stop.is_set():
+                    self._cond.wait()
+                # Wait until the burst of edits has gone quiet
+                while self._pending and not self._stop.is_set():
+                    remaining = self._last_event + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Incremental reindex failed")
+
+    def _poll_loop(self) -> None:
+        previous = _snapshot(refresh_stats=True)
+        last_stat = time.monotonic()
+        while not self._stop.wait(self.poll_interval):
+            refresh = time.monotonic() - last_stat >= self.stat_interval
+            if refresh:
+                last_stat = time.monotonic()
+            current = _snapshot(refresh_stats=refresh)
+            for note in current.keys() | previous.keys():
+                if current.get(note) != previous.get(note):
+                    self.notify(note)
+            previous = current
+
+    def _start_watchdog(self) -> bool:
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    note = _note_name(path) if path else None
+                    if note:
+                        watcher.notify(note)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), md_files.VAULT_PATH, recursive=True)
+        self._observer.start()
+        return True
+
+    def start(self) -> "VaultWatcher":
+        """Start watching and indexing in background threads."""
+        self._stop.clear()
+        loops = [self._index_loop]
+        if not (self.use_watchdog and self._start_watchdog()):
+            loops.append(self._poll_loop)
+        for loop in loops:
+            thread = threading.Thread(target=loop, name=f"vault-watcher-{loop.__name__.strip('_')}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Watching %s (%s)", md_files.VAULT_PATH, "native events" if self._observer else "polling")
+        return self
+
+    def stop(self) -> None:
+        """Stop watching; pending changes that were not flushed yet are dropped."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Keep the note search indexes in sync with the vault.")
+    parser.add_argument("--debounce", type=float, default=0.5, help="Seconds of quiet before indexing a burst of edits.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between scans when polling.")
+    parser.add_argument("--stat-interval", type=float, default=30.0,
+                        help="Seconds between polls that re-stat every note to catch in-place edits.")
+    parser.add_argument("--no-passages", action="store_true", help="Only maintain the note-level index.")
+    parser.add_argument("--poll", action="store_true", help="Poll even if watchdog is installed.")
+    args = parser.parse_args()
+
+    from tools.link_graph import update_link_graph
+    from tools.note_metadata import update_note_metadata
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print("Catching up with changes since the last index...")
+    md_files.reindex_notes(incremental=True, verbose=True)
+    if not args.no_passages:
+        md_files.reindex_passages(incremental=True, verbose=True)
+    update_link_graph(incremental=True, verbose=True)
+    update_note_metadata(incremental=True, verbose=True)
+
+    watcher = VaultWatcher(debounce=args.debounce, poll_interval=args.poll_interval,
+                           stat_interval=args.stat_interval, passages=not args.no_passages,
+                           use_watchdog=not args.poll).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
@@ -2,7 +2,8 @@ import os
 import requests
 from bs4 import BeautifulSoup
 from tools.md_files import create_note
-from text_to_note import obsidify_text
+from text_to_note import obsidify_text, deployment_name
+from tools.token_usage import count_tokens, usage_pipeline
 from tools.brave_search import extract_main_content
 
 # def extract_main_content(url: str) -> str:
@@ -24,7 +25,8 @@ from tools.brave_search import extract_main_content
 
 
 
-def generate_single_note_from_urls(urls: list[str], note_name: str, insert_links: bool = True, verbose: bool = False, extra_properties: dict = {}) -> None:
+@usage_pipeline("web_to_note")
+def generate_single_note_from_urls(urls: list[str], note_name: str, insert_links: bool = True, verbose: bool = False, extra_properties: dict = {}, stream: bool = False, chunk_tokens: int = None) -> None:
     """Generate a single markdown note from a list of URLs."""
     combined_content = ""
     for url in urls:
@@ -35,14 +37,14 @@ def generate_single_note_from_urls(urls: list[str], note_name: str, insert_links
                 print(f"\n\nContent from {url}:\n\n{content[:500]}...\n")
                 print(f"Length of content: {len(content)}")
                 # Calculate and display the number of tokens
-                num_tokens = len(content.split())
+                num_tokens = count_tokens(content, deployment_name)
                 print(f"Number of tokens: {num_tokens}")
             combined_content += f"# Content from {url}\n\n{content}\n\n"
         else:
             print(f"Failed to extract content from {url}")
 
     if combined_content:
-        obsidify_text(combined_content, note_name, ignore_token_limit=True, insert_links=insert_links, verbose=verbose, extra_properties=extra_properties)
+        obsidify_text(combined_content, note_name, ignore_token_limit=True, insert_links=insert_links, verbose=verbose, extra_properties=extra_properties, stream=stream, chunk_tokens=chunk_tokens)
         print(f"Combined note created: {note_name}.md")
     else:
         print("No content extracted from the provided URLs.")